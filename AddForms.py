@@ -2,9 +2,12 @@
 from typing import Any
 
 from PyQt6.QtCore import Qt
+from DatabaseExecutor import DatabaseExecutor
 from PyQt6.QtWidgets import QMainWindow, QWidget, QMessageBox
-from UserDatabaseManager import UserDatabaseManager
+from UserDatabaseManager import UserDatabaseManager, BookNotFoundError
+from sqlalchemy import Row
 from sqlalchemy.exc import IntegrityError
+from TitleListModel import TitleListModel, attach_title_combo_box
 from ui import AddGenre_ui, AddAuthor_ui, AddBook_ui
 
 
@@ -17,14 +20,14 @@ class FormMode:
 class AddGenre(QWidget, AddGenre_ui.Ui_Form):
     """Окно для добавления / редактирования жанров"""
 
-    def __init__(self, parent: QMainWindow | Any, flags: Qt.WindowType, mode: int, user_id: int):
+    def __init__(self, parent: QMainWindow | Any, flags: Qt.WindowType, mode: int, database_executor: DatabaseExecutor):
         super().__init__(parent=parent, flags=flags)
         self.setupUi(self)
         self.setWindowModality(Qt.WindowModality.ApplicationModal)
 
         self.mode = mode
         self.genre_id = None
-        self.user_database_manager = UserDatabaseManager(user_id)
+        self.database_executor = database_executor
         self.parent_widget: QMainWindow | Any = parent
 
         if self.mode == FormMode.Add:
@@ -44,39 +47,41 @@ class AddGenre(QWidget, AddGenre_ui.Ui_Form):
             self.errorLabel.setText('Введите название жанра')
             return
 
-        try:
-            if self.mode == FormMode.Add:
-                self.user_database_manager.add_genre(title)
-            elif self.mode == FormMode.Edit:
-                self.user_database_manager.edit_genre(self.genre_id, title)
-            self.parent_widget.update_user_genres()
-            self.close()
-        except IntegrityError:
-            self.user_database_manager.rollback()
-            self.errorLabel.setText('Данный жанр уже есть')
-
-    def load_genre(self, genre_id: int):
-        """Загрузка информации о жанре в режиме редактирования"""
+        if self.mode == FormMode.Add:
+            task = self.database_executor.submit(UserDatabaseManager.add_genre, title)
+        else:
+            task = self.database_executor.submit(UserDatabaseManager.edit_genre, self.genre_id, title)
+        self.pushButton.setEnabled(False)
+        task.finished.connect(self._on_executed)
+        task.failed.connect(self._on_execute_failed)
+
+    def _on_executed(self):
+        # Главное окно обновляется по событию изменения каталога
+        self.close()
+
+    def _on_execute_failed(self, error: Exception):
+        self.pushButton.setEnabled(True)
+        if not isinstance(error, IntegrityError):
+            raise error
+        self.errorLabel.setText('Данный жанр уже есть')
+
+    def load_genre(self, genre_id: int, title: str):
+        """Загрузка информации о жанре в режиме редактирования (данные уже есть у главного окна)"""
         self.genre_id = genre_id
-        title = self.user_database_manager.get_genre(genre_id)
         self.lineEdit.setText(title)
 
-    def closeEvent(self, a0):
-        """Закрытие подключения к базе данных при закрытии окна"""
-        self.user_database_manager.close()
-
 
 class AddAuthor(QWidget, AddAuthor_ui.Ui_Form):
     """Окно для добавления / редактирования авторов"""
 
-    def __init__(self, parent: QMainWindow | Any, flags: Qt.WindowType, mode: int, user_id: int):
+    def __init__(self, parent: QMainWindow | Any, flags: Qt.WindowType, mode: int, database_executor: DatabaseExecutor):
         super().__init__(parent=parent, flags=flags)
         self.setupUi(self)
         self.setWindowModality(Qt.WindowModality.ApplicationModal)
 
         self.mode = mode
         self.author_id = None
-        self.user_database_manager = UserDatabaseManager(user_id)
+        self.database_executor = database_executor
         self.parent_widget: QMainWindow | Any = parent
 
         if self.mode == FormMode.Add:
@@ -95,27 +100,28 @@ class AddAuthor(QWidget, AddAuthor_ui.Ui_Form):
         if not title:
             self.errorLabel.setText('Введите название автора')
 
-        try:
-            if self.mode == FormMode.Add:
-                self.user_database_manager.add_author(title)
-            elif self.mode == FormMode.Edit:
-                self.user_database_manager.edit_author(self.author_id, title)
-            self.parent_widget.update_user_authors()
-            self.close()
-        except IntegrityError:
-            self.user_database_manager.rollback()
-            self.errorLabel.setText('Данный автор уже есть')
-
-    def load_author(self, author_id):
-        """Загрузка информации об авторе в режиме редактирования"""
+        if self.mode == FormMode.Add:
+            task = self.database_executor.submit(UserDatabaseManager.add_author, title)
+        else:
+            task = self.database_executor.submit(UserDatabaseManager.edit_author, self.author_id, title)
+        self.pushButton.setEnabled(False)
+        task.finished.connect(self._on_executed)
+        task.failed.connect(self._on_execute_failed)
+
+    def _on_executed(self):
+        self.close()
+
+    def _on_execute_failed(self, error: Exception):
+        self.pushButton.setEnabled(True)
+        if not isinstance(error, IntegrityError):
+            raise error
+        self.errorLabel.setText('Данный автор уже есть')
+
+    def load_author(self, author_id: int, title: str):
+        """Загрузка информации об авторе в режиме редактирования (данные уже есть у главного окна)"""
         self.author_id = author_id
-        title = self.user_database_manager.get_author(author_id)
         self.lineEdit.setText(title)
 
-    def closeEvent(self, a0):
-        """Закрытие подключения к базе данных при закрытии окна"""
-        self.user_database_manager.close()
-
 
 class AddBook(QWidget, AddBook_ui.Ui_Form):
     """Окно для добавления / редактирования книг"""
@@ -123,22 +129,23 @@ class AddBook(QWidget, AddBook_ui.Ui_Form):
     def __init__(self, parent: QMainWindow | Any,
                  flags: Qt.WindowType,
                  mode: int,
-                 user_id: int,
-                 user_genres: dict[str, int],
-                 user_authors: dict[str, int]):
+                 database_executor: DatabaseExecutor,
+                 genre_model: TitleListModel,
+                 author_model: TitleListModel):
         super().__init__(parent=parent, flags=flags)
         self.setupUi(self)
         self.setWindowModality(Qt.WindowModality.ApplicationModal)
 
         self.mode = mode
-        self.user_genres = user_genres
-        self.user_authors = user_authors
+        self.genre_model = genre_model
+        self.author_model = author_model
         self.book_id = None
-        self.user_database_manager = UserDatabaseManager(user_id)
+        self.database_executor = database_executor
         self.parent_widget: QMainWindow | Any = parent
 
-        self.load_genres()
-        self.load_authors()
+        # Списки жанров и авторов - общие модели главного окна, строки не копируются
+        attach_title_combo_box(self.genreComboBox, self.genre_model)
+        attach_title_combo_box(self.authorComboBox, self.author_model)
 
         if self.mode == FormMode.Add:
             self.pushButton.setText('Добавить')
@@ -150,43 +157,46 @@ class AddBook(QWidget, AddBook_ui.Ui_Form):
     def execute(self):
         """Выполнение запроса при нажатии кнопки"""
         title = self.titleLineEdit.text()
-        author_id_book_fk = self.user_authors[self.authorComboBox.currentText()]
-        genre_id_book_fk = self.user_genres[self.genreComboBox.currentText()]
+        author_id_book_fk = self.author_model.item_id(self.authorComboBox.currentText().lower())
+        genre_id_book_fk = self.genre_model.item_id(self.genreComboBox.currentText().lower())
         status = self.statusComboBox.currentText()
 
         if not title:
             QMessageBox.warning(self, 'Ошибка', 'Введите название книги')
             return
 
-        if self.mode == FormMode.Add:
-            self.user_database_manager.add_book(title, author_id_book_fk, genre_id_book_fk, status)
-            self.parent_widget.search_books()
-            self.close()
-        elif self.mode == FormMode.Edit:
-            self.user_database_manager.edit_book(self.book_id, title, author_id_book_fk, genre_id_book_fk, status)
-            self.parent_widget.search_books()
-            self.close()
-
-    def load_genres(self):
-        """Загрузка жанров пользователя"""
-        self.genreComboBox.clear()
-        self.genreComboBox.addItems(self.user_genres.keys())
-
-    def load_authors(self):
-        """Загрузка авторов пользователя"""
-        self.authorComboBox.clear()
-        self.authorComboBox.addItems(self.user_authors.keys())
+        if author_id_book_fk is None:
+            QMessageBox.warning(self, 'Ошибка', 'Выберите автора из списка')
+            return
 
-    def load_book(self, book_id: int):
-        """Загрузка информации о книге в режиме редактирования"""
-        self.book_id = book_id
-        title, author, genre, status = self.user_database_manager.get_book(book_id)
+        if genre_id_book_fk is None:
+            QMessageBox.warning(self, 'Ошибка', 'Выберите жанр из списка')
+            return
 
+        if self.mode == FormMode.Add:
+            task = self.database_executor.submit(UserDatabaseManager.add_book,
+                                                 title, author_id_book_fk, genre_id_book_fk, status)
+        else:
+            task = self.database_executor.submit(UserDatabaseManager.edit_book,
+                                                 self.book_id, title, author_id_book_fk, genre_id_book_fk, status)
+        self.pushButton.setEnabled(False)
+        task.finished.connect(self._on_executed)
+        task.failed.connect(self._on_execute_failed)
+
+    def _on_executed(self):
+        self.close()
+
+    def _on_execute_failed(self, error: Exception):
+        self.pushButton.setEnabled(True)
+        if not isinstance(error, BookNotFoundError):
+            raise error
+        QMessageBox.warning(self, 'Ошибка', 'Книга не найдена: возможно, она уже удалена')
+
+    def load_book(self, book: Row[tuple[Any, Any, Any, Any, Any]]):
+        """Загрузка информации о книге в режиме редактирования: строка результата поиска главного окна
+        (ИД, название, автор, жанр, статус)"""
+        self.book_id, title, author, genre, status = book
         self.titleLineEdit.setText(title)
-        self.authorComboBox.setCurrentText(author)
-        self.genreComboBox.setCurrentText(genre)
+        self.authorComboBox.setCurrentIndex(self.author_model.row(author))
+        self.genreComboBox.setCurrentIndex(self.genre_model.row(genre))
         self.statusComboBox.setCurrentText(status)
-
-    def closeEvent(self, a0):
-        """Закрытие подключения к базе данных при закрытии окна"""
-        self.user_database_manager.close()
@@ -0,0 +1,217 @@
+"""Асинхронный вариант UserDatabaseManager на SQLAlchemy asyncio + aiosqlite для цикла событий asyncio
+(qasync в окне, сервер):
+    engine = create_async_database_engine(f'sqlite+aiosqlite:///{DATABASE_PATH}')
+    manager = AsyncUserDatabaseManager(user_id, AsyncDatabaseSessionManager(engine))
+    catalog = await manager.load_catalog()
+Импорт и экспорт csv - код UserDatabaseManager в AsyncSession.run_sync: разбор следующей порции файла
+выполняется в потоке (Prefetcher), а цикл событий свободен, пока выполняются запросы порции"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, BinaryIO, Callable, Hashable, NamedTuple, Sequence, TextIO
+
+from database.csv_import import IMPORT_CHUNK_ROWS
+from database.maintenance import MaintenanceReport
+from database.search_cache import SearchCacheStats, SearchResultCache
+from database.session import AsyncDatabaseSessionManager, SharedSessionManager
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+from UserDatabaseManager import UserDatabaseManager, CatalogChange, CsvImportReport, LibraryStatistics, \
+    SearchPage, BOOKS_PAGE_SIZE, EXPORT_CHUNK_SIZE, SEARCH_CACHE_MAX_ROWS, TITLES_PAGE_SIZE
+
+
+class CatalogSnapshot(NamedTuple):
+    """Данные, которые главное окно загружает при открытии: жанры, авторы и первая страница книг"""
+    genres: tuple[tuple, ...]
+    authors: tuple[tuple, ...]
+    books: SearchPage
+
+
+class _ReadCache:
+    """Кэш результатов поиска для одного запроса чтения: результат не сохраняется, если во время запроса
+    выполнялось изменение - он мог быть получен до фиксации, а сброс устаревших результатов пройти раньше"""
+
+    def __init__(self, cache: SearchResultCache, version: Callable[[], int]):
+        self._cache = cache
+        self._version = version
+        self._started_version = version()
+
+    def get(self, key: Hashable) -> Any | None:
+        return self._cache.get(key)
+
+    def put(self, key: Hashable, result: Any, rows: int | None = None):
+        if self._version() == self._started_version:
+            self._cache.put(key, result, rows)
+
+
+class AsyncUserDatabaseManager:
+    """Методы UserDatabaseManager в виде корутин: запросы выполняет код UserDatabaseManager внутри
+    AsyncSession.run_sync, поэтому результаты, исключения, изменения каталога и кэш результатов поиска те же;
+    Каждый запрос - отдельная сессия со своим подключением из пула: чтения выполняются одновременно друг с другом
+    и с изменением, изменения - по очереди, в порядке вызова; фиксацию выполняют сами методы изменения,
+    при исключении изменения отменяются закрытием сессии"""
+
+    def __init__(self, user_id: int, session_manager: AsyncDatabaseSessionManager):
+        self.user_id = user_id
+        self.session_manager = session_manager
+        self._change_listeners: list[Callable[[CatalogChange], None]] = []
+        self.search_cache = SearchResultCache(SEARCH_CACHE_MAX_ROWS)
+        self._write_lock = asyncio.Lock()
+        # Увеличивается в начале и в конце каждого изменения (см. _ReadCache)
+        self._version = 0
+
+    def add_change_listener(self, listener: Callable[[CatalogChange], None]):
+        """Подписка на изменения жанров, авторов и книг пользователя"""
+        self._change_listeners.append(listener)
+
+    def _notify(self, change: CatalogChange):
+        for listener in self._change_listeners:
+            listener(change)
+
+    def search_cache_stats(self) -> SearchCacheStats:
+        """Счетчики попаданий и промахов кэша результатов поиска книг"""
+        return self.search_cache.stats()
+
+    def _manager(self, session: Session, search_cache: SearchResultCache | _ReadCache) -> UserDatabaseManager:
+        """UserDatabaseManager, выполняющий запросы в синхронной сессии AsyncSession"""
+        manager = UserDatabaseManager(self.user_id, SharedSessionManager(session))
+        manager.search_cache = search_cache
+        manager.add_change_listener(self._notify)
+        return manager
+
+    async def _read(self, method: str, *args, **kwargs) -> Any:
+        """Метод чтения UserDatabaseManager в отдельной сессии"""
+        search_cache = _ReadCache(self.search_cache, lambda: self._version)
+        async with self.session_manager.create_session() as session:
+            return await session.run_sync(
+                lambda sync_session: getattr(self._manager(sync_session, search_cache), method)(*args, **kwargs))
+
+    @asynccontextmanager
+    async def _exclusive_write(self) -> AsyncIterator[None]:
+        """Изменения выполняются по очереди, поэтому кэш результатов поиска и подписчики получают их
+        в порядке фиксации"""
+        async with self._write_lock:
+            self._version += 1
+            try:
+                yield
+            finally:
+                self._version += 1
+
+    async def _write(self, method: str, *args, **kwargs) -> Any:
+        """Метод изменения UserDatabaseManager в отдельной сессии"""
+        async with self._exclusive_write(), self.session_manager.create_session() as session:
+            return await session.run_sync(
+                lambda sync_session: getattr(self._manager(sync_session, self.search_cache), method)(*args, **kwargs))
+
+    async def load_catalog(self, sort_by: str | None = None) -> CatalogSnapshot:
+        """Жанры, авторы и первая страница книг; три запроса выполняются одновременно"""
+        genres, authors, books = await asyncio.gather(self.get_user_genres(), self.get_user_authors(),
+                                                      self.search_books_page(sort_by=sort_by))
+        return CatalogSnapshot(genres, authors, books)
+
+    async def get_user_authors(self) -> tuple[tuple, ...]:
+        return await self._read('get_user_authors')
+
+    async def get_user_genres(self) -> tuple[tuple, ...]:
+        return await self._read('get_user_genres')
+
+    async def search_books(self, title: str | None = None,
+                           author: str | None = None,
+                           genre: str | None = None,
+                           status: str | None = None,
+                           sort_by: str | None = None) -> Sequence[Row[tuple[Any, Any, Any, Any, Any]]]:
+        return await self._read('search_books', title, author, genre, status, sort_by)
+
+    async def search_books_page(self, title: str | None = None,
+                                author: str | None = None,
+                                genre: str | None = None,
+                                status: str | None = None,
+                                sort_by: str | None = None,
+                                after: str | None = None,
+                                limit: int = BOOKS_PAGE_SIZE) -> SearchPage:
+        return await self._read('search_books_page', title, author, genre, status, sort_by, after, limit)
+
+    async def search_genres(self, title: str) -> Sequence[Row[tuple[Any, Any]]]:
+        return await self._read('search_genres', title)
+
+    async def search_genres_page(self, title: str, after: str | None = None,
+                                 limit: int = TITLES_PAGE_SIZE) -> SearchPage:
+        return await self._read('search_genres_page', title, after, limit)
+
+    async def search_authors(self, title: str) -> Sequence[Row[tuple[Any, Any]]]:
+        return await self._read('search_authors', title)
+
+    async def search_authors_page(self, title: str, after: str | None = None,
+                                  limit: int = TITLES_PAGE_SIZE) -> SearchPage:
+        return await self._read('search_authors_page', title, after, limit)
+
+    async def get_statistics(self) -> LibraryStatistics:
+        return await self._read('get_statistics')
+
+    async def get_genre(self, genre_id: int) -> str:
+        return await self._read('get_genre', genre_id)
+
+    async def get_author(self, author_id: int) -> str:
+        return await self._read('get_author', author_id)
+
+    async def get_book(self, book_id: int) -> Row[tuple[Any, Any, Any, Any]]:
+        return await self._read('get_book', book_id)
+
+    async def export_csv(self, filename: str | TextIO,
+                         progress_callback: Callable[[int, int], bool] | None = None,
+                         chunk_size: int = EXPORT_CHUNK_SIZE) -> bool:
+        return await self._read('export_csv', filename, progress_callback, chunk_size)
+
+    async def add_genre(self, title: str):
+        await self._write('add_genre', title)
+
+    async def edit_genre(self, genre_id: int, title: str):
+        await self._write('edit_genre', genre_id, title)
+
+    async def delete_genre(self, genre_id: int):
+        await self._write('delete_genre', genre_id)
+
+    async def add_author(self, title: str):
+        await self._write('add_author', title)
+
+    async def edit_author(self, author_id: int, title: str):
+        await self._write('edit_author', author_id, title)
+
+    async def delete_author(self, author_id: int):
+        await self._write('delete_author', author_id)
+
+    async def add_book(self, title: str, author_id_book_fk: int, genre_id_book_fk: int, status: str):
+        await self._write('add_book', title, author_id_book_fk, genre_id_book_fk, status)
+
+    async def edit_book(self, book_id: int, title: str, author_id_book_fk: int, genre_id_book_fk: int, status: str):
+        await self._write('edit_book', book_id, title, author_id_book_fk, genre_id_book_fk, status)
+
+    async def delete_book(self, book_id: int):
+        await self._write('delete_book', book_id)
+
+    async def delete_books(self, book_ids: Sequence[int]):
+        await self._write('delete_books', book_ids)
+
+    async def update_books(self, book_ids: Sequence[int],
+                           status: str | None = None,
+                           author_id_book_fk: int | None = None,
+                           genre_id_book_fk: int | None = None):
+        await self._write('update_books', book_ids, status, author_id_book_fk, genre_id_book_fk)
+
+    async def import_csv(self, filename: str | BinaryIO,
+                         progress_callback: Callable[[int, int, int], bool] | None = None,
+                         chunk_rows: int = IMPORT_CHUNK_ROWS) -> CsvImportReport | None:
+        return await self._write('import_csv', filename, progress_callback, chunk_rows)
+
+    async def merge_csv(self, filename: str | BinaryIO,
+                        progress_callback: Callable[[int, int, int], bool] | None = None,
+                        chunk_rows: int = IMPORT_CHUNK_ROWS) -> CsvImportReport | None:
+        return await self._write('merge_csv', filename, progress_callback, chunk_rows)
+
+    async def clear_all_user_data(self):
+        await self._write('clear_all_user_data')
+
+    async def delete_account(self):
+        await self._write('delete_account')
+
+    async def run_maintenance(self) -> MaintenanceReport:
+        return await self._write('run_maintenance')
@@ -0,0 +1,118 @@
+"""Модель результатов поиска книг для списка и таблицы главного окна"""
+from typing import Any
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+from sqlalchemy import Row
+
+
+class BookTableModel(QAbstractTableModel):
+    """Модель поверх страниц, которые вернул UserDatabaseManager.search_books_page: (ИД, название, автор, жанр, статус);
+    Ячейки не создаются заранее - представление запрашивает данные только для видимых строк;
+    Когда представление прокручено до конца загруженных строк, модель запрашивает следующую страницу
+    сигналом page_requested(continuation), страница добавляется через append_page, а при ошибке загрузки
+    вызывается page_failed"""
+    HEADER = ('Название', 'Автор', 'Жанр', 'Статус')
+    page_requested = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[Row[tuple[Any, Any, Any, Any, Any]] | tuple] = []
+        self._continuation: str | None = None
+        self._page_requested = False
+
+    def set_rows(self, rows: list[Row[tuple[Any, Any, Any, Any, Any]] | tuple], continuation: str | None = None):
+        """Замена результата поиска первой страницей; append_page, insert_book и remove_book изменяют
+        список rows на месте"""
+        self.beginResetModel()
+        self._rows = rows
+        self._continuation = continuation
+        self._page_requested = False
+        self.endResetModel()
+
+    def append_page(self, rows: tuple, continuation: str | None):
+        """Добавление следующей страницы результата поиска"""
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+        self._continuation = continuation
+        self._page_requested = False
+
+    def page_failed(self):
+        """Страница не загружена: при следующей прокрутке до конца она будет запрошена снова"""
+        self._page_requested = False
+
+    def continuation(self) -> str | None:
+        """Позиция следующей страницы или None, если загружен весь результат поиска"""
+        return self._continuation
+
+    def has_more(self) -> bool:
+        """Есть ли еще не загруженные страницы"""
+        return self._continuation is not None
+
+    def insert_book(self, row: int, book: tuple):
+        """Добавление книги в строку row"""
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, book)
+        self.endInsertRows()
+
+    def remove_book(self, row: int):
+        """Удаление книги из строки row"""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
+
+    def replace_books(self, rows: list[Row[tuple[Any, Any, Any, Any, Any]] | tuple]):
+        """Замена загруженных строк за одно обновление представлений (список изменяется на месте);
+        Выделение и позиции прокрутки сохраняются для книг, которые остались в результате"""
+        self.layoutAboutToBeChanged.emit()
+        old_ids = [book[0] for book in self._rows]
+        new_rows = {book[0]: row for row, book in enumerate(rows)}
+        self._rows[:] = rows
+
+        old_indexes = self.persistentIndexList()
+        new_indexes = []
+        for index in old_indexes:
+            row = new_rows.get(old_ids[index.row()])
+            new_indexes.append(QModelIndex() if row is None else self.index(row, index.column()))
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def book_row(self, book_id: int) -> int | None:
+        """Номер строки книги с ИД book_id или None, если ее нет среди загруженных строк"""
+        for row, book in enumerate(self._rows):
+            if book[0] == book_id:
+                return row
+        return None
+
+    def book_id(self, row: int) -> int:
+        """Возвращает ИД книги в строке row"""
+        return self._rows[row][0]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADER)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self._rows[index.row()][index.column() + 1]
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADER[section]
+        return section + 1
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and self._continuation is not None and not self._page_requested
+
+    def fetchMore(self, parent: QModelIndex):
+        if not self.canFetchMore(parent):
+            return
+        # Страница загружается в фоновом потоке; до ее получения повторно не запрашивается
+        self._page_requested = True
+        self.page_requested.emit(self._continuation)
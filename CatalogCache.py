@@ -0,0 +1,74 @@
+"""Кэш каталога пользователя в памяти главного окна: жанры, авторы и фильтры текущего результата поиска книг;
+Обновляется по событиям CatalogChange от UserDatabaseManager без повторной загрузки из базы данных"""
+from bisect import bisect_left
+from typing import Iterable
+
+from UserDatabaseManager import BookSearchFilter
+
+
+class TitleCatalog:
+    """Жанры или авторы пользователя; порядок названий совпадает с порядком в выпадающих списках фильтров"""
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.titles: dict[int, str] = {}
+        self._sorted_titles: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def load(self, records: Iterable[tuple[str, int]]):
+        """Полная загрузка: records - пары (название, ИД), как возвращает get_user_genres / get_user_authors"""
+        self.ids = dict(sorted(records))
+        self.titles = {item_id: title for title, item_id in self.ids.items()}
+        self._sorted_titles = list(self.ids)
+
+    def sorted_titles(self) -> list[str]:
+        """Названия по алфавиту"""
+        return list(self._sorted_titles)
+
+    def title_at(self, position: int) -> str:
+        """Название в позиции position списка названий по алфавиту"""
+        return self._sorted_titles[position]
+
+    def position(self, title: str) -> int:
+        """Позиция названия в списке названий по алфавиту или позиция, на которую его нужно вставить"""
+        return bisect_left(self._sorted_titles, title)
+
+    def remove(self, item_id: int) -> int | None:
+        """Удаление записи; возвращает ее позицию в списке названий или None, если записи не было"""
+        title = self.titles.pop(item_id, None)
+        if title is None:
+            return None
+        del self.ids[title]
+        position = self.position(title)
+        del self._sorted_titles[position]
+        return position
+
+    def add(self, item_id: int, title: str) -> int:
+        """Добавление записи; возвращает ее позицию в списке названий"""
+        self.ids[title] = item_id
+        self.titles[item_id] = title
+        position = self.position(title)
+        self._sorted_titles.insert(position, title)
+        return position
+
+
+class CatalogCache:
+    """Каталог пользователя, который главное окно хранит между запросами"""
+
+    def __init__(self):
+        self.genres = TitleCatalog()
+        self.authors = TitleCatalog()
+        self.book_filter: BookSearchFilter | None = None
+
+    def book_row(self, book: tuple) -> tuple | None:
+        """Преобразует книгу из CatalogChange (ИД, название, ИД автора, ИД жанра, статус)
+        в строку результата поиска (ИД, название, автор, жанр, статус);
+        Возвращает None, если автора или жанра нет в кэше"""
+        book_id, title, author_id, genre_id, status = book
+        author = self.authors.titles.get(author_id)
+        genre = self.genres.titles.get(genre_id)
+        if author is None or genre is None:
+            return None
+        return book_id, title, author, genre, status
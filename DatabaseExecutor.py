@@ -0,0 +1,155 @@
+"""Выполнение запросов к базе данных в фоновом потоке"""
+import sys
+from typing import Any, Callable
+
+from PyQt6.QtCore import QObject, QThread, QMetaObject, Qt, pyqtSignal, pyqtSlot
+from UserDatabaseManager import UserDatabaseManager
+
+
+class DatabaseTask(QObject):
+    """Задача для фонового потока базы данных;
+    finished передает результат выполнения, failed - исключение, возникшее при выполнении,
+    progress - (выполнено, всего, подробности) для длительных задач: значения могут быть больше 2^31
+    (импорт csv передает байты файла), подробности - необязательное значение задачи (импорт - прочитано строк);
+    Сигналы отменённой задачи не вызываются"""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    progress = pyqtSignal(object, object, object)
+
+    def __init__(self, function: Callable[..., Any], args: tuple, key: str | None, kwargs: dict | None = None):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.key = key
+        self._cancelled = False
+
+    def cancel(self):
+        """Отмена задачи: если задача еще не начала выполняться, она будет пропущена,
+        иначе ее результат будет отброшен"""
+        self._cancelled = True
+
+    def is_cancelled(self) -> bool:
+        """Отменена ли задача"""
+        return self._cancelled
+
+    def report_progress(self, done: int, total: int, detail: Any = None) -> bool:
+        """Передача прогресса из фонового потока в поток интерфейса;
+        Возвращает False, если задача отменена и ее выполнение следует прервать"""
+        if self._cancelled:
+            return False
+        self.progress.emit(done, total, detail)
+        return True
+
+
+class _DatabaseWorker(QObject):
+    """Объект фонового потока: владеет собственным UserDatabaseManager (или RemoteUserDatabaseManager в режиме
+    клиента) и выполняет задачи по очереди;
+    Каждая задача - отдельная единица работы, после которой подключение возвращается в общий пул"""
+    task_done = pyqtSignal(object, object, object)
+    catalog_changed = pyqtSignal(object)
+
+    def __init__(self, manager_factory: Callable[[], UserDatabaseManager]):
+        super().__init__()
+        self.manager_factory = manager_factory
+        self.user_database_manager: UserDatabaseManager | None = None
+
+    @pyqtSlot(object)
+    def run(self, task: DatabaseTask):
+        """Выполнение задачи: вызывается одноименный task.function метод менеджера фонового потока;
+        Менеджер (и подключение к базе данных) создается в фоновом потоке при первой задаче"""
+        result, error = None, None
+        if not task.is_cancelled():
+            if self.user_database_manager is None:
+                self.user_database_manager = self.manager_factory()
+                self.user_database_manager.add_change_listener(self.catalog_changed.emit)
+            try:
+                method = getattr(self.user_database_manager, task.function.__name__)
+                result = method(*task.args, **task.kwargs)
+            except Exception as exception:
+                self.user_database_manager.rollback()
+                error = exception
+            finally:
+                self.user_database_manager.end_unit_of_work()
+        self.task_done.emit(task, result, error)
+
+    @pyqtSlot()
+    def close(self):
+        """Закрытие подключения к базе данных в том же потоке, где оно было создано"""
+        if self.user_database_manager is not None:
+            self.user_database_manager.close()
+
+
+class DatabaseExecutor(QObject):
+    """Очередь запросов к базе данных, выполняемых в отдельном потоке;
+    Окна передают в submit метод UserDatabaseManager, например executor.submit(UserDatabaseManager.search_genres,
+    title): фоновый поток вызывает одноименный метод менеджера, созданного manager_factory, - UserDatabaseManager
+    или RemoteUserDatabaseManager, если главное окно работает с сервером библиотеки;
+    catalog_changed передает в поток интерфейса CatalogChange раньше, чем finished изменившей каталог задачи"""
+    busy_changed = pyqtSignal(bool)
+    catalog_changed = pyqtSignal(object)
+    _task_submitted = pyqtSignal(object)
+
+    def __init__(self, manager_factory: Callable[[], UserDatabaseManager], parent: QObject | None = None):
+        super().__init__(parent)
+        self._pending: list[DatabaseTask] = []
+
+        self._thread = QThread()
+        self._worker = _DatabaseWorker(manager_factory)
+        self._worker.moveToThread(self._thread)
+        self._task_submitted.connect(self._worker.run)
+        self._worker.task_done.connect(self._on_task_done)
+        self._worker.catalog_changed.connect(self.catalog_changed)
+        self._thread.start()
+
+    def submit(self, function: Callable[..., Any], *args, key: str | None = None,
+               progress: bool = False) -> DatabaseTask:
+        """Постановка задачи в очередь;
+        Если задан key, все еще не завершенные задачи с тем же ключом отменяются (например, устаревший поиск);
+        При progress=True функция получает progress_callback=task.report_progress"""
+        if key is not None:
+            for pending_task in self._pending:
+                if pending_task.key == key:
+                    pending_task.cancel()
+
+        task = DatabaseTask(function, args, key)
+        if progress:
+            task.kwargs['progress_callback'] = task.report_progress
+        self._pending.append(task)
+        if len(self._pending) == 1:
+            self.busy_changed.emit(True)
+        self._task_submitted.emit(task)
+        return task
+
+    def has_pending(self, key: str) -> bool:
+        """Есть ли незавершенные и не отмененные задачи с ключом key"""
+        return any(task.key == key and not task.is_cancelled() for task in self._pending)
+
+    def is_busy(self) -> bool:
+        """Есть ли незавершенные задачи"""
+        return bool(self._pending)
+
+    def _on_task_done(self, task: DatabaseTask, result: Any, error: Exception | None):
+        """Передача результата задачи в поток интерфейса;
+        busy_changed(False) отправляется после обработки результата, если обработчики не поставили новых задач"""
+        self._pending.remove(task)
+        try:
+            if task.is_cancelled():
+                return
+            if error is None:
+                task.finished.emit(result)
+            elif task.receivers(task.failed) > 0:
+                task.failed.emit(error)
+            else:
+                sys.excepthook(type(error), error, error.__traceback__)
+        finally:
+            if not self._pending:
+                self.busy_changed.emit(False)
+
+    def shutdown(self):
+        """Отмена оставшихся задач, закрытие подключения к базе данных и остановка потока"""
+        for task in self._pending:
+            task.cancel()
+        QMetaObject.invokeMethod(self._worker, 'close', Qt.ConnectionType.BlockingQueuedConnection)
+        self._thread.quit()
+        self._thread.wait()
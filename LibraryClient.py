@@ -0,0 +1,178 @@
+"""Клиент локального сервера библиотеки (server.py): JSON поверх HTTP/1.1 через http.client;
+Модуль не зависит от SQLAlchemy и PyQt6, поэтому окно входа может использовать его сразу при запуске;
+Главное окно работает с сервером через RemoteUserDatabaseManager"""
+import http.client
+import json
+import threading
+from typing import Any, BinaryIO, Callable, Iterator, NamedTuple
+from urllib.parse import quote, urlsplit
+
+# Адрес сервера для главного окна; если переменная окружения не задана, приложение работает с файлом напрямую
+SERVER_URL_ENV = 'BOOKTRACKER_SERVER'
+# Ключ администратора сервера: без него сервер не выполняет обслуживание базы данных (POST /maintenance)
+ADMIN_TOKEN_ENV = 'BOOKTRACKER_ADMIN_TOKEN'
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Методы UserDatabaseManager, доступные через сервер: чтение (GET /read/<метод>, ответ с ETag)
+# и изменения (POST /write/<метод>, выполняются потоком записи сервера)
+READ_METHODS = frozenset({
+    'get_user_authors', 'get_user_genres', 'search_books', 'search_books_page', 'search_genres',
+    'search_genres_page', 'search_authors', 'search_authors_page', 'get_statistics', 'get_genre', 'get_author',
+    'get_book',
+})
+WRITE_METHODS = frozenset({
+    'add_genre', 'edit_genre', 'delete_genre', 'add_author', 'edit_author', 'delete_author', 'add_book',
+    'edit_book', 'delete_book', 'delete_books', 'update_books', 'clear_all_user_data', 'delete_account',
+})
+
+# Импорт большого файла сервер выполняет долго, поэтому ожидание ответа ограничено только этим значением
+REQUEST_TIMEOUT_SECONDS = 600
+# Размер порции при передаче файлов csv
+TRANSFER_CHUNK_BYTES = 256 * 1024
+
+
+class ServerError(Exception):
+    """Ошибка, о которой сообщил сервер: status - код ответа HTTP, kind - имя класса исключения на сервере"""
+
+    def __init__(self, status: int, kind: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.kind = kind
+
+
+class Response(NamedTuple):
+    """Ответ сервера: код, заголовки (имена в нижнем регистре) и тело"""
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+
+def read_arguments(args: tuple, kwargs: dict) -> str:
+    """Аргументы метода чтения в виде параметра строки запроса"""
+    return quote(json.dumps({'args': args, 'kwargs': kwargs}, ensure_ascii=False, separators=(',', ':')))
+
+
+class LibraryConnection:
+    """Подключение к серверу от имени пользователя, вошедшего с ключом token;
+    У каждого потока свое постоянное (keep-alive) HTTP-подключение"""
+
+    def __init__(self, url: str, token: str | None = None):
+        parts = urlsplit(url if '//' in url else f'http://{url}')
+        self.host = parts.hostname or DEFAULT_HOST
+        self.port = parts.port or DEFAULT_PORT
+        self.token = token
+        # ИД пользователя, от имени которого выполнен вход
+        self.user_id: int | None = None
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT_SECONDS)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Закрытие HTTP-подключения текущего потока"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def request(self, method: str, path: str, body: bytes | Iterator[bytes] | None = None,
+                headers: dict[str, str] | None = None, stream: bool = False) -> http.client.HTTPResponse | Response:
+        """Запрос к серверу; при stream=True возвращается непрочитанный ответ http.client;
+        При ошибке подключения оно закрывается, следующий запрос откроет новое"""
+        headers = dict(headers or {})
+        if self.token is not None:
+            headers['Authorization'] = f'Bearer {self.token}'
+        connection = self._connection()
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            if stream:
+                return response
+            return Response(response.status, {name.lower(): value for name, value in response.getheaders()},
+                            response.read())
+        except BaseException:
+            self.close()
+            raise
+
+    def call(self, method: str, path: str, payload: Any = None, headers: dict[str, str] | None = None,
+             expected: tuple[int, ...] = (http.client.OK,)) -> Response:
+        """Запрос с телом JSON; ответ с кодом не из expected превращается в ServerError"""
+        body = None
+        if payload is not None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            headers = {**(headers or {}), 'Content-Type': 'application/json'}
+        response = self.request(method, path, body, headers)
+        if response.status not in expected:
+            raise error_from_response(response)
+        return response
+
+    def upload(self, path: str, file: BinaryIO, size: int,
+               progress_callback: Callable[[int, int, int], bool] | None = None) -> Response | None:
+        """Передача файла размером size байт телом POST-запроса порциями TRANSFER_CHUNK_BYTES;
+        После каждой порции вызывается progress_callback(передано байт, size, передано строк):
+        если он вернул False, подключение разрывается (сервер отбрасывает неполное тело) и возвращается None"""
+        cancelled = False
+
+        def chunks() -> Iterator[bytes]:
+            nonlocal cancelled
+            sent, lines = 0, 0
+            while chunk := file.read(TRANSFER_CHUNK_BYTES):
+                yield chunk
+                sent += len(chunk)
+                lines += chunk.count(b'\n')
+                if progress_callback is not None and not progress_callback(sent, size, lines):
+                    cancelled = True
+                    raise ConnectionAbortedError('передача прервана')
+
+        try:
+            response = self.request('POST', path, chunks(), {'Content-Type': 'text/csv',
+                                                             'Content-Length': str(size)})
+        except ConnectionAbortedError:
+            if cancelled:
+                return None
+            raise
+        if response.status != http.client.OK:
+            raise error_from_response(response)
+        return response
+
+
+def error_from_response(response: Response) -> ServerError:
+    """ServerError по ответу с ошибкой {"error": имя класса, "message": текст}"""
+    try:
+        error = response.json()
+        return ServerError(response.status, error['error'], error['message'])
+    except (ValueError, TypeError, KeyError):
+        return ServerError(response.status, 'HTTPError', f'HTTP {response.status}')
+
+
+def _sign_in(url: str, path: str, username: str, password: str, rejected: int) -> LibraryConnection | None:
+    connection = LibraryConnection(url)
+    response = connection.call('POST', path, {'username': username, 'password': password},
+                               expected=(http.client.OK, rejected))
+    connection.close()
+    if response.status == rejected:
+        return None
+    result = response.json()
+    connection.token = result['token']
+    connection.user_id = result['user_id']
+    return connection
+
+
+def login(url: str, username: str, password: str) -> LibraryConnection | None:
+    """Вход на сервере url; возвращает подключение с ключом сессии (ИД пользователя - user_id)
+    или None, если имя или пароль неверны"""
+    return _sign_in(url, '/login', username, password, http.client.UNAUTHORIZED)
+
+
+def register(url: str, username: str, password: str) -> LibraryConnection | None:
+    """Регистрация на сервере url и вход; None, если имя уже занято"""
+    return _sign_in(url, '/register', username, password, http.client.CONFLICT)
@@ -1,45 +1,74 @@
 """Реализация окна для входа в аккаунт"""
+import sqlite3
+import threading
+from typing import Any, Callable
+
+from LibraryClient import ServerError
+from PyQt6.QtCore import pyqtSignal, pyqtBoundSignal
 from PyQt6.QtWidgets import QWidget
-from database.models import User, ENGINE
-from sqlalchemy import select
-from sqlalchemy.orm import sessionmaker
 from ui import LoginWindow_ui
 
 
 class LoginWindow(QWidget, LoginWindow_ui.Ui_Form):
-    """Окно для входа в аккаунт"""
+    """Окно для входа в аккаунт; вход и регистрацию выполняет AppManager: через sqlite3 (database/startup.py)
+    или на сервере библиотеки (LibraryClient.py), поэтому окну не нужны SQLAlchemy и ORM-модели,
+    которые в это время загружаются в фоне;
+    Проверка пароля (вычисление хэша) выполняется в фоновом потоке, окно в это время не блокируется"""
+    # Результаты фоновых запросов: ИД пользователя или None
+    login_finished = pyqtSignal(object)
+    sign_up_finished = pyqtSignal(object)
+    # Ошибка базы данных, подключения к серверу или непредвиденная ошибка в фоновом запросе
+    failed = pyqtSignal(object)
+    # Завершение фонового запроса (с любым исходом), после которого кнопки окна снова включаются
+    background_finished = pyqtSignal()
 
     def __init__(self, app_manager):
         super().__init__()
         self.setupUi(self)
         self.app_manager = app_manager
-        session_maker = sessionmaker(bind=ENGINE)
-        self.session = session_maker()
 
         self.login_errorLabel.setStyleSheet('color: red')
         self.signUp_errorLabel.setStyleSheet('color: red')
 
         self.loginButton.clicked.connect(self.login)
         self.signUpButton.clicked.connect(self.register_user)
+        self.login_finished.connect(self._on_login_finished)
+        self.sign_up_finished.connect(self._on_sign_up_finished)
+        self.failed.connect(self._on_failed)
+        self.background_finished.connect(lambda: self._set_busy(False))
+
+    def _run_in_background(self, signal: pyqtBoundSignal, function: Callable[..., Any], *args):
+        """Выполнение function(*args) в фоновом потоке; результат передается в поток интерфейса сигналом signal,
+        кнопки окна на это время выключаются и включаются после завершения запроса с любым исходом;
+        Сигналы доставляются в поток интерфейса по порядку, поэтому кнопки включаются после обработки результата"""
+        def run():
+            try:
+                result = function(*args)
+            except Exception as error:
+                self.failed.emit(error)
+            else:
+                signal.emit(result)
+            finally:
+                self.background_finished.emit()
+
+        self._set_busy(True)
+        threading.Thread(target=run, name='login', daemon=True).start()
+
+    def _set_busy(self, busy: bool):
+        self.loginButton.setDisabled(busy)
+        self.signUpButton.setDisabled(busy)
 
     def login(self):
         """Слот для входа в аккаунт"""
         username, password = self.login_usernameEdit.text(), self.login_passwordEdit.text()
+        self._run_in_background(self.login_finished, self.app_manager.authenticate, username, password)
 
-        statement = select(User.username, User.password, User.UserId).select_from(User).where(
-            User.username == f'{username}')
-        record = self.session.execute(statement).first()
-
-        if record is None:
+    def _on_login_finished(self, user_id: int | None):
+        if user_id is None:
             self.login_errorLabel.setText('Неверное имя пользователя или пароль')
         else:
-            clue_username, clue_password, user_id = record
-            if clue_username == username and clue_password == password:
-                user = self.session.query(User).filter(User.UserId == f'{user_id}').first()
-                self.login_errorLabel.setText('')
-                self.app_manager.show_main_menu(user.UserId)
-            else:
-                self.login_errorLabel.setText('Неверное имя пользователя или пароль')
+            self.login_errorLabel.setText('')
+            self.app_manager.show_main_menu(user_id)
 
     def register_user(self):
         """Слот для регистрации"""
@@ -56,18 +85,19 @@ class LoginWindow(QWidget, LoginWindow_ui.Ui_Form):
             self.signUp_errorLabel.setText('Введенные пароли не совпадают')
             return
 
-        statement = select(User.username).select_from(User).where(User.username == f'{username}')
-        existing_username = self.session.execute(statement).first()
+        self._run_in_background(self.sign_up_finished, self.app_manager.register, username, password)
 
-        if existing_username is None:
-            new_user = User(username=username, password=password)
-            self.session.add(new_user)
-            self.session.commit()
+    def _on_sign_up_finished(self, new_user_id: int | None):
+        if new_user_id is not None:
             self.signUp_errorLabel.setText('')
-            self.app_manager.show_main_menu(new_user.UserId)
+            self.app_manager.show_main_menu(new_user_id)
         else:
             self.signUp_errorLabel.setText('Пользователь с таким именем уже существует')
 
-    def closeEvent(self, a0):
-        """При закрытии окна закрывается подключение к базе данных"""
-        self.session.close()
+    def _on_failed(self, error: Exception):
+        if isinstance(error, OSError):
+            self.login_errorLabel.setText(f'Нет подключения к серверу: {error}')
+        elif isinstance(error, (sqlite3.Error, ServerError)):
+            self.login_errorLabel.setText(f'Ошибка базы данных: {error}')
+        else:
+            self.login_errorLabel.setText(f'Непредвиденная ошибка: {type(error).__name__}: {error}')
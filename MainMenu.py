@@ -1,34 +1,69 @@
 """Реализация главного окна"""
-from typing import Any, Sequence
+from bisect import bisect_right
+from typing import Any, Callable, Sequence
 
 from AddForms import AddBook, AddGenre, AddAuthor, FormMode
-from PyQt6.QtCore import Qt, pyqtSignal, pyqtBoundSignal
+from BookTableModel import BookTableModel
+from CatalogCache import CatalogCache
+from DatabaseExecutor import DatabaseExecutor, DatabaseTask
+from database.fulltext import is_refinement, matches_title, title_matcher
+from database.maintenance import MaintenanceReport
+from LibraryClient import ServerError
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal, pyqtBoundSignal
 from PyQt6.QtGui import QAction, QPixmap
-from PyQt6.QtWidgets import QMainWindow, QMenu, QTableWidget, QTableWidgetItem, QMessageBox, QFileDialog
-from UserDatabaseManager import UserDatabaseManager, GenreInUseError, AuthorInUseError
+from PyQt6.QtWidgets import QMainWindow, QMenu, QAbstractItemView, QInputDialog, QMessageBox, QFileDialog, \
+    QProgressBar, QProgressDialog, QCheckBox, QListWidget, QLineEdit, QHeaderView, QTableWidget, \
+    QTableWidgetItem
+from UserDatabaseManager import UserDatabaseManager, GenreInUseError, AuthorInUseError, CsvImportError, \
+    CsvImportReport, CatalogChange, BookSearchFilter, SearchPage, LibraryStatistics, RELEVANCE_SORT
 from sqlalchemy import Row
+from sqlalchemy.exc import OperationalError
+from TitleListModel import TitleListModel, attach_title_combo_box
 from ui import MainMenu_ui
 
 
 class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
     """Главное окно приложения"""
-
-    def __init__(self, app_manager, user_id: int):
+    # Количество строк, по которым подбирается ширина столбцов таблицы книг
+    COLUMN_SIZE_SAMPLE = 100
+    # Задержка поиска при вводе текста, мс: запрос отправляется, когда пользователь перестал печатать
+    SEARCH_DEBOUNCE_MS = 250
+    # Количество шагов индикатора прогресса импорта csv
+    IMPORT_PROGRESS_STEPS = 1000
+
+    def __init__(self, app_manager, user_id: int, manager_factory: Callable[[], UserDatabaseManager]):
         super().__init__()
         self.setupUi(self)
         self.app_manager = app_manager
         self.user_id = user_id
-        self.user_database_manager = UserDatabaseManager(user_id)
-        self.user_genres: dict[str, int] = dict(self.user_database_manager.get_user_genres())
-        self.user_authors: dict[str, int] = dict(self.user_database_manager.get_user_authors())
-        self.clue_genre_data: Sequence[Row[tuple[Any, Any]]] | None = None
-        self.clue_author_data: Sequence[Row[tuple[Any, Any]]] | None = None
-        self.clue_book_data: Sequence[Row[tuple[Any, Any, Any, Any, Any]]] | None = None
+        # Все запросы к базе данных выполняются в фоновом потоке менеджером, который создает manager_factory:
+        # UserDatabaseManager с общим менеджером сессий приложения или RemoteUserDatabaseManager в режиме клиента
+        self.database_executor = DatabaseExecutor(manager_factory, self)
+        # Жанры и авторы пользователя и фильтры результата поиска книг; изменения каталога применяются к кэшу
+        # и виджетам по событиям catalog_changed, без повторных запросов
+        self.catalog = CatalogCache()
+        self.database_executor.catalog_changed.connect(self._on_catalog_changed)
+        # Общие модели жанров и авторов для выпадающих списков фильтров и окон книг
+        self.genre_list_model = TitleListModel(self.catalog.genres, self)
+        self.author_list_model = TitleListModel(self.catalog.authors, self)
+        self.clue_genre_data: list[Row[tuple[Any, Any]] | tuple] | None = None
+        self.clue_author_data: list[Row[tuple[Any, Any]] | tuple] | None = None
+        self.clue_book_data: list[Row[tuple[Any, Any, Any, Any, Any]] | tuple] | None = None
+        self.genre_search_title = ''
+        self.author_search_title = ''
 
         # Переключение между search-страницами
         self.showBookSearchingAction.triggered.connect(self.show_book_searching)
         self.showGenreSearchingAction.triggered.connect(self.show_genre_searching)
         self.showAuthorSearchingAction.triggered.connect(self.show_author_searching)
+        self.showStatisticsAction.triggered.connect(self.show_statistics)
+
+        # Таблицы статистики только для чтения
+        for table in (self.statusStatisticsTable, self.genreStatisticsTable, self.authorStatisticsTable):
+            table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+            table.verticalHeader().setVisible(False)
+            table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+            table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
 
         # Подключаем слоты для страницы поиска книг
         self.filterNameCheckBox.toggled.connect(self.config_filter_name_edit)
@@ -36,30 +71,46 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
         self.filterGenreCheckBox.toggled.connect(self.config_filter_genre_combo_box)
         self.filterStatusCheckBox.toggled.connect(self.config_filter_status_combo_box)
         self.searchBooksButton.clicked.connect(self.search_books)
+        self._create_search_timer(self.filterNameEdit, self.search_books_as_you_type)
 
         # Настраиваем страницу для поиска книг
+        self.sortComboBox.addItem(RELEVANCE_SORT)
+        attach_title_combo_box(self.filterAuthorComboBox, self.author_list_model)
+        attach_title_combo_box(self.filterGenreComboBox, self.genre_list_model)
         self.config_filter_name_edit()
         self.config_filter_author_combo_box()
         self.config_filter_genre_combo_box()
         self.config_filter_status_combo_box()
         self.update_book_searching()
 
-        # Настраиваем таблицу и список книг
-        self.bookListWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.bookListWidget.customContextMenuRequested.connect(self.show_book_list_widget_context_menu)
-        self.bookTableWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.bookTableWidget.customContextMenuRequested.connect(self.show_book_table_widget_context_menu)
-        self.bookTableWidget.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        # Настраиваем таблицу и список книг: оба представления работают с одной моделью
+        self.book_table_model = BookTableModel(self)
+        self.book_table_model.page_requested.connect(self._fetch_books_page)
+        self.bookListView.setModel(self.book_table_model)
+        self.bookListView.setModelColumn(0)
+        self.bookListView.setUniformItemSizes(True)
+        self.bookTableView.setModel(self.book_table_model)
+        self.bookTableView.horizontalHeader().setResizeContentsPrecision(self.COLUMN_SIZE_SAMPLE)
+        self.bookListView.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.bookListView.customContextMenuRequested.connect(self.show_book_list_view_context_menu)
+        self.bookTableView.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.bookTableView.customContextMenuRequested.connect(self.show_book_table_view_context_menu)
+        # Выбор нескольких книг для пакетных действий (Ctrl / Shift)
+        self.bookListView.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.bookTableView.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.bookTableView.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
 
         # Настраиваем страницу для поиска жанров
         self.genreListWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.genreListWidget.customContextMenuRequested.connect(self.show_genre_list_widget_context_menu)
         self.searchGenresButton.clicked.connect(self.search_genres)
+        self._create_search_timer(self.genreEdit, self.search_genres_as_you_type)
 
         # Настраиваем страницу для поиска авторов
         self.authorListWidget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.authorListWidget.customContextMenuRequested.connect(self.show_author_list_widget_context_menu)
         self.searchAuthorsButton.clicked.connect(self.search_authors)
+        self._create_search_timer(self.authorEdit, self.search_authors_as_you_type)
 
         # Настраиваем триггеры для главного меню
         self.addGenreAction.triggered.connect(self.add_genre)
@@ -67,32 +118,153 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
         self.addBookAction.triggered.connect(self.add_book)
         self.export_csv_action.triggered.connect(self.export_csv)
         self.import_csv_action.triggered.connect(self.import_csv)
+        self.maintenanceAction.triggered.connect(self.run_maintenance)
 
         self.load_app_images()
 
         self.statusBar().setStyleSheet('color: red')
 
+        # Индикатор выполнения запросов к базе данных
+        self.busy_indicator = QProgressBar(self)
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(100)
+        self.busy_indicator.hide()
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+        self.database_executor.busy_changed.connect(self.busy_indicator.setVisible)
+
+        self.update_user_genres()
+        self.update_user_authors()
+
+    def _create_search_timer(self, line_edit: QLineEdit, search) -> QTimer:
+        """Поиск при вводе текста в line_edit: каждое изменение текста откладывает поиск на SEARCH_DEBOUNCE_MS"""
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        timer.timeout.connect(search)
+        line_edit.textChanged.connect(lambda: timer.start())
+        return timer
+
     def load_app_images(self):
         """Загрузка изображения для приложения"""
         self.filter_image_label.setPixmap(QPixmap('app_images/icons8-filter-48.png'))
 
     def update_user_genres(self):
         """При обновлении списка жанров пользователя делаем соответствующие изменения"""
-        self.user_genres: dict[str, int] = dict(self.user_database_manager.get_user_genres())
+        task = self.database_executor.submit(UserDatabaseManager.get_user_genres, key='get_user_genres')
+        task.finished.connect(self._on_user_genres_loaded)
+
+    def _on_user_genres_loaded(self, user_genres: tuple[tuple, ...]):
+        self.genre_list_model.load(user_genres)
         self.search_genres()
         self.update_book_searching()
 
     def update_user_authors(self):
         """При обновлении списка авторов пользователя делаем соответствующие изменения"""
-        self.user_authors: dict[str, int] = dict(self.user_database_manager.get_user_authors())
+        task = self.database_executor.submit(UserDatabaseManager.get_user_authors, key='get_user_authors')
+        task.finished.connect(self._on_user_authors_loaded)
+
+    def _on_user_authors_loaded(self, user_authors: tuple[tuple, ...]):
+        self.author_list_model.load(user_authors)
         self.search_authors()
         self.update_book_searching()
 
+    def reload_catalog(self):
+        """Полная загрузка каталога, когда данные пользователя заменены целиком (например, импортом csv)"""
+        self.update_user_genres()
+        self.update_user_authors()
+        self.search_books()
+
+    def _on_catalog_changed(self, change: CatalogChange):
+        """Применение изменения каталога к кэшу, выпадающим спискам фильтров и показанным результатам поиска"""
+        if change.kind == 'genre':
+            self._apply_title_change(change, self.genre_list_model, self.filterGenreCheckBox, self.genreListWidget,
+                                     self.clue_genre_data, self.genre_search_title)
+        elif change.kind == 'author':
+            self._apply_title_change(change, self.author_list_model, self.filterAuthorCheckBox,
+                                     self.authorListWidget, self.clue_author_data, self.author_search_title)
+        elif change.kind == 'book':
+            self._apply_book_change(change)
+        elif change.kind == 'books':
+            self._apply_books_change(change)
+        else:
+            self.reload_catalog()
+
+        if self.stackedWidget.currentWidget() is self.statisticsPage:
+            self.load_statistics()
+
+    @staticmethod
+    def _apply_title_change(change: CatalogChange, model: TitleListModel, check_box: QCheckBox,
+                            list_widget: QListWidget, found: list[Row[tuple[Any, Any]] | tuple] | None,
+                            search_title: str):
+        """Изменение жанра или автора: строки общей модели выпадающих списков и результата поиска добавляются
+        и удаляются по одной, порядок по названию сохраняется"""
+        if change.removed_id is not None:
+            model.remove(change.removed_id)
+        if change.added is not None:
+            model.add(*change.added)
+        check_box.setEnabled(model.rowCount() > 0)
+
+        if found is None:
+            return
+        if change.removed_id is not None:
+            for row, record in enumerate(found):
+                if record[0] == change.removed_id:
+                    del found[row]
+                    list_widget.takeItem(row)
+                    break
+        if change.added is not None and matches_title(search_title, change.added[1]):
+            row = bisect_right(found, change.added[1], key=lambda record: record[1])
+            found.insert(row, change.added)
+            list_widget.insertItem(row, change.added[1])
+
+    def _apply_book_change(self, change: CatalogChange):
+        """Изменение книги: строка результата поиска удаляется, добавляется или перемещается на место по сортировке"""
+        if self.clue_book_data is None or self.catalog.book_filter is None:
+            return
+        if change.added is not None:
+            book = self.catalog.book_row(change.added)
+            if book is None:
+                # Автора или жанра книги нет среди авторов и жанров пользователя - строку нельзя собрать из кэша
+                self.search_books()
+                return
+        else:
+            book = None
+
+        if change.removed_id is not None:
+            row = self.book_table_model.book_row(change.removed_id)
+            if row is not None:
+                self.book_table_model.remove_book(row)
+        if book is not None and self.catalog.book_filter.matches(book):
+            position = self.catalog.book_filter.position(self.clue_book_data, book)
+            # Книга после последней загруженной строки придет с одной из следующих страниц
+            if position < len(self.clue_book_data) or not self.book_table_model.has_more():
+                self.book_table_model.insert_book(position, book)
+
+        if not self.clue_book_data:
+            self.statusBar().showMessage('Не найдено ни одной книги')
+
+    def _apply_books_change(self, change: CatalogChange):
+        """Пакетное изменение книг: новый результат поиска собирается в памяти и показывается за одно обновление"""
+        if self.clue_book_data is None or self.catalog.book_filter is None:
+            return
+        removed_ids = set(change.removed_ids)
+        books = [book for book in self.clue_book_data if book[0] not in removed_ids]
+        for added in change.added or ():
+            book = self.catalog.book_row(added)
+            if book is None:
+                self.search_books()
+                return
+            if self.catalog.book_filter.matches(book):
+                position = self.catalog.book_filter.position(books, book)
+                if position < len(books) or not self.book_table_model.has_more():
+                    books.insert(position, book)
+        self.book_table_model.replace_books(books)
+
+        if not self.clue_book_data:
+            self.statusBar().showMessage('Не найдено ни одной книги')
+
     def update_book_searching(self):
         """Обновляем состояние виджетов для фильтрации по жанру / автору при изменении списка жанров / авторов"""
-        self.load_author_combo_box()
-        self.load_genre_combo_box()
-
         if self.filterAuthorComboBox.count() == 0:
             self.filterAuthorCheckBox.setDisabled(True)
         else:
@@ -115,15 +287,31 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
         """Переключение на страницу поиска авторов"""
         self.stackedWidget.setCurrentIndex(2)
 
-    def load_author_combo_box(self):
-        """Обновляем выпадающий список авторов"""
-        self.filterAuthorComboBox.clear()
-        self.filterAuthorComboBox.addItems(self.user_authors.keys())
-
-    def load_genre_combo_box(self):
-        """Обновляем выпадающий список жанров"""
-        self.filterGenreComboBox.clear()
-        self.filterGenreComboBox.addItems(self.user_genres.keys())
+    def show_statistics(self):
+        """Переключение на страницу статистики библиотеки"""
+        self.stackedWidget.setCurrentWidget(self.statisticsPage)
+        self.load_statistics()
+
+    def load_statistics(self):
+        """Загрузка статистики по счетчикам книг; запрос не просматривает книги, поэтому выполняется
+        при каждом открытии страницы и при изменениях каталога, пока страница открыта"""
+        task = self.database_executor.submit(UserDatabaseManager.get_statistics, key='get_statistics')
+        task.finished.connect(self._on_statistics_loaded)
+
+    def _on_statistics_loaded(self, statistics: LibraryStatistics):
+        self.totalBooksLabel.setText(f'Всего книг: {statistics.books}')
+        self._fill_statistics_table(self.statusStatisticsTable, statistics.statuses)
+        self._fill_statistics_table(self.genreStatisticsTable, statistics.genres)
+        self._fill_statistics_table(self.authorStatisticsTable, statistics.authors)
+
+    @staticmethod
+    def _fill_statistics_table(table: QTableWidget, groups: tuple[tuple[str, int], ...]):
+        table.setRowCount(len(groups))
+        for row, (title, books) in enumerate(groups):
+            table.setItem(row, 0, QTableWidgetItem(title))
+            count_item = QTableWidgetItem(str(books))
+            count_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            table.setItem(row, 1, count_item)
 
     def config_filter_name_edit(self):
         """Если галочка на фильтрацию по названию включена, даем возможность пользователю задавать название"""
@@ -162,7 +350,23 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
     def search_genres(self):
         """Слот для поиска жанров"""
         title = self.genreEdit.text()
-        self.clue_genre_data = self.user_database_manager.search_genres(title)
+        task = self.database_executor.submit(UserDatabaseManager.search_genres, title, key='search_genres')
+        task.finished.connect(lambda clue_genre_data: self._on_genres_found(clue_genre_data, title))
+
+    def search_genres_as_you_type(self):
+        """Поиск жанров при вводе: если строка поиска дописана к предыдущей, предыдущий результат
+        фильтруется в памяти без запроса к базе данных"""
+        title = self.genreEdit.text()
+        if (self.clue_genre_data is None or self.database_executor.has_pending('search_genres')
+                or not is_refinement(self.genre_search_title, title)):
+            self.search_genres()
+            return
+        matches = title_matcher(title)
+        self._on_genres_found([genre for genre in self.clue_genre_data if matches(genre[1])], title)
+
+    def _on_genres_found(self, clue_genre_data: Sequence[Row[tuple[Any, Any]]], title: str):
+        self.clue_genre_data = list(clue_genre_data)
+        self.genre_search_title = title
         self.update_genre_list_widget_data()
 
     def update_genre_list_widget_data(self):
@@ -176,15 +380,15 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
 
     def add_genre(self):
         """Вызов окна на добавление жанра"""
-        add_genre_widget = AddGenre(self, Qt.WindowType.Window, FormMode.Add, self.user_id)
+        add_genre_widget = AddGenre(self, Qt.WindowType.Window, FormMode.Add, self.database_executor)
         add_genre_widget.show()
 
     def edit_genre(self):
         """Вызов окна на редактирование жанра"""
         selected_index = self.genreListWidget.selectedIndexes()[0].row()
-        genre_id: Any | int = self.clue_genre_data[selected_index][0]
-        add_genre_widget = AddGenre(self, Qt.WindowType.Window, FormMode.Edit, self.user_id)
-        add_genre_widget.load_genre(genre_id)
+        genre_id, genre_title = self.clue_genre_data[selected_index]
+        add_genre_widget = AddGenre(self, Qt.WindowType.Window, FormMode.Edit, self.database_executor)
+        add_genre_widget.load_genre(genre_id, genre_title)
         add_genre_widget.show()
 
     def delete_genre(self):
@@ -197,12 +401,14 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
                                      buttons=QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
 
         if valid == QMessageBox.StandardButton.Yes:
-            try:
-                self.user_database_manager.delete_genre(genre_id)
-                self.update_user_genres()
-            except GenreInUseError:
-                QMessageBox.warning(self, 'Ошибка',
-                                    f'Невозможно удалить жанр "{genre_title}", так как есть книги с этим жанром')
+            task = self.database_executor.submit(UserDatabaseManager.delete_genre, genre_id)
+            task.failed.connect(lambda error: self._on_delete_genre_failed(error, genre_title))
+
+    def _on_delete_genre_failed(self, error: Exception, genre_title: str):
+        if not isinstance(error, GenreInUseError):
+            raise error
+        QMessageBox.warning(self, 'Ошибка',
+                            f'Невозможно удалить жанр "{genre_title}", так как есть книги с этим жанром')
 
     def show_author_list_widget_context_menu(self, pos):
         """Контекстное меню для списка авторов"""
@@ -225,7 +431,23 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
     def search_authors(self):
         """Слот для поиска авторов"""
         title = self.authorEdit.text()
-        self.clue_author_data = self.user_database_manager.search_authors(title)
+        task = self.database_executor.submit(UserDatabaseManager.search_authors, title, key='search_authors')
+        task.finished.connect(lambda clue_author_data: self._on_authors_found(clue_author_data, title))
+
+    def search_authors_as_you_type(self):
+        """Поиск авторов при вводе: если строка поиска дописана к предыдущей, предыдущий результат
+        фильтруется в памяти без запроса к базе данных"""
+        title = self.authorEdit.text()
+        if (self.clue_author_data is None or self.database_executor.has_pending('search_authors')
+                or not is_refinement(self.author_search_title, title)):
+            self.search_authors()
+            return
+        matches = title_matcher(title)
+        self._on_authors_found([author for author in self.clue_author_data if matches(author[1])], title)
+
+    def _on_authors_found(self, clue_author_data: Sequence[Row[tuple[Any, Any]]], title: str):
+        self.clue_author_data = list(clue_author_data)
+        self.author_search_title = title
         self.update_author_list_widget_data()
 
     def update_author_list_widget_data(self):
@@ -239,15 +461,15 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
 
     def add_author(self):
         """Вызов окна на добавление автора"""
-        add_author_widget = AddAuthor(self, Qt.WindowType.Window, FormMode.Add, self.user_id)
+        add_author_widget = AddAuthor(self, Qt.WindowType.Window, FormMode.Add, self.database_executor)
         add_author_widget.show()
 
     def edit_author(self):
         """Вызов окна на редактирование жанра"""
         selected_index = self.authorListWidget.selectedIndexes()[0].row()
-        author_id: Any | int = self.clue_author_data[selected_index][0]
-        add_author_widget = AddAuthor(self, Qt.WindowType.Window, FormMode.Edit, self.user_id)
-        add_author_widget.load_author(author_id)
+        author_id, author_title = self.clue_author_data[selected_index]
+        add_author_widget = AddAuthor(self, Qt.WindowType.Window, FormMode.Edit, self.database_executor)
+        add_author_widget.load_author(author_id, author_title)
         add_author_widget.show()
 
     def delete_author(self):
@@ -260,176 +482,336 @@ class MainMenu(QMainWindow, MainMenu_ui.Ui_MainWindow):
                                      buttons=QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
 
         if valid == QMessageBox.StandardButton.Yes:
-            try:
-                self.user_database_manager.delete_author(author_id)
-                self.update_user_authors()
-            except AuthorInUseError:
-                QMessageBox.warning(self, 'Ошибка',
-                                    f'Невозможно удалить автора "{author_title}", так как есть книги с этим автором')
-
-    def search_books(self):
-        """Слот для поиска книг"""
+            task = self.database_executor.submit(UserDatabaseManager.delete_author, author_id)
+            task.failed.connect(lambda error: self._on_delete_author_failed(error, author_title))
+
+    def _on_delete_author_failed(self, error: Exception, author_title: str):
+        if not isinstance(error, AuthorInUseError):
+            raise error
+        QMessageBox.warning(self, 'Ошибка',
+                            f'Невозможно удалить автора "{author_title}", так как есть книги с этим автором')
+
+    def _book_search_filter(self) -> BookSearchFilter:
+        """Фильтры поиска книг, заданные пользователем"""
         title = self.filterNameEdit.text().lower() if self.filterNameCheckBox.isChecked() else None
         author = self.filterAuthorComboBox.currentText().lower() if self.filterAuthorCheckBox.isChecked() else None
         genre = self.filterGenreComboBox.currentText().lower() if self.filterGenreCheckBox.isChecked() else None
         status = self.filterStatusComboBox.currentText() if self.filterStatusCheckBox.isChecked() else None
         sort = self.sortComboBox.currentText()
+        return BookSearchFilter(title, author, genre, status, sort)
 
-        self.clue_book_data = self.user_database_manager.search_books(title, author, genre, status, sort)
+    def search_books(self) -> DatabaseTask:
+        """Слот для поиска книг"""
+        book_filter = self._book_search_filter()
+        task = self.database_executor.submit(UserDatabaseManager.search_books_page, *book_filter, key='search_books')
+        task.finished.connect(lambda page: self._on_books_found(page.rows, book_filter, page.continuation))
+        return task
+
+    def _fetch_books_page(self, continuation: str):
+        """Загрузка следующей страницы результата поиска книг при прокрутке"""
+        book_filter = self.catalog.book_filter
+        task = self.database_executor.submit(UserDatabaseManager.search_books_page, *book_filter, continuation,
+                                             key='search_books_page')
+        task.finished.connect(lambda page: self._on_books_page_found(page, book_filter, continuation))
+        task.failed.connect(lambda error: self._on_books_page_failed(error, book_filter, continuation))
+
+    def _on_books_page_found(self, page: SearchPage, book_filter: BookSearchFilter, continuation: str):
+        # Страница устаревшего поиска отбрасывается
+        if self.catalog.book_filter is book_filter and self.book_table_model.continuation() == continuation:
+            self.book_table_model.append_page(page.rows, page.continuation)
+
+    def _on_books_page_failed(self, error: Exception, book_filter: BookSearchFilter, continuation: str):
+        if self.catalog.book_filter is book_filter and self.book_table_model.continuation() == continuation:
+            self.book_table_model.page_failed()
+        if not isinstance(error, (OperationalError, ServerError)):
+            raise error
+        self.statusBar().showMessage('Не удалось загрузить следующую страницу книг', 5000)
+
+    def search_books_as_you_type(self):
+        """Поиск книг при вводе названия: если остальные фильтры не изменились, а строка поиска дописана
+        к предыдущей, предыдущий результат фильтруется в памяти без запроса к базе данных"""
+        book_filter = self._book_search_filter()
+        previous_filter = self.catalog.book_filter
+        # Фильтровать в памяти можно только полностью загруженный результат
+        if (self.clue_book_data is None or previous_filter is None or self.book_table_model.has_more()
+                or self.database_executor.has_pending('search_books') or not book_filter.narrows(previous_filter)):
+            self.search_books()
+            return
+        books = self.clue_book_data
+        if book_filter.title is not None and book_filter.title != previous_filter.title:
+            matches = title_matcher(book_filter.title)
+            books = [book for book in books if matches(book[1])]
+        self._on_books_found(books, book_filter)
+
+    def _on_books_found(self, clue_book_data: Sequence[Row[tuple[Any, Any, Any, Any, Any]]],
+                        book_filter: BookSearchFilter, continuation: str | None = None):
+        self.clue_book_data = list(clue_book_data)
+        self.catalog.book_filter = book_filter
+        self.book_table_model.set_rows(self.clue_book_data, continuation)
 
         if self.displayTypeComboBox.currentText() == 'Список':
             self.list_table_stack.setCurrentIndex(0)
-            self.update_book_list_widget_data()
         elif self.displayTypeComboBox.currentText() == 'Таблица':
             self.list_table_stack.setCurrentIndex(1)
-            self.update_book_table_widget_data()
+            self.bookTableView.resizeColumnsToContents()
 
         if not self.clue_book_data:
             self.statusBar().showMessage('Не найдено ни одной книги')
         else:
             self.statusBar().clearMessage()
 
-    def update_book_list_widget_data(self):
-        """Обновление списка с книгами"""
-        self.bookListWidget.clear()
-        self.bookListWidget.addItems(map(lambda record: record[1], self.clue_book_data))
-
-    def update_book_table_widget_data(self):
-        """Обновление таблицы с книгами"""
-        header = ('Название', 'Автор', 'Жанр', 'Статус')
-        self.bookTableWidget.clear()
-        self.bookTableWidget.setColumnCount(len(header))
-        self.bookTableWidget.setHorizontalHeaderLabels(header)
-        self.bookTableWidget.setRowCount(0)
-
-        table_elements = map(lambda record: (record[1], record[2], record[3], record[4]), self.clue_book_data)
-
-        for i, line in enumerate(table_elements):
-            self.bookTableWidget.setRowCount(self.bookTableWidget.rowCount() + 1)
-            for j, element in enumerate(line):
-                self.bookTableWidget.setItem(i, j, QTableWidgetItem(element))
-
-        self.bookTableWidget.resizeColumnsToContents()
-
-    def show_book_list_widget_context_menu(self, pos):
+    def show_book_list_view_context_menu(self, pos):
         """Контекстное меню для списка книг"""
-        menu = QMenu(self)
-        edit_action = QAction('Редактировать книгу', self)
-        delete_action = QAction('Удалить книгу', self)
-
-        item = self.bookListWidget.itemAt(pos)
-        if item is None:
-            return
-
-        edit_action_triggered: pyqtSignal | pyqtBoundSignal = edit_action.triggered
-        delete_action_triggered: pyqtSignal | pyqtBoundSignal = delete_action.triggered
-        edit_action_triggered.connect(self._edit_book_from_list)
-        delete_action_triggered.connect(self._delete_book_from_list)
+        self._show_book_context_menu(self.bookListView, pos)
 
-        menu.addActions((edit_action, delete_action))
-        menu.exec(self.bookListWidget.mapToGlobal(pos))
-
-    def show_book_table_widget_context_menu(self, pos):
+    def show_book_table_view_context_menu(self, pos):
         """Контекстное меню для таблицы книг"""
-        menu = QMenu(self)
-        edit_action = QAction('Редактировать книгу', self)
-        delete_action = QAction('Удалить книгу', self)
+        self._show_book_context_menu(self.bookTableView, pos)
 
-        item = self.bookTableWidget.itemAt(pos)
-        if item is None:
+    def _show_book_context_menu(self, view: QAbstractItemView, pos):
+        """Контекстное меню книг: редактирование одной книги и действия над всеми выбранными книгами"""
+        if not view.indexAt(pos).isValid():
             return
+        book_ids = self._selected_book_ids(view)
+        menu = QMenu(self)
 
-        edit_action_triggered: pyqtSignal | pyqtBoundSignal = edit_action.triggered
+        if len(book_ids) == 1:
+            edit_action = menu.addAction('Редактировать книгу')
+            edit_action_triggered: pyqtSignal | pyqtBoundSignal = edit_action.triggered
+            edit_action_triggered.connect(lambda: self._edit_selected_book(view))
+            delete_title = 'Удалить книгу'
+        else:
+            delete_title = f'Удалить выбранные книги ({len(book_ids)})'
+        delete_action = menu.addAction(delete_title)
         delete_action_triggered: pyqtSignal | pyqtBoundSignal = delete_action.triggered
-        edit_action_triggered.connect(self._edit_book_from_table)
-        delete_action_triggered.connect(self._delete_book_from_table)
-
-        menu.addActions((edit_action, delete_action))
-        menu.exec(self.bookListWidget.mapToGlobal(pos))
+        delete_action_triggered.connect(lambda: self.delete_books(book_ids))
+
+        status_menu = menu.addMenu('Изменить статус')
+        for status in (self.filterStatusComboBox.itemText(i) for i in range(self.filterStatusComboBox.count())):
+            status_action = status_menu.addAction(status)
+            status_action_triggered: pyqtSignal | pyqtBoundSignal = status_action.triggered
+            status_action_triggered.connect(lambda _, status=status: self.update_books(book_ids, status=status))
+        author_action = menu.addAction('Изменить автора...')
+        author_action_triggered: pyqtSignal | pyqtBoundSignal = author_action.triggered
+        author_action_triggered.connect(lambda: self._choose_books_author(book_ids))
+        genre_action = menu.addAction('Изменить жанр...')
+        genre_action_triggered: pyqtSignal | pyqtBoundSignal = genre_action.triggered
+        genre_action_triggered.connect(lambda: self._choose_books_genre(book_ids))
+
+        menu.exec(view.viewport().mapToGlobal(pos))
+
+    def _selected_rows(self, view: QAbstractItemView) -> list[int]:
+        """Номера выбранных строк представления книг (в таблице строка выбирается целиком)"""
+        return sorted({index.row() for index in view.selectionModel().selectedIndexes()})
+
+    def _selected_book_ids(self, view: QAbstractItemView) -> list[int]:
+        """ИД выбранных книг"""
+        return [self.book_table_model.book_id(row) for row in self._selected_rows(view)]
+
+    def _edit_selected_book(self, view: QAbstractItemView):
+        self.edit_book(self.clue_book_data[self._selected_rows(view)[0]])
+
+    def _choose_books_author(self, book_ids: list[int]):
+        """Выбор нового автора для книг book_ids"""
+        title, valid = QInputDialog.getItem(self, 'Изменение автора', 'Автор:', self.catalog.authors.sorted_titles(),
+                                            editable=False)
+        if valid:
+            self.update_books(book_ids, author_id_book_fk=self.catalog.authors.ids[title])
+
+    def _choose_books_genre(self, book_ids: list[int]):
+        """Выбор нового жанра для книг book_ids"""
+        title, valid = QInputDialog.getItem(self, 'Изменение жанра', 'Жанр:', self.catalog.genres.sorted_titles(),
+                                            editable=False)
+        if valid:
+            self.update_books(book_ids, genre_id_book_fk=self.catalog.genres.ids[title])
+
+    def update_books(self, book_ids: list[int], status: str | None = None, author_id_book_fk: int | None = None,
+                     genre_id_book_fk: int | None = None):
+        """Изменение статуса, автора или жанра выбранных книг одной транзакцией;
+        Результат поиска обновляется на месте по событию изменения каталога"""
+        self.database_executor.submit(UserDatabaseManager.update_books, book_ids, status, author_id_book_fk,
+                                      genre_id_book_fk)
 
     def add_book(self):
         """Вызов окна на добавление книги"""
-        if not self.user_authors:
+        if not self.catalog.authors:
             message = 'В вашей личной библиотеке нет ни одного автора. Добавьте автора, чтобы добавить книгу'
             QMessageBox.warning(self, 'Ошибка',
                                 message)
             return
 
-        if not self.user_genres:
+        if not self.catalog.genres:
             message = 'В вашей личной библиотеке нет ни одного жанра. Добавьте жанр, чтобы добавить книгу'
             QMessageBox.warning(self, 'Ошибка',
                                 message)
             return
 
         add_book_widget = AddBook(self, Qt.WindowType.Window, FormMode.Add,
-                                  self.user_id, self.user_genres, self.user_authors)
+                                  self.database_executor, self.genre_list_model, self.author_list_model)
         add_book_widget.show()
 
-    def edit_book(self, book_id):
+    def edit_book(self, book: Row[tuple[Any, Any, Any, Any, Any]]):
         """Вызов окна на редактирование книги"""
         add_book_widget = AddBook(self, Qt.WindowType.Window, FormMode.Edit,
-                                  self.user_id, self.user_genres, self.user_authors)
-        add_book_widget.load_book(book_id)
+                                  self.database_executor, self.genre_list_model, self.author_list_model)
+        add_book_widget.load_book(book)
         add_book_widget.show()
 
-    def delete_book(self, book_id):
-        """Удаление книги с подтверждением пользователя"""
-        book_title = self.user_database_manager.get_book(book_id)[0]
+    def delete_books(self, book_ids: list[int]):
+        """Удаление выбранных книг одной транзакцией с подтверждением пользователя"""
+        if len(book_ids) == 1:
+            book_title = self.clue_book_data[self.book_table_model.book_row(book_ids[0])][1]
+            message = f'Вы действительно хотите удалить книгу "{book_title}"?'
+        else:
+            message = f'Вы действительно хотите удалить выбранные книги ({len(book_ids)})?'
         valid = QMessageBox.question(self,
                                      'Удаление книги',
-                                     f'Вы действительно хотите удалить книгу "{book_title}"?',
+                                     message,
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
 
         if valid == QMessageBox.StandardButton.Yes:
-            self.user_database_manager.delete_book(book_id)
-            self.search_books()
-
-    def _edit_book_from_list(self):
-        selected_index = self.bookListWidget.selectedIndexes()[0].row()
-        book_id: Any | int = self.clue_book_data[selected_index][0]
-        self.edit_book(book_id)
-
-    def _delete_book_from_list(self):
-        selected_index = self.bookListWidget.selectedIndexes()[0].row()
-        book_id: Any | int = self.clue_book_data[selected_index][0]
-        self.delete_book(book_id)
-
-    def _edit_book_from_table(self):
-        selected_index = self.bookTableWidget.selectedIndexes()[0].row()
-        book_id: Any | int = self.clue_book_data[selected_index][0]
-        self.edit_book(book_id)
-
-    def _delete_book_from_table(self):
-        selected_index = self.bookTableWidget.selectedIndexes()[0].row()
-        book_id: Any | int = self.clue_book_data[selected_index][0]
-        self.delete_book(book_id)
+            self.database_executor.submit(UserDatabaseManager.delete_books, book_ids)
 
     def export_csv(self):
         """Вызов файлового диалога для экспорта книг в формате csv"""
         filename = QFileDialog.getSaveFileName(self, 'Экспорт csv', '',
                                                'CSV files (*.csv);;All files (*)')[0]
         if filename:
-            self.user_database_manager.export_csv(filename)
+            task = self.database_executor.submit(UserDatabaseManager.export_csv, filename, progress=True)
+
+            progress_dialog = QProgressDialog('Экспорт книг...', 'Отмена', 0, 0, self)
+            progress_dialog.setWindowTitle('Экспорт csv')
+            progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+            progress_dialog.setMinimumDuration(500)
+            progress_dialog.canceled.connect(task.cancel)
+            progress_dialog.canceled.connect(progress_dialog.deleteLater)
+            task.progress.connect(lambda done, total, _: task.is_cancelled() or
+                                  self._on_export_progress(progress_dialog, done, total))
+            task.finished.connect(lambda completed: self._on_csv_exported(progress_dialog, completed))
+            task.failed.connect(lambda error: self._on_csv_export_failed(progress_dialog, error))
+
+    @staticmethod
+    def _on_export_progress(progress_dialog: QProgressDialog, done: int, total: int):
+        progress_dialog.setMaximum(max(total, 1))
+        progress_dialog.setValue(done)
+
+    def _on_csv_exported(self, progress_dialog: QProgressDialog, completed: bool):
+        progress_dialog.reset()
+        progress_dialog.deleteLater()
+        if completed:
+            self.statusBar().showMessage('Экспорт завершен', 5000)
+
+    def _on_csv_export_failed(self, progress_dialog: QProgressDialog, error: Exception):
+        progress_dialog.reset()
+        progress_dialog.deleteLater()
+        if not isinstance(error, OSError):
+            raise error
+        QMessageBox.warning(self, 'Ошибка', f'Не удалось экспортировать csv: {error.strerror}')
 
     def import_csv(self):
         """Вызов файлового диалога для импорта книг в формате csv.
-        Все предыдущие книги пользователя будут удалены и полностью заменены на экспортированные"""
+        Книги пользователя заменяются книгами файла: слиянием (изменяются только отличающиеся книги)
+        или удалением всех книг и добавлением книг файла"""
         filename = QFileDialog.getOpenFileName(self, 'Импорт csv', '',
                                                'CSV files (*.csv);;All files (*)')[0]
         if filename:
-            message = 'Вы уверены, что хотите импортировать csv? Все ваши книги будут удалены и заменены на новые'
-
-            valid = QMessageBox.question(self,
-                                         'Импорт csv',
-                                         message,
-                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-            if valid == QMessageBox.StandardButton.Yes:
-                self.user_database_manager.import_csv(filename)
-
-        self.update_user_authors()
-        self.update_user_genres()
-        self.search_books()
+            message_box = QMessageBox(QMessageBox.Icon.Question, 'Импорт csv',
+                                      'Ваши книги будут заменены книгами из файла.\n'
+                                      'Объединить - изменить только книги, которые отличаются от файла;\n'
+                                      'Заменить - удалить все книги и добавить книги файла заново', parent=self)
+            merge_button = message_box.addButton('Объединить', QMessageBox.ButtonRole.AcceptRole)
+            replace_button = message_box.addButton('Заменить', QMessageBox.ButtonRole.DestructiveRole)
+            message_box.addButton(QMessageBox.StandardButton.Cancel)
+            message_box.setDefaultButton(merge_button)
+            message_box.exec()
+            if message_box.clickedButton() in (merge_button, replace_button):
+                method = UserDatabaseManager.merge_csv if message_box.clickedButton() is merge_button \
+                    else UserDatabaseManager.import_csv
+                task = self.database_executor.submit(method, filename, progress=True)
+
+                # Прогресс в тысячных долях: размер файла может не поместиться в int диалога
+                progress_dialog = QProgressDialog('Импорт книг...', 'Отмена', 0, self.IMPORT_PROGRESS_STEPS, self)
+                progress_dialog.setWindowTitle('Импорт csv')
+                progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+                progress_dialog.setMinimumDuration(500)
+                progress_dialog.canceled.connect(task.cancel)
+                progress_dialog.canceled.connect(progress_dialog.deleteLater)
+                task.progress.connect(lambda done, total, rows: task.is_cancelled() or
+                                      self._on_import_progress(progress_dialog, done, total, rows))
+                task.finished.connect(lambda report: self._on_csv_imported(progress_dialog, report))
+                task.failed.connect(lambda error: self._on_csv_import_failed(progress_dialog, error))
+
+    @classmethod
+    def _on_import_progress(cls, progress_dialog: QProgressDialog, done: int, total: int, rows: int):
+        progress_dialog.setLabelText(f'Импорт книг: прочитано строк {rows}, '
+                                     f'{done / 2 ** 20:.1f} из {total / 2 ** 20:.1f} МБ')
+        progress_dialog.setValue(done * cls.IMPORT_PROGRESS_STEPS // max(total, 1))
+
+    def _on_csv_imported(self, progress_dialog: QProgressDialog, report: CsvImportReport):
+        progress_dialog.reset()
+        progress_dialog.deleteLater()
+        if report.skipped:
+            message_box = QMessageBox(QMessageBox.Icon.Warning, 'Импорт csv',
+                                      f'Импортировано книг: {report.rows}\n'
+                                      f'Пропущено строк с ошибками: {report.skipped}', parent=self)
+            message_box.setDetailedText('\n'.join(f'Строка {error.line}: {error.message}'
+                                                   for error in report.errors))
+            message_box.exec()
+        # Каталог уже перезагружается по событию изменения; сообщение показывается после перезагрузки,
+        # так как обновление результатов поиска очищает строку состояния
+        self._show_message_when_idle(f'Импортировано книг: {report.rows} (добавлено {report.inserted}, '
+                                     f'изменено {report.updated}, удалено {report.deleted}; '
+                                     f'{report.rows_per_second:.0f} строк/с, {report.encoding}, '
+                                     f'разделитель "{report.delimiter}")')
+
+    def _show_message_when_idle(self, message: str):
+        """Сообщение в строке состояния после завершения всех запросов к базе данных"""
+        def show(busy: bool):
+            if not busy:
+                self.database_executor.busy_changed.disconnect(show)
+                self.statusBar().showMessage(message, 5000)
+
+        if self.database_executor.is_busy():
+            self.database_executor.busy_changed.connect(show)
+        else:
+            self.statusBar().showMessage(message, 5000)
+
+    def _on_csv_import_failed(self, progress_dialog: QProgressDialog, error: Exception):
+        progress_dialog.reset()
+        progress_dialog.deleteLater()
+        if not isinstance(error, CsvImportError):
+            raise error
+        details = f': {error}' if str(error) else ''
+        QMessageBox.warning(self, 'Ошибка',
+                            f'Не удалось импортировать csv{details}. Ваша библиотека осталась без изменений')
+
+    def run_maintenance(self):
+        """Обслуживание базы данных в фоновом потоке с отчетом об удаленных записях и освобожденном месте"""
+        self.maintenanceAction.setEnabled(False)
+        self.statusBar().showMessage('Обслуживание базы данных...')
+        task = self.database_executor.submit(UserDatabaseManager.run_maintenance)
+        task.finished.connect(self._on_maintenance_finished)
+        task.failed.connect(self._on_maintenance_failed)
+
+    def _on_maintenance_finished(self, report: MaintenanceReport):
+        self.maintenanceAction.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.information(self, 'Обслуживание базы данных',
+                                f'Удалено неиспользуемых жанров: {report.genres}, авторов: {report.authors}\n'
+                                f'Освобождено: {report.bytes_reclaimed / 1024:.0f} КБ '
+                                f'(размер базы данных {report.bytes_after / 1024:.0f} КБ)\n'
+                                f'Время: {report.seconds:.1f} с')
+
+    def _on_maintenance_failed(self, error: Exception):
+        self.maintenanceAction.setEnabled(True)
+        self.statusBar().clearMessage()
+        if isinstance(error, ServerError):
+            QMessageBox.warning(self, 'Ошибка', f'Сервер отклонил обслуживание: {error}')
+            return
+        if not isinstance(error, OperationalError):
+            raise error
+        QMessageBox.warning(self, 'Ошибка', 'База данных занята, повторите обслуживание позже')
 
     def closeEvent(self, a0):
         """При закрытии окна закрываем подключение к базе данных"""
-        self.user_database_manager.close()
+        self.database_executor.shutdown()
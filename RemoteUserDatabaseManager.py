@@ -0,0 +1,297 @@
+"""Работа главного окна с сервером библиотеки (server.py) вместо файла базы данных"""
+import codecs
+import http.client
+import os
+import shutil
+import tempfile
+from typing import Any, BinaryIO, Callable, Sequence, TextIO
+
+from database.csv_import import CsvRowError, IMPORT_CHUNK_ROWS
+from database.maintenance import MaintenanceReport
+from database.search_cache import SearchCacheStats, SearchResultCache
+from LibraryClient import LibraryConnection, Response, ServerError, error_from_response, read_arguments, \
+    ADMIN_TOKEN_ENV, ADMIN_TOKEN_HEADER, TRANSFER_CHUNK_BYTES
+from sqlalchemy.exc import IntegrityError, OperationalError
+from UserDatabaseManager import CatalogChange, CsvImportReport, LibraryStatistics, SearchPage, AuthorInUseError, \
+    AuthorNotFoundError, BookNotFoundError, CsvImportError, GenreInUseError, GenreNotFoundError, BOOKS_PAGE_SIZE, \
+    EXPORT_CHUNK_SIZE, SEARCH_CACHE_MAX_ROWS, TITLES_PAGE_SIZE
+
+# Исключения UserDatabaseManager, которые воссоздаются по имени класса из ответа сервера
+_ERRORS = {error.__name__: error for error in (GenreInUseError, AuthorInUseError, GenreNotFoundError,
+                                               AuthorNotFoundError, BookNotFoundError, CsvImportError)}
+_DATABASE_ERRORS = {error.__name__: error for error in (IntegrityError, OperationalError)}
+
+
+def _tuples(value: Any) -> Any:
+    """Списки JSON в кортежи, как в результатах UserDatabaseManager"""
+    if isinstance(value, list):
+        return tuple(_tuples(item) for item in value)
+    return value
+
+
+def _local_error(error: ServerError) -> Exception:
+    """Исключение, которое вызвал бы UserDatabaseManager: окна обрабатывают ошибки одинаково в обоих режимах"""
+    if error.kind in _ERRORS:
+        return _ERRORS[error.kind](str(error))
+    if error.kind in _DATABASE_ERRORS:
+        return _DATABASE_ERRORS[error.kind](str(error), None, error)
+    return error
+
+
+def _row_count(result: Any) -> int:
+    if isinstance(result, SearchPage):
+        return len(result.rows)
+    return len(result) if isinstance(result, tuple) else 1
+
+
+class RemoteUserDatabaseManager:
+    """Замена UserDatabaseManager для главного окна в режиме клиента: те же методы выполняет сервер;
+    Результаты чтения хранятся в кэше вместе с ETag: пока данные пользователя не изменились, сервер отвечает 304
+    и результат не передается заново;
+    Изменения каталога сервер возвращает в ответе на запрос изменения после фиксации, и они передаются
+    подписчикам так же, как у UserDatabaseManager"""
+
+    def __init__(self, connection: LibraryConnection):
+        self.connection = connection
+        self.user_id = connection.user_id
+        self._change_listeners: list[Callable[[CatalogChange], None]] = []
+        # Ключ - путь запроса чтения, значение - (ETag, результат)
+        self.search_cache = SearchResultCache(SEARCH_CACHE_MAX_ROWS)
+
+    def add_change_listener(self, listener: Callable[[CatalogChange], None]):
+        """Подписка на изменения жанров, авторов и книг пользователя"""
+        self._change_listeners.append(listener)
+
+    def _notify(self, change: CatalogChange):
+        for listener in self._change_listeners:
+            listener(change)
+
+    def commit(self):
+        """Изменения фиксирует сервер"""
+
+    def rollback(self):
+        """Изменения отменяет сервер"""
+
+    def end_unit_of_work(self):
+        """Подключение к серверу сохраняется между запросами"""
+
+    def close(self):
+        """Выход с сервера и закрытие подключения"""
+        try:
+            self.connection.call('POST', '/logout')
+        except (OSError, ServerError):
+            pass
+        self.connection.close()
+
+    def search_cache_stats(self) -> SearchCacheStats:
+        """Счетчики кэша результатов чтения; попадание - ответ 304 или повтор результата из кэша"""
+        return self.search_cache.stats()
+
+    def _call(self, method: str, path: str, payload: Any = None, headers: dict[str, str] | None = None,
+              expected: tuple[int, ...] = (http.client.OK,)) -> Response:
+        try:
+            return self.connection.call(method, path, payload, headers, expected)
+        except ServerError as error:
+            raise _local_error(error) from error
+
+    def _read(self, method: str, *args, decode: Callable[[Any], Any] = _tuples) -> Any:
+        """Метод чтения на сервере с условным запросом по ETag результата из кэша"""
+        path = f'/read/{method}?args={read_arguments(args, {})}'
+        cached = self.search_cache.get(path)
+        headers = {'If-None-Match': cached[0]} if cached is not None else None
+        response = self._call('GET', path, headers=headers, expected=(http.client.OK, http.client.NOT_MODIFIED))
+        if response.status == http.client.NOT_MODIFIED:
+            return cached[1]
+        result = decode(response.json()['result'])
+        self.search_cache.put(path, (response.headers['etag'], result), _row_count(result))
+        return result
+
+    def _write(self, method: str, *args) -> Any:
+        """Метод изменения на сервере; изменения каталога передаются подписчикам"""
+        return self._apply(self._call('POST', f'/write/{method}', {'args': args, 'kwargs': {}}))
+
+    def _apply(self, response: Response) -> Any:
+        value = response.json()
+        for change in value['changes']:
+            self._notify(CatalogChange(*_tuples(change)))
+        return value['result']
+
+    def get_user_authors(self) -> tuple[tuple, ...]:
+        return self._read('get_user_authors')
+
+    def get_user_genres(self) -> tuple[tuple, ...]:
+        return self._read('get_user_genres')
+
+    def search_books(self, title: str | None = None,
+                     author: str | None = None,
+                     genre: str | None = None,
+                     status: str | None = None,
+                     sort_by: str | None = None) -> tuple[tuple, ...]:
+        return self._read('search_books', title, author, genre, status, sort_by)
+
+    def search_books_page(self, title: str | None = None,
+                          author: str | None = None,
+                          genre: str | None = None,
+                          status: str | None = None,
+                          sort_by: str | None = None,
+                          after: str | None = None,
+                          limit: int = BOOKS_PAGE_SIZE) -> SearchPage:
+        return self._read('search_books_page', title, author, genre, status, sort_by, after, limit,
+                          decode=lambda result: SearchPage(*_tuples(result)))
+
+    def search_genres(self, title: str) -> tuple[tuple, ...]:
+        return self._read('search_genres', title)
+
+    def search_genres_page(self, title: str, after: str | None = None, limit: int = TITLES_PAGE_SIZE) -> SearchPage:
+        return self._read('search_genres_page', title, after, limit, decode=lambda result: SearchPage(*_tuples(result)))
+
+    def search_authors(self, title: str) -> tuple[tuple, ...]:
+        return self._read('search_authors', title)
+
+    def search_authors_page(self, title: str, after: str | None = None, limit: int = TITLES_PAGE_SIZE) -> SearchPage:
+        return self._read('search_authors_page', title, after, limit,
+                          decode=lambda result: SearchPage(*_tuples(result)))
+
+    def get_statistics(self) -> LibraryStatistics:
+        return self._read('get_statistics', decode=lambda result: LibraryStatistics(*_tuples(result)))
+
+    def get_genre(self, genre_id: int) -> str:
+        return self._read('get_genre', genre_id)
+
+    def get_author(self, author_id: int) -> str:
+        return self._read('get_author', author_id)
+
+    def get_book(self, book_id: int) -> tuple | None:
+        return self._read('get_book', book_id)
+
+    def add_genre(self, title: str):
+        self._write('add_genre', title)
+
+    def edit_genre(self, genre_id: int, title: str):
+        self._write('edit_genre', genre_id, title)
+
+    def delete_genre(self, genre_id: int):
+        self._write('delete_genre', genre_id)
+
+    def add_author(self, title: str):
+        self._write('add_author', title)
+
+    def edit_author(self, author_id: int, title: str):
+        self._write('edit_author', author_id, title)
+
+    def delete_author(self, author_id: int):
+        self._write('delete_author', author_id)
+
+    def add_book(self, title: str, author_id_book_fk: int, genre_id_book_fk: int, status: str):
+        self._write('add_book', title, author_id_book_fk, genre_id_book_fk, status)
+
+    def edit_book(self, book_id: int, title: str, author_id_book_fk: int, genre_id_book_fk: int, status: str):
+        self._write('edit_book', book_id, title, author_id_book_fk, genre_id_book_fk, status)
+
+    def delete_book(self, book_id: int):
+        self._write('delete_book', book_id)
+
+    def delete_books(self, book_ids: Sequence[int]):
+        self._write('delete_books', list(book_ids))
+
+    def update_books(self, book_ids: Sequence[int],
+                     status: str | None = None,
+                     author_id_book_fk: int | None = None,
+                     genre_id_book_fk: int | None = None):
+        self._write('update_books', list(book_ids), status, author_id_book_fk, genre_id_book_fk)
+
+    def clear_all_user_data(self):
+        self._write('clear_all_user_data')
+
+    def delete_account(self):
+        self._write('delete_account')
+
+    def run_maintenance(self) -> MaintenanceReport:
+        """Обслуживание всей базы данных на сервере; требуется ключ администратора из переменной окружения
+        ADMIN_TOKEN_ENV, иначе сервер отвечает 403"""
+        headers = {ADMIN_TOKEN_HEADER: os.environ.get(ADMIN_TOKEN_ENV, '')}
+        return MaintenanceReport(*self._call('POST', '/maintenance', headers=headers).json()['result'])
+
+    def export_csv(self, filename: str | TextIO,
+                   progress_callback: Callable[[int, int], bool] | None = None,
+                   chunk_size: int = EXPORT_CHUNK_SIZE) -> bool:
+        """Экспорт книг в формате csv: сервер формирует файл, клиент получает его порциями;
+        progress_callback(получено байт, размер файла) - как у UserDatabaseManager.export_csv, при отмене
+        недописанный файл удаляется и возвращается False; chunk_size сервер не использует"""
+        response = self.connection.request('GET', '/export', stream=True)
+        if response.status != http.client.OK:
+            error = error_from_response(Response(response.status, {}, response.read()))
+            raise _local_error(error)
+        total = int(response.getheader('Content-Length', 0))
+
+        if not isinstance(filename, str):
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            return self._receive(response, lambda chunk: filename.write(decoder.decode(chunk)), total,
+                                 progress_callback)
+
+        partial_filename = f'{filename}.part'
+        completed = False
+        try:
+            with open(partial_filename, 'wb') as file:
+                completed = self._receive(response, file.write, total, progress_callback)
+            if completed:
+                os.replace(partial_filename, filename)
+        finally:
+            if not completed and os.path.exists(partial_filename):
+                os.remove(partial_filename)
+        return completed
+
+    def _receive(self, response: http.client.HTTPResponse, write: Callable[[bytes], Any], total: int,
+                 progress_callback: Callable[[int, int], bool] | None) -> bool:
+        """Чтение тела ответа порциями; при отмене или ошибке подключение закрывается,
+        так как в нем остается непрочитанная часть ответа"""
+        received = 0
+        try:
+            while chunk := response.read(TRANSFER_CHUNK_BYTES):
+                write(chunk)
+                received += len(chunk)
+                if progress_callback is not None and not progress_callback(received, total):
+                    self.connection.close()
+                    return False
+        except BaseException:
+            self.connection.close()
+            raise
+        return True
+
+    def import_csv(self, filename: str | BinaryIO,
+                   progress_callback: Callable[[int, int, int], bool] | None = None,
+                   chunk_rows: int = IMPORT_CHUNK_ROWS) -> CsvImportReport | None:
+        """Импорт книг в формате csv на сервере: файл передается серверу, который импортирует его
+        как UserDatabaseManager.import_csv; progress_callback(передано байт, размер файла, передано строк)
+        вызывается во время передачи, после нее импорт уже не отменяется; chunk_rows сервер не использует;
+        Поток неизвестного размера предварительно сохраняется во временный файл"""
+        return self._upload_csv('/import', filename, progress_callback)
+
+    def merge_csv(self, filename: str | BinaryIO,
+                  progress_callback: Callable[[int, int, int], bool] | None = None,
+                  chunk_rows: int = IMPORT_CHUNK_ROWS) -> CsvImportReport | None:
+        """Импорт csv слиянием с библиотекой (UserDatabaseManager.merge_csv) на сервере; передача файла
+        и аргументы - как у import_csv"""
+        return self._upload_csv('/import?merge=1', filename, progress_callback)
+
+    def _upload_csv(self, path: str, filename: str | BinaryIO,
+                    progress_callback: Callable[[int, int, int], bool] | None) -> CsvImportReport | None:
+        try:
+            if isinstance(filename, str):
+                with open(filename, 'rb') as file:
+                    response = self.connection.upload(path, file, os.fstat(file.fileno()).st_size, progress_callback)
+            else:
+                with tempfile.TemporaryFile() as file:
+                    shutil.copyfileobj(filename, file)
+                    size = file.tell()
+                    file.seek(0)
+                    response = self.connection.upload(path, file, size, progress_callback)
+        except ServerError as error:
+            raise _local_error(error) from error
+        except OSError as error:
+            raise CsvImportError(str(error)) from error
+        if response is None:
+            return None
+
+        report = CsvImportReport(*self._apply(response))
+        return report._replace(errors=tuple(CsvRowError(*error) for error in report.errors))
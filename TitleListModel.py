@@ -0,0 +1,80 @@
+"""Модель жанров или авторов пользователя для выпадающих списков главного окна и окна книги"""
+from typing import Iterable
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt6.QtWidgets import QComboBox, QCompleter
+
+from CatalogCache import TitleCatalog
+
+# Ширина выпадающего списка в символах: ширина не подбирается по самому длинному названию
+MINIMUM_CONTENTS_LENGTH = 20
+
+
+class TitleListModel(QAbstractListModel):
+    """Названия из TitleCatalog по алфавиту; одна модель на все выпадающие списки жанров (или авторов) окна;
+    Строки добавляются и удаляются по одной, поэтому выбранный элемент каждого списка при изменении каталога
+    сохраняется, а строки списков заново не создаются"""
+
+    def __init__(self, catalog: TitleCatalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.catalog)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        return self.catalog.title_at(index.row())
+
+    def load(self, records: Iterable[tuple[str, int]]):
+        """Полная загрузка каталога: records - пары (название, ИД), как возвращает get_user_genres / get_user_authors"""
+        self.beginResetModel()
+        self.catalog.load(records)
+        self.endResetModel()
+
+    def add(self, item_id: int, title: str):
+        """Добавление записи на ее место по алфавиту"""
+        position = self.catalog.position(title)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.catalog.add(item_id, title)
+        self.endInsertRows()
+
+    def remove(self, item_id: int):
+        """Удаление записи; записи, которой нет в каталоге, пропускаются"""
+        title = self.catalog.titles.get(item_id)
+        if title is None:
+            return
+        position = self.catalog.position(title)
+        self.beginRemoveRows(QModelIndex(), position, position)
+        self.catalog.remove(item_id)
+        self.endRemoveRows()
+
+    def row(self, title: str) -> int:
+        """Номер строки с названием title или -1, если такого названия нет"""
+        if title not in self.catalog.ids:
+            return -1
+        return self.catalog.position(title)
+
+    def item_id(self, title: str) -> int | None:
+        """ИД записи с названием title или None"""
+        return self.catalog.ids.get(title)
+
+
+def attach_title_combo_box(combo_box: QComboBox, model: TitleListModel):
+    """Подключение выпадающего списка к общей модели с вводом названия и автодополнением по его началу;
+    Ширина списка не вычисляется по всем строкам, а строки одной высоты, поэтому открытие списка не зависит
+    от количества записей; автодополнение ищет по отсортированной модели двоичным поиском"""
+    combo_box.setModel(model)
+    combo_box.setEditable(True)
+    combo_box.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+    combo_box.setSizeAdjustPolicy(QComboBox.SizeAdjustPolicy.AdjustToMinimumContentsLengthWithIcon)
+    combo_box.setMinimumContentsLength(MINIMUM_CONTENTS_LENGTH)
+    combo_box.view().setUniformItemSizes(True)
+
+    completer = QCompleter(model, combo_box)
+    completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+    completer.setModelSorting(QCompleter.ModelSorting.CaseInsensitivelySortedModel)
+    completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
+    completer.popup().setUniformItemSizes(True)
+    combo_box.setCompleter(completer)
@@ -1,11 +1,51 @@
 """Реализация взаимодействия с базой данных"""
 
 import csv
-from typing import Any, Sequence
+import json
+import os
+import time
+from bisect import bisect_right
+from functools import partial
+from typing import Any, BinaryIO, Callable, Iterable, NamedTuple, Sequence, TextIO
 
-from database.models import Book, Author, Genre, UserAuthorLink, UserGenreLink, ENGINE
-from sqlalchemy import select, update, delete, Row, and_
-from sqlalchemy.orm import sessionmaker
+from database.csv_import import CsvBookReader, CsvFormatError, CsvRowError, Prefetcher, \
+    IMPORT_CHUNK_ROWS, MAX_REPORTED_ERRORS
+from database.csv_merge import CsvMergeDelta, CsvMergeDiff
+from database.fulltext import AUTHORS_FTS, BOOKS_FTS, GENRES_FTS, build_match_query, build_user_match_query, \
+    is_refinement, matches_title
+from database.maintenance import MaintenanceReport, run_maintenance
+from database.search_cache import SearchCacheStats, SearchResultCache
+from database.models import Book, BookCounter, Author, Genre, User, UserAuthorLink, UserGenreLink, ENGINE
+from database.session import DatabaseSessionManager
+from sqlalchemy import select, insert, update, delete, func, cast, Integer, Row, and_, tuple_, Select, ColumnElement
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Сортировка результатов полнотекстового поиска книг по релевантности
+RELEVANCE_SORT = 'Релевантности'
+
+# Количество строк, которые экспорт csv получает из базы данных и записывает в файл за один раз
+EXPORT_CHUNK_SIZE = 2000
+# Заголовок файла экспорта csv
+EXPORT_CSV_HEADER = ('Book', 'Author', 'Genre', 'Status')
+
+# Размер страницы постраничного поиска книг и жанров / авторов
+BOOKS_PAGE_SIZE = 500
+TITLES_PAGE_SIZE = 200
+
+# Сколько строк результатов поиска книг суммарно хранит кэш одного UserDatabaseManager
+SEARCH_CACHE_MAX_ROWS = 50_000
+
+# Сколько книг может изменить слияние csv, чтобы подписчики получили изменения книг, а не 'reset'
+MERGE_NOTIFY_MAX_BOOKS = 2000
+
+# Ограничение SQLite на количество параметров в одном запросе (с запасом)
+_MAX_QUERY_PARAMETERS = 900
+
+
+def _chunks(values: Sequence, size: int = _MAX_QUERY_PARAMETERS) -> Iterable[Sequence]:
+    """Разбиение values на части, помещающиеся в один запрос SQLite"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
 
 
 class GenreInUseError(Exception):
@@ -16,17 +56,134 @@ class AuthorInUseError(Exception):
     """При попытке удалить автора, который есть среди книг пользователя вызывается данное исключение"""
 
 
+class GenreNotFoundError(Exception):
+    """При запросе жанра, которого нет среди жанров пользователя, вызывается данное исключение"""
+
+
+class AuthorNotFoundError(Exception):
+    """При запросе автора, которого нет среди авторов пользователя, вызывается данное исключение"""
+
+
+class BookNotFoundError(Exception):
+    """При попытке изменить или удалить книгу, которой нет среди книг пользователя, вызывается данное исключение"""
+
+
 class CsvImportError(Exception):
     """При ошибке импортирования csv вызывается данное исключение"""
 
 
+class CsvImportReport(NamedTuple):
+    """Результат импорта csv: количество импортированных книг, время импорта в секундах,
+    количество пропущенных строк с ошибками и первые MAX_REPORTED_ERRORS из них,
+    определенные кодировка и разделитель столбцов файла;
+    Сколько книг добавлено, изменено и удалено в библиотеке (при замене - добавлены все книги файла
+    и удалены все прежние)"""
+    rows: int
+    seconds: float
+    skipped: int = 0
+    errors: tuple[CsvRowError, ...] = ()
+    encoding: str = 'utf-8'
+    delimiter: str = ','
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        """Скорость импорта в строках в секунду"""
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+
+class LibraryStatistics(NamedTuple):
+    """Статистика библиотеки пользователя: общее количество книг и пары (название, количество книг)
+    по статусам, жанрам и авторам, упорядоченные по убыванию количества"""
+    books: int
+    statuses: tuple[tuple[str, int], ...]
+    genres: tuple[tuple[str, int], ...]
+    authors: tuple[tuple[str, int], ...]
+
+
+class CatalogChange(NamedTuple):
+    """Изменение каталога пользователя, о котором UserDatabaseManager сообщает подписчикам после фиксации;
+    kind - 'genre', 'author', 'book', 'books' (пакетное изменение книг) или 'reset' (данные пользователя заменены
+    целиком);
+    removed_id - ИД удаленной или измененной записи, added - новое состояние записи:
+    (ИД, название) для жанров и авторов, (ИД, название, ИД автора, ИД жанра, статус) для книг;
+    Для 'books': removed_ids - ИД удаленных или измененных книг, added - кортеж новых состояний измененных
+    и добавленных книг"""
+    kind: str
+    removed_id: int | None = None
+    added: tuple | None = None
+    removed_ids: tuple[int, ...] = ()
+
+
+class BookSearchFilter(NamedTuple):
+    """Фильтры поиска книг (аргументы search_books); ключ кэша результатов поиска"""
+    title: str | None
+    author: str | None
+    genre: str | None
+    status: str | None
+    sort_by: str | None
+
+    def matches(self, book: Sequence[Any]) -> bool:
+        """Подходит ли книга (ИД, название, автор, жанр, статус) под фильтры"""
+        return ((self.title is None or matches_title(self.title, book[1]))
+                and (self.author is None or self.author.lower() == book[2])
+                and (self.genre is None or self.genre.lower() == book[3])
+                and (self.status is None or self.status == book[4]))
+
+    def narrows(self, previous: 'BookSearchFilter') -> bool:
+        """Является ли результат поиска с этими фильтрами подмножеством результата previous в том же порядке:
+        отличается только строка поиска по названию, которая дописана к предыдущей"""
+        if self[1:] != previous[1:] or not is_refinement(previous.title, self.title):
+            return False
+        # Порядок по релевантности при изменении строки поиска меняется
+        return self.sort_by != RELEVANCE_SORT or self.title is None or build_match_query(self.title) is None
+
+    def position(self, books: Sequence[Sequence[Any]], book: Sequence[Any]) -> int:
+        """Позиция книги в результате поиска books, отсортированном по (ключ сортировки, ИД);
+        Порядок по релевантности известен только индексу, поэтому в этом случае книга добавляется в конец"""
+        if self.sort_by == RELEVANCE_SORT and self.title is not None and build_match_query(self.title) is not None:
+            return len(books)
+        column = 2 if self.sort_by == 'Автору' else 1
+        return bisect_right(books, (book[column], book[0]), key=lambda row: (row[column], row[0]))
+
+
+class BookPageKey(NamedTuple):
+    """Ключ кэша страницы поиска книг"""
+    filter: BookSearchFilter
+    after: str | None
+    limit: int
+
+
+class SearchPage(NamedTuple):
+    """Страница результата поиска; continuation передается в следующий запрос страницы,
+    None - страница последняя"""
+    rows: tuple
+    continuation: str | None
+
+
 class UserDatabaseManager:
     """Основной класс для взаимодействия с базой данных"""
 
-    def __init__(self, user_id: int):
+    def __init__(self, user_id: int, session_manager: DatabaseSessionManager | None = None):
         self.user_id = user_id
-        session_maker = sessionmaker(bind=ENGINE)
-        self.session = session_maker()
+        if session_manager is None:
+            session_manager = DatabaseSessionManager(ENGINE)
+        self.session = session_manager.create_session()
+        self._change_listeners: list[Callable[[CatalogChange], None]] = []
+        # Кэш видит только изменения, сделанные через этот UserDatabaseManager
+        self.search_cache = SearchResultCache(SEARCH_CACHE_MAX_ROWS)
+
+    def add_change_listener(self, listener: Callable[[CatalogChange], None]):
+        """Подписка на изменения жанров, авторов и книг пользователя"""
+        self._change_listeners.append(listener)
+
+    def _notify(self, change: CatalogChange):
+        """Сброс устаревших результатов поиска и передача изменения подписчикам"""
+        self._invalidate_search_cache(change)
+        for listener in self._change_listeners:
+            listener(change)
 
     def commit(self):
         """Фиксирование изменений в базе данных"""
@@ -40,6 +197,43 @@ class UserDatabaseManager:
         """Отмена изменений, если при работе с базой данных произошло исключение"""
         self.session.rollback()
 
+    def end_unit_of_work(self):
+        """Завершение единицы работы: незафиксированная транзакция отменяется, подключение возвращается в пул;
+        Следующий запрос возьмет подключение заново"""
+        self.session.close()
+
+    def search_cache_stats(self) -> SearchCacheStats:
+        """Счетчики попаданий и промахов кэша результатов поиска книг"""
+        return self.search_cache.stats()
+
+    def _invalidate_search_cache(self, change: CatalogChange):
+        """Сброс только тех результатов поиска, которые изменение могло затронуть: содержащих удаленную
+        или измененную книгу и тех, под фильтры которых подходит новое состояние книги;
+        Изменения жанров и авторов пользователя меняют только связи пользователя, а не книги, поэтому результаты
+        поиска книг от них не зависят"""
+        if change.kind == 'reset':
+            self.search_cache.clear()
+        if change.kind not in ('book', 'books') or not self.search_cache.stats().entries:
+            return
+
+        if change.kind == 'book':
+            removed_ids = {change.removed_id} if change.removed_id is not None else set()
+            added = (change.added,) if change.added is not None else ()
+        else:
+            removed_ids = set(change.removed_ids)
+            added = change.added or ()
+        added_books = self._select_books([book[0] for book in added])
+
+        def is_stale(key: BookSearchFilter | BookPageKey, books: Sequence[Row] | SearchPage) -> bool:
+            book_filter = key.filter if isinstance(key, BookPageKey) else key
+            if isinstance(books, SearchPage):
+                books = books.rows
+            if any(book_filter.matches(added_book) for added_book in added_books):
+                return True
+            return bool(removed_ids) and any(book[0] in removed_ids for book in books)
+
+        self.search_cache.invalidate(is_stale)
+
     def get_user_authors(self) -> tuple[tuple, ...]:
         """Возвращает кортеж, каждый элемент которого - кортеж с названием автора и его ИД"""
         statement = select(Author.title, Author.AuthorId).select_from(Author).join(UserAuthorLink).where(
@@ -57,237 +251,587 @@ class UserDatabaseManager:
                      genre: str | None = None,
                      status: str | None = None,
                      sort_by: str | None = None) -> Sequence[Row[tuple[Any, Any, Any, Any, Any]]]:
-        """Возвращает информацию о книгах, подходящих по фильтрам и отсортированных по автору или названию"""
+        """Возвращает информацию о книгах, подходящих по фильтрам и отсортированных по автору или названию;
+        Если строка поиска по названию достаточно длинная, используется полнотекстовый индекс (поиск по началу слов),
+        и становится доступна сортировка по релевантности;
+        Повторные запросы с теми же фильтрами возвращаются из кэша"""
+        book_filter = BookSearchFilter(title, author, genre, status, sort_by)
+        cached_books = self.search_cache.get(book_filter)
+        if cached_books is not None:
+            return cached_books
+
+        statement, sort_column = self._books_statement(book_filter)
+        books = tuple(self.session.execute(statement.order_by(sort_column, Book.BookId)).all())
+        self.search_cache.put(book_filter, books)
+        return books
+
+    def search_books_page(self, title: str | None = None,
+                          author: str | None = None,
+                          genre: str | None = None,
+                          status: str | None = None,
+                          sort_by: str | None = None,
+                          after: str | None = None,
+                          limit: int = BOOKS_PAGE_SIZE) -> SearchPage:
+        """Страница результата search_books: не больше limit книг после позиции after
+        (continuation предыдущей страницы, None - первая страница);
+        Позиция - значения (ключ сортировки, ИД) последней книги страницы, поэтому стоимость запроса
+        не зависит от номера страницы, а добавление и удаление книг не сдвигает следующие страницы"""
+        page_key = BookPageKey(BookSearchFilter(title, author, genre, status, sort_by), after, limit)
+        cached_page = self.search_cache.get(page_key)
+        if cached_page is not None:
+            return cached_page
+
+        statement, sort_column = self._books_statement(page_key.filter)
+        page = self._fetch_page(statement, sort_column, Book.BookId, after, limit)
+        self.search_cache.put(page_key, page, len(page.rows))
+        return page
+
+    def _books_statement(self, book_filter: BookSearchFilter) -> tuple[Select, ColumnElement]:
+        """Запрос поиска книг по фильтрам без сортировки и столбец, по которому результат сортируется"""
+        title, author, genre, status, sort_by = book_filter
         sort_dict = {'Названию': Book.title, 'Автору': Author.title}
 
-        statement = select(Book.BookId, Book.title, Author.title, Genre.title, Book.status).select_from(Book).where(
-            Book.user_id_book_fk == self.user_id).join(Author).join(Genre)
+        statement = select(Book.BookId, Book.title, Author.title, Genre.title, Book.status).select_from(Book).join(
+            Author).join(Genre)
 
-        if title is not None:
-            statement = statement.where(Book.title.like(f'%{title.lower()}%'))
+        match_query = build_user_match_query(title, self.user_id) if title is not None else None
+        if match_query is not None:
+            # "+ 0" запрещает использовать индексы books по пользователю: выборка должна начинаться
+            # с полнотекстового индекса, иначе MATCH вычисляется заново для каждой книги пользователя
+            statement = statement.join(BOOKS_FTS, BOOKS_FTS.c.rowid == Book.BookId).where(
+                Book.user_id_book_fk + 0 == self.user_id, BOOKS_FTS.c.books_fts.match(match_query))
+            sort_dict[RELEVANCE_SORT] = BOOKS_FTS.c.rank
+        else:
+            statement = statement.where(Book.user_id_book_fk == self.user_id)
+            if title is not None:
+                statement = statement.where(Book.title.like(f'%{title.lower()}%'))
         if author is not None:
             statement = statement.where(Author.title == str(author.lower()))
         if genre is not None:
             statement = statement.where(Genre.title == str(genre.lower()))
         if status is not None:
             statement = statement.where(Book.status == str(status))
-        statement = statement.order_by(sort_dict[sort_by])
-
-        return self.session.execute(statement).all()
+        return statement, sort_dict.get(sort_by, Book.title)
+
+    def _fetch_page(self, statement: Select, sort_column: ColumnElement, id_column: ColumnElement,
+                    after: str | None, limit: int) -> SearchPage:
+        """Страница результата statement (первый столбец - ИД) в порядке (sort_column, id_column) после after;
+        Запрашивается limit + 1 строка, чтобы узнать, есть ли следующая страница"""
+        statement = statement.add_columns(sort_column)
+        if after is not None:
+            sort_value, last_id = json.loads(after)
+            statement = statement.where(tuple_(sort_column, id_column) > tuple_(sort_value, last_id))
+        rows = self.session.execute(statement.order_by(sort_column, id_column).limit(limit + 1)).all()
+
+        continuation = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            continuation = json.dumps([rows[-1][-1], rows[-1][0]], ensure_ascii=False)
+        return SearchPage(tuple(row[:-1] for row in rows), continuation)
 
     def search_genres(self, title: str) -> Sequence[Row[tuple[Any, Any]]]:
-        """Возвращает информацию о жанрах, название которых содержит title"""
-        statement = select(Genre.GenreId, Genre.title).select_from(Genre).where(
-            and_(UserGenreLink.UserId == self.user_id, Genre.title.like(f'%{title.lower()}%'))).join(
-            UserGenreLink).order_by(Genre.title)
-        return self.session.execute(statement).all()
+        """Возвращает информацию о жанрах, название которых содержит title
+        (для длинных строк поиска - жанры, слова названия которых начинаются со слов title)"""
+        return self.session.execute(self._genres_statement(title).order_by(Genre.title)).all()
+
+    def search_genres_page(self, title: str, after: str | None = None, limit: int = TITLES_PAGE_SIZE) -> SearchPage:
+        """Страница результата search_genres после позиции after (см. search_books_page)"""
+        return self._fetch_page(self._genres_statement(title), Genre.title, Genre.GenreId, after, limit)
+
+    def _genres_statement(self, title: str) -> Select:
+        """Запрос поиска жанров пользователя без сортировки"""
+        statement = select(Genre.GenreId, Genre.title).select_from(Genre).join(UserGenreLink).where(
+            UserGenreLink.UserId == self.user_id)
+
+        match_query = build_match_query(title)
+        if match_query is not None:
+            return statement.join(GENRES_FTS, GENRES_FTS.c.rowid == Genre.GenreId).where(
+                GENRES_FTS.c.genres_fts.match(match_query))
+        return statement.where(Genre.title.like(f'%{title.lower()}%'))
 
     def search_authors(self, title: str) -> Sequence[Row[tuple[Any, Any]]]:
-        """Возвращает информацию об авторах, название которых содержит title"""
-        statement = select(Author.AuthorId, Author.title).select_from(Author).where(
-            and_(UserAuthorLink.UserId == self.user_id, Author.title.like(f'%{title.lower()}%'))).join(
-            UserAuthorLink).order_by(Author.title)
-        return self.session.execute(statement).all()
+        """Возвращает информацию об авторах, название которых содержит title
+        (для длинных строк поиска - авторов, слова имени которых начинаются со слов title)"""
+        return self.session.execute(self._authors_statement(title).order_by(Author.title)).all()
+
+    def search_authors_page(self, title: str, after: str | None = None, limit: int = TITLES_PAGE_SIZE) -> SearchPage:
+        """Страница результата search_authors после позиции after (см. search_books_page)"""
+        return self._fetch_page(self._authors_statement(title), Author.title, Author.AuthorId, after, limit)
+
+    def _authors_statement(self, title: str) -> Select:
+        """Запрос поиска авторов пользователя без сортировки"""
+        statement = select(Author.AuthorId, Author.title).select_from(Author).join(UserAuthorLink).where(
+            UserAuthorLink.UserId == self.user_id)
+
+        match_query = build_match_query(title)
+        if match_query is not None:
+            return statement.join(AUTHORS_FTS, AUTHORS_FTS.c.rowid == Author.AuthorId).where(
+                AUTHORS_FTS.c.authors_fts.match(match_query))
+        return statement.where(Author.title.like(f'%{title.lower()}%'))
+
+    def get_statistics(self) -> LibraryStatistics:
+        """Статистика библиотеки по счетчикам book_counters; время зависит от количества статусов, жанров
+        и авторов пользователя, а не от количества книг"""
+        statuses = self._count_groups('status', BookCounter.value)
+        genres = self._count_groups('genre', Genre.title, Genre, Genre.GenreId)
+        authors = self._count_groups('author', Author.title, Author, Author.AuthorId)
+        return LibraryStatistics(sum(books for _, books in statuses), statuses, genres, authors)
+
+    def _count_groups(self, dimension: str, title_column, model=None, id_column=None) -> tuple[tuple[str, int], ...]:
+        """Пары (название, количество книг) измерения dimension; для жанров и авторов
+        названия берутся из таблицы model по ИД, хранящемуся в счетчике"""
+        statement = select(title_column, BookCounter.books).select_from(BookCounter).where(
+            and_(BookCounter.UserId == self.user_id, BookCounter.dimension == dimension))
+        if model is not None:
+            statement = statement.join(model, id_column == cast(BookCounter.value, Integer))
+        statement = statement.order_by(BookCounter.books.desc(), title_column)
+        return tuple(map(tuple, self.session.execute(statement).all()))
+
+    def _count_books(self, dimension: str, value: int | str) -> int:
+        """Количество книг пользователя со значением value измерения dimension (поиск по первичному ключу)"""
+        statement = select(BookCounter.books).where(and_(BookCounter.UserId == self.user_id,
+                                                         BookCounter.dimension == dimension,
+                                                         BookCounter.value == str(value)))
+        return self.session.execute(statement).scalar() or 0
 
     def get_genre(self, genre_id: int) -> str:
-        """Возвращает название жанра по его ИД"""
-        statement = select(Genre.title).select_from(Genre).where(Genre.GenreId == genre_id)
-        return self.session.execute(statement).first()[0]
+        """Возвращает название жанра по его ИД; если такого жанра нет среди жанров пользователя,
+        вызывается GenreNotFoundError"""
+        statement = select(Genre.title).select_from(Genre).join(UserGenreLink).where(
+            Genre.GenreId == genre_id, UserGenreLink.UserId == self.user_id)
+        title = self.session.execute(statement).scalar()
+        if title is None:
+            raise GenreNotFoundError(genre_id)
+        return title
 
     def get_author(self, author_id: int) -> str:
-        """Возвращает название автора по его ИД"""
-        statement = select(Author.title).select_from(Author).where(Author.AuthorId == author_id)
-        return self.session.execute(statement).first()[0]
-
-    def get_book(self, book_id: int) -> Row[tuple[Any, Any, Any, Any]]:
-        """Возвращает информацию о книге по его ИД"""
+        """Возвращает название автора по его ИД; если такого автора нет среди авторов пользователя,
+        вызывается AuthorNotFoundError"""
+        statement = select(Author.title).select_from(Author).join(UserAuthorLink).where(
+            Author.AuthorId == author_id, UserAuthorLink.UserId == self.user_id)
+        title = self.session.execute(statement).scalar()
+        if title is None:
+            raise AuthorNotFoundError(author_id)
+        return title
+
+    def _select_books(self, book_ids: Sequence[int]) -> list[Row[tuple[Any, Any, Any, Any, Any]]]:
+        """Строки книг пользователя book_ids в виде результата поиска: (ИД, название, автор, жанр, статус)"""
+        books = []
+        for chunk in _chunks(book_ids):
+            statement = select(Book.BookId, Book.title, Author.title, Genre.title, Book.status).select_from(
+                Book).join(Author).join(Genre).where(Book.user_id_book_fk == self.user_id, Book.BookId.in_(chunk))
+            books.extend(self.session.execute(statement).all())
+        return books
+
+    def get_book(self, book_id: int) -> Row[tuple[Any, Any, Any, Any]] | None:
+        """Возвращает информацию о книге по его ИД; None, если такой книги нет среди книг пользователя"""
         statement = select(Book.title, Author.title, Genre.title, Book.status).select_from(Book).where(
-            Book.BookId == book_id).join(Author).join(Genre)
+            Book.BookId == book_id, Book.user_id_book_fk == self.user_id).join(Author).join(Genre)
         return self.session.execute(statement).first()
 
     def add_genre(self, title: str):
-        """Добавление жанра с названием title
-        Если данного жанра нет в таблице жанров, то добавляется новый жанр с названием title и берется его ИД;
-        Если данный жанр есть в таблице жанров, то берется ИД жанра с названием title;
-        После этого в таблицу user_genre_links добавляется запись с ИД пользователя и ИД жанра"""
-        statement = select(Genre.GenreId).select_from(Genre).where(Genre.title == title.lower())
-        genre_id = self.session.execute(statement).first()
-        if genre_id is None:
-            new_genre = Genre(title=title.lower())
-            self.session.add(new_genre)
-            self.commit()
-            genre_id = new_genre.GenreId
-        else:
-            genre_id = genre_id[0]
-
-        new_user_genre_link = UserGenreLink(UserId=self.user_id, GenreId=genre_id)
-        self.session.add(new_user_genre_link)
+        """Добавление жанра с названием title одной транзакцией:
+        жанр добавляется в таблицу жанров, если его там еще нет (INSERT ... ON CONFLICT по уникальному названию),
+        затем в таблицу user_genre_links добавляется запись с ИД пользователя и ИД жанра;
+        Если у пользователя уже есть этот жанр, вызывается IntegrityError и ничего не изменяется"""
+        title = title.lower()
+        genre_id = self._upsert_title(Genre, Genre.GenreId, title)
+        self.session.execute(insert(UserGenreLink).values(UserId=self.user_id, GenreId=genre_id))
         self.commit()
+        self._notify(CatalogChange('genre', added=(genre_id, title)))
 
     def edit_genre(self, genre_id: int, title: str):
-        """Редактирование жанра с ИД genre_id: старое название заменяется на title;
-        Если жанра с новым названием нет в таблице жанров, то добавляется новый жанр с названием title и берется его ИД;
-        Если данный жанр есть в таблице жанров, то берется ИД жанра с названием title;
-        После этого в таблицу user_genre_links добавляется запись с ИД пользователя и ИД жанра"""
-        find_genre_statement = select(Genre.GenreId).select_from(Genre).where(Genre.title == title)
-        new_genre_id = self.session.execute(find_genre_statement).first()
-        if new_genre_id is None:
-            new_genre = Genre(title=title.lower())
-            self.session.add(new_genre)
-            self.commit()
-            new_genre_id = new_genre.GenreId
-        else:
-            new_genre_id = new_genre_id[0]
-
+        """Редактирование жанра с ИД genre_id одной транзакцией: старое название заменяется на title;
+        Жанр с новым названием добавляется в таблицу жанров, если его там еще нет,
+        затем запись пользователя в user_genre_links переводится на ИД этого жанра;
+        Если у пользователя уже есть жанр с новым названием, вызывается IntegrityError и ничего не изменяется"""
+        title = title.lower()
+        new_genre_id = self._upsert_title(Genre, Genre.GenreId, title)
         update_user_genre_link_statement = update(UserGenreLink).where(
             and_(UserGenreLink.GenreId == genre_id, UserGenreLink.UserId == self.user_id)).values(GenreId=new_genre_id)
         self.session.execute(update_user_genre_link_statement)
         self.commit()
+        self._notify(CatalogChange('genre', genre_id, (new_genre_id, title)))
 
     def delete_genre(self, genre_id: int):
         """Удаление из таблицы user_genre_links записи, где ИД жанра - genre_id"""
-        find_genre_statement = select(Book.genre_id_book_fk).select_from(Book).where(
-            and_(Book.genre_id_book_fk == genre_id, Book.user_id_book_fk == self.user_id))
-        result = self.session.execute(find_genre_statement).first()
-        if result is not None:
+        if self._count_books('genre', genre_id):
             raise GenreInUseError
 
         delete_genre_statement = delete(UserGenreLink).where(and_(UserGenreLink.GenreId == genre_id,
                                                                   UserGenreLink.UserId == self.user_id))
         self.session.execute(delete_genre_statement)
         self.commit()
+        self._notify(CatalogChange('genre', genre_id))
 
     def add_author(self, title: str):
-        """Добавление автора с названием title
-        Если данного автора нет в таблице жанров, то добавляется новый автор с названием title и берется его ИД;
-        Если данный автор есть в таблице жанров, то берется ИД автора с названием title;
-        После этого в таблицу user_author_links добавляется запись с ИД пользователя и ИД автора"""
-        statement = select(Author.AuthorId).select_from(Author).where(Author.title == title.lower())
-        author_id = self.session.execute(statement).first()
-        if author_id is None:
-            new_author = Author(title=title.lower())
-            self.session.add(new_author)
-            self.commit()
-            author_id = new_author.AuthorId
-        else:
-            author_id = author_id[0]
-
-        new_user_author_link = UserAuthorLink(UserId=self.user_id, AuthorId=author_id)
-        self.session.add(new_user_author_link)
+        """Добавление автора с названием title одной транзакцией:
+        автор добавляется в таблицу авторов, если его там еще нет (INSERT ... ON CONFLICT по уникальному названию),
+        затем в таблицу user_author_links добавляется запись с ИД пользователя и ИД автора;
+        Если у пользователя уже есть этот автор, вызывается IntegrityError и ничего не изменяется"""
+        title = title.lower()
+        author_id = self._upsert_title(Author, Author.AuthorId, title)
+        self.session.execute(insert(UserAuthorLink).values(UserId=self.user_id, AuthorId=author_id))
         self.commit()
+        self._notify(CatalogChange('author', added=(author_id, title)))
 
     def edit_author(self, author_id: int, title: str):
-        """Редактирование автора с ИД author_id: старое название заменяется на title;
-        Если автора с новым названием нет в таблице авторов,
-        то добавляется новый автор с названием title и берется его ИД;
-        Если данный жанр есть в таблице жанров, то берется ИД жанра с названием title;
-        После этого в таблицу user_genre_links добавляется запись с ИД пользователя и ИД жанра"""
-        find_author_statement = select(Author.AuthorId).select_from(Author).where(Author.title == title)
-        new_author_id = self.session.execute(find_author_statement).first()
-        if new_author_id is None:
-            new_author = Author(title=title.lower())
-            self.session.add(new_author)
-            self.commit()
-            new_author_id = new_author.AuthorId
-        else:
-            new_author_id = new_author_id[0]
-
+        """Редактирование автора с ИД author_id одной транзакцией: старое название заменяется на title;
+        Автор с новым названием добавляется в таблицу авторов, если его там еще нет,
+        затем запись пользователя в user_author_links переводится на ИД этого автора;
+        Если у пользователя уже есть автор с новым названием, вызывается IntegrityError и ничего не изменяется"""
+        title = title.lower()
+        new_author_id = self._upsert_title(Author, Author.AuthorId, title)
         update_user_author_link_statement = update(UserAuthorLink).where(
             and_(UserAuthorLink.AuthorId == author_id, UserAuthorLink.UserId == self.user_id)).values(
             AuthorId=new_author_id)
         self.session.execute(update_user_author_link_statement)
         self.commit()
+        self._notify(CatalogChange('author', author_id, (new_author_id, title)))
+
+    def _upsert_title(self, model: type[Author] | type[Genre], id_column, title: str) -> int:
+        """ИД записи model с названием title; запись добавляется, если ее нет, без фиксации изменений"""
+        self.session.execute(sqlite_insert(model).values(title=title).on_conflict_do_nothing(
+            index_elements=[model.title]))
+        return self.session.execute(select(id_column).where(model.title == title)).scalar_one()
 
     def delete_author(self, author_id: int):
         """Удаление из таблицы user_author_links записи, где ИД автора - author_id"""
-
-        find_author_statement = select(Book.author_id_book_fk).select_from(Book).where(
-            and_(Book.author_id_book_fk == author_id, Book.user_id_book_fk == self.user_id))
-        result = self.session.execute(find_author_statement).first()
-        if result is not None:
+        if self._count_books('author', author_id):
             raise AuthorInUseError
 
         delete_author_statement = delete(UserAuthorLink).where(and_(UserAuthorLink.AuthorId == author_id,
                                                                     UserAuthorLink.UserId == self.user_id))
         self.session.execute(delete_author_statement)
         self.commit()
+        self._notify(CatalogChange('author', author_id))
 
     def add_book(self, title: str, author_id_book_fk: int, genre_id_book_fk: int, status: str):
         """Добавление книги"""
         new_book = Book(title=title.lower(), author_id_book_fk=author_id_book_fk, genre_id_book_fk=genre_id_book_fk,
                         status=status, user_id_book_fk=self.user_id)
         self.session.add(new_book)
+        self.session.flush()
+        book_id = new_book.BookId
         self.commit()
+        self._notify(CatalogChange('book', added=(book_id, title.lower(), author_id_book_fk, genre_id_book_fk, status)))
 
     def edit_book(self, book_id: int, title: str, author_id_book_fk: int, genre_id_book_fk: int, status: str):
-        """Редактирование книги"""
-        statement = update(Book).where(Book.BookId == book_id).values(title=title.lower(),
-                                                                      author_id_book_fk=author_id_book_fk,
-                                                                      genre_id_book_fk=genre_id_book_fk,
-                                                                      status=status)
-        self.session.execute(statement)
+        """Редактирование книги; если такой книги нет среди книг пользователя, вызывается BookNotFoundError"""
+        statement = update(Book).where(Book.BookId == book_id, Book.user_id_book_fk == self.user_id).values(
+            title=title.lower(), author_id_book_fk=author_id_book_fk, genre_id_book_fk=genre_id_book_fk,
+            status=status)
+        if not self.session.execute(statement).rowcount:
+            raise BookNotFoundError(book_id)
         self.commit()
+        self._notify(CatalogChange('book', book_id,
+                                   (book_id, title.lower(), author_id_book_fk, genre_id_book_fk, status)))
 
     def delete_book(self, book_id: int):
-        """Удаление книги"""
-        statement = delete(Book).where(Book.BookId == book_id)
-        self.session.execute(statement)
+        """Удаление книги; если такой книги нет среди книг пользователя, вызывается BookNotFoundError"""
+        statement = delete(Book).where(Book.BookId == book_id, Book.user_id_book_fk == self.user_id)
+        if not self.session.execute(statement).rowcount:
+            raise BookNotFoundError(book_id)
         self.commit()
+        self._notify(CatalogChange('book', book_id))
+
+    def delete_books(self, book_ids: Sequence[int]):
+        """Удаление книг пользователя book_ids в одной транзакции; ИД передаются пакетами под ограничение SQLite,
+        по одному DELETE на пакет; ИД, которых нет среди книг пользователя, пропускаются,
+        а в изменении каталога сообщаются только действительно удаленные книги"""
+        removed_ids = []
+        for chunk in _chunks(tuple(book_ids)):
+            statement = delete(Book).where(Book.user_id_book_fk == self.user_id,
+                                           Book.BookId.in_(chunk)).returning(Book.BookId)
+            removed_ids.extend(self.session.execute(statement).scalars())
+        self.commit()
+        self._notify(CatalogChange('books', removed_ids=tuple(removed_ids)))
+
+    def update_books(self, book_ids: Sequence[int],
+                     status: str | None = None,
+                     author_id_book_fk: int | None = None,
+                     genre_id_book_fk: int | None = None):
+        """Изменение статуса, автора и / или жанра (заданных не None) книг пользователя book_ids
+        в одной транзакции, по одному UPDATE ... RETURNING на пакет ИД; ИД, которых нет среди книг пользователя,
+        пропускаются, а в изменении каталога сообщаются только действительно измененные книги"""
+        values = {name: value for name, value in (('status', status),
+                                                  ('author_id_book_fk', author_id_book_fk),
+                                                  ('genre_id_book_fk', genre_id_book_fk)) if value is not None}
+        book_ids = tuple(book_ids)
+        if not values or not book_ids:
+            return
+
+        books = []
+        for chunk in _chunks(book_ids):
+            statement = update(Book).where(Book.user_id_book_fk == self.user_id,
+                                           Book.BookId.in_(chunk)).values(**values).returning(
+                Book.BookId, Book.title, Book.author_id_book_fk, Book.genre_id_book_fk, Book.status)
+            books.extend(map(tuple, self.session.execute(statement).all()))
+        self.commit()
+        self._notify(CatalogChange('books', added=tuple(books), removed_ids=tuple(book[0] for book in books)))
 
-    def export_csv(self, filename: str):
+    def export_csv(self, filename: str | TextIO,
+                   progress_callback: Callable[[int, int], bool] | None = None,
+                   chunk_size: int = EXPORT_CHUNK_SIZE) -> bool:
         """Экспорт книг в формате csv;
-        Создается файл filename и в него записывается информация о книгах (без указания пользователя)"""
+        Создается файл filename и в него записывается информация о книгах (без указания пользователя);
+        Вместо имени файла можно передать текстовый поток (например, sys.stdout): он не закрывается,
+        а при прерывании в нем остается уже записанная часть;
+        Книги читаются из базы данных и записываются порциями по chunk_size строк, поэтому расход памяти
+        не зависит от размера библиотеки;
+        После каждой порции вызывается progress_callback(записано, всего): если он вернул False, экспорт
+        прерывается, недописанный файл удаляется и возвращается False"""
+        count_statement, statement = self._export_statements(chunk_size)
+        total = self.session.execute(count_statement).scalar()
+
+        if not isinstance(filename, str):
+            return self._write_csv(filename, statement, total, progress_callback)
+
+        partial_filename = f'{filename}.part'
+        completed = False
+        try:
+            with open(partial_filename, 'w', encoding='utf-8', newline='') as file:
+                completed = self._write_csv(file, statement, total, progress_callback)
+            if completed:
+                os.replace(partial_filename, filename)
+        finally:
+            if not completed and os.path.exists(partial_filename):
+                os.remove(partial_filename)
+        return completed
+
+    def _export_statements(self, chunk_size: int) -> tuple[Select, Select]:
+        """Запросы экспорта: количество книг пользователя и строки файла, читаемые порциями по chunk_size"""
+        count_statement = select(func.count()).select_from(Book).where(Book.user_id_book_fk == self.user_id)
         statement = select(Book.title, Author.title, Genre.title, Book.status).select_from(Book).where(
-            Book.user_id_book_fk == self.user_id).join(Author).join(Genre)
-
-        user_book_data = self.session.execute(statement).all()
-        header = ('Book', 'Author', 'Genre', 'Status')
-        with open(filename, 'w', encoding='utf-8', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(header)
-            writer.writerows(user_book_data)
-
-    def import_csv(self, filename: str):
-        """Импорт книг в формате csv;
-        Стирается вся информация о жанрах, авторах и книгах пользователя;
-        При чтении каждой записи добавляется жанр / автор при их отсутствии;
-        Добавляется книга"""
-        self.clear_all_user_data()
-
+            Book.user_id_book_fk == self.user_id).join(Author).join(Genre).execution_options(yield_per=chunk_size)
+        return count_statement, statement
+
+    def _write_csv(self, file: TextIO, statement: Select, total: int,
+                   progress_callback: Callable[[int, int], bool] | None) -> bool:
+        """Запись результата statement в file порциями; возвращает False, если progress_callback прервал запись"""
+        writer = csv.writer(file)
+        writer.writerow(EXPORT_CSV_HEADER)
+        written = 0
+        for chunk in self.session.execute(statement).partitions():
+            writer.writerows(chunk)
+            written += len(chunk)
+            if progress_callback is not None and not progress_callback(written, total):
+                return False
+        return True
+
+    def import_csv(self, filename: str | BinaryIO,
+                   progress_callback: Callable[[int, int, int], bool] | None = None,
+                   chunk_rows: int = IMPORT_CHUNK_ROWS) -> CsvImportReport | None:
+        """Импорт книг в формате csv (database/csv_import.py) из файла или двоичного потока
+        (например, sys.stdin.buffer; размер потока неизвестен и передается как 0);
+        Стирается вся информация о жанрах, авторах и книгах пользователя (повторный импорт измененного файла
+        быстрее выполняет merge_csv);
+        Кодировка и разделитель столбцов определяются по началу файла, столбцы - по заголовку;
+        Файл читается в фоновом потоке порциями по chunk_rows строк, пока предыдущая порция записывается
+        в базу данных, поэтому расход памяти не зависит от размера файла;
+        Строки с ошибками пропускаются и перечисляются в отчете;
+        После каждой порции вызывается progress_callback(прочитано байт, размер файла, прочитано строк):
+        если он вернул False, импорт прерывается и возвращается None;
+        Импорт выполняется в одной транзакции: при ошибке или отмене данные пользователя остаются без изменений"""
+        return self._import_csv(filename, progress_callback, chunk_rows, merge=False)
+
+    def merge_csv(self, filename: str | BinaryIO,
+                  progress_callback: Callable[[int, int, int], bool] | None = None,
+                  chunk_rows: int = IMPORT_CHUNK_ROWS) -> CsvImportReport | None:
+        """Импорт csv слиянием с библиотекой (database/csv_merge.py): результат тот же, что у import_csv,
+        но записываются только отличия - книги, которых нет в файле, удаляются, книги с другим статусом
+        изменяются, новые строки файла добавляются; у остальных книг сохраняются ИД;
+        Авторы и жанры пользователя, которых нет в файле, удаляются, как и при замене;
+        Аргументы, прогресс, отмена и одна транзакция - как у import_csv; файл и книги библиотеки
+        читаются целиком, а запись в базу данных пропорциональна количеству отличий"""
+        return self._import_csv(filename, progress_callback, chunk_rows, merge=True)
+
+    def _import_csv(self, filename: str | BinaryIO, progress_callback: Callable[[int, int, int], bool] | None,
+                    chunk_rows: int, merge: bool) -> CsvImportReport | None:
+        """Общая часть import_csv и merge_csv: чтение файла порциями, одна транзакция и отчет"""
+        started = time.perf_counter()
+        imported, skipped, errors = 0, 0, []
         try:
-            with open(filename, encoding='utf-8') as file:
-                author_dict, genre_dict = {}, {}
-
-                reader = csv.DictReader(file)
-                for record in reader:
-                    record: dict
-                    author_title: str = record['Author'].lower()
-                    if author_title not in author_dict:
-                        self.add_author(author_title)
-                    get_authorid_statement = select(Author.AuthorId).select_from(Author).where(
-                        Author.title == author_title)
-                    author_id = self.session.execute(get_authorid_statement).one()[0]
-                    author_dict[author_title] = author_id
-
-                    genre_title: str = record['Genre'].lower()
-                    if genre_title not in genre_dict:
-                        self.add_genre(record['Genre'])
-                    get_genre_id_statement = select(Genre.GenreId).select_from(Genre).where(Genre.title == genre_title)
-                    genre_id = self.session.execute(get_genre_id_statement).one()[0]
-                    genre_dict[genre_title] = genre_id
-
-                    self.add_book(record['Book'], author_dict[author_title], genre_dict[genre_title], record['Status'])
-        except Exception:
-            raise CsvImportError
+            reader = CsvBookReader(filename, chunk_rows)
+            if merge:
+                diff = CsvMergeDiff(self._select_user_books(chunk_rows))
+                write_records = diff.add
+            else:
+                deleted = self._delete_all_user_data()
+                write_records = partial(self._import_chunk, author_dict={}, genre_dict={})
+            with Prefetcher(reader.chunks()) as chunks:
+                for chunk in chunks:
+                    write_records(chunk.records)
+                    imported += len(chunk.records)
+                    skipped += len(chunk.errors)
+                    errors.extend(chunk.errors[:MAX_REPORTED_ERRORS - len(errors)])
+                    if progress_callback is not None and \
+                            not progress_callback(chunk.bytes_read, reader.total_bytes, chunk.rows_read):
+                        self.rollback()
+                        return None
+            if merge:
+                delta = diff.delta()
+                changes = self._apply_merge(delta)
+                inserted, updated, deleted = len(delta.inserts), delta.updated, len(delta.deletes)
+            else:
+                changes = [CatalogChange('reset')]
+                inserted, updated = imported, 0
+            self.commit()
+        except (OSError, CsvFormatError) as error:
+            self.rollback()
+            raise CsvImportError(str(error)) from error
+        except Exception as error:
+            self.rollback()
+            raise CsvImportError from error
+        for change in changes:
+            self._notify(change)
+
+        return CsvImportReport(imported, time.perf_counter() - started, skipped, tuple(errors), reader.encoding,
+                               reader.dialect.delimiter, inserted, updated, deleted)
+
+    def _select_user_books(self, chunk_rows: int) -> Iterable[Row[tuple[Any, Any, Any, Any, Any]]]:
+        """Книги пользователя (ИД, название, автор, жанр, статус), читаемые из базы данных порциями"""
+        statement = select(Book.BookId, Book.title, Author.title, Genre.title, Book.status).select_from(Book).where(
+            Book.user_id_book_fk == self.user_id).join(Author).join(Genre).execution_options(yield_per=chunk_rows)
+        return self.session.execute(statement)
+
+    def _apply_merge(self, delta: CsvMergeDelta) -> list[CatalogChange]:
+        """Запись разницы слияния без фиксации изменений; возвращает изменения каталога для подписчиков:
+        по отдельности, если изменено не больше MERGE_NOTIFY_MAX_BOOKS книг, иначе 'reset'"""
+        user_authors = dict(self.get_user_authors())
+        user_genres = dict(self.get_user_genres())
+        for chunk in _chunks(delta.deletes):
+            self.session.execute(delete(Book).where(Book.user_id_book_fk == self.user_id, Book.BookId.in_(chunk)))
+        updated_ids = []
+        for status, book_ids in delta.updates.items():
+            for chunk in _chunks(book_ids):
+                self.session.execute(update(Book).where(Book.user_id_book_fk == self.user_id,
+                                                        Book.BookId.in_(chunk)).values(status=status))
+            updated_ids.extend(book_ids)
+
+        author_dict, genre_dict = dict(user_authors), dict(user_genres)
+        notify_books = len(delta.deletes) + len(updated_ids) + len(delta.inserts) <= MERGE_NOTIFY_MAX_BOOKS
+        inserted_ids = self._import_chunk(delta.inserts, author_dict, genre_dict, returning=notify_books)
+
+        # Авторы и жанры, которых нет в файле, больше не используются книгами пользователя
+        removed_authors = [author_id for title, author_id in user_authors.items() if title not in delta.authors]
+        removed_genres = [genre_id for title, genre_id in user_genres.items() if title not in delta.genres]
+        for chunk in _chunks(removed_authors):
+            self.session.execute(delete(UserAuthorLink).where(UserAuthorLink.UserId == self.user_id,
+                                                              UserAuthorLink.AuthorId.in_(chunk)))
+        for chunk in _chunks(removed_genres):
+            self.session.execute(delete(UserGenreLink).where(UserGenreLink.UserId == self.user_id,
+                                                             UserGenreLink.GenreId.in_(chunk)))
+
+        if not notify_books:
+            return [CatalogChange('reset')]
+        # Новые авторы и жанры сообщаются до книг, а удаленные - после: подписчики собирают строки книг
+        # из своих списков авторов и жанров
+        changes = [CatalogChange('author', added=(author_id, title)) for title, author_id in author_dict.items()
+                   if title not in user_authors]
+        changes.extend(CatalogChange('genre', added=(genre_id, title)) for title, genre_id in genre_dict.items()
+                       if title not in user_genres)
+        if delta.deletes or updated_ids or inserted_ids:
+            books = []
+            for chunk in _chunks(updated_ids + inserted_ids):
+                statement = select(Book.BookId, Book.title, Book.author_id_book_fk, Book.genre_id_book_fk,
+                                   Book.status).where(Book.BookId.in_(chunk))
+                books.extend(map(tuple, self.session.execute(statement).all()))
+            changes.append(CatalogChange('books', added=tuple(books),
+                                         removed_ids=tuple(delta.deletes) + tuple(updated_ids)))
+        changes.extend(CatalogChange('author', author_id) for author_id in removed_authors)
+        changes.extend(CatalogChange('genre', genre_id) for genre_id in removed_genres)
+        return changes
+
+    def _import_chunk(self, records: Sequence[tuple[str, str, str, str]], author_dict: dict[str, int],
+                      genre_dict: dict[str, int], returning: bool = False) -> list[int]:
+        """Запись порции импорта без фиксации изменений;
+        Авторы и жанры, которых еще не было в файле, находятся / добавляются пакетно вместе со связями
+        с пользователем и запоминаются в author_dict / genre_dict; книги добавляются многострочными INSERT;
+        При returning=True возвращаются ИД добавленных книг"""
+        for model, id_column, link_model, link_column, title_dict, position in (
+                (Author, Author.AuthorId, UserAuthorLink, 'AuthorId', author_dict, 1),
+                (Genre, Genre.GenreId, UserGenreLink, 'GenreId', genre_dict, 2)):
+            new_titles = {record[position] for record in records} - title_dict.keys()
+            if new_titles:
+                new_ids = self._resolve_titles(model, id_column, new_titles)
+                title_dict.update(new_ids)
+                self._insert_many(link_model, [{'UserId': self.user_id, link_column: item_id}
+                                               for item_id in new_ids.values()])
+
+        return self._insert_many(Book, [{'title': title,
+                                         'author_id_book_fk': author_dict[author_title],
+                                         'genre_id_book_fk': genre_dict[genre_title],
+                                         'status': status,
+                                         'user_id_book_fk': self.user_id}
+                                        for title, author_title, genre_title, status in records],
+                                 Book.BookId if returning else None)
+
+    def _resolve_titles(self, model: type[Author] | type[Genre], id_column, titles: Iterable[str]) -> dict[str, int]:
+        """Возвращает словарь название -> ИД для всех названий titles;
+        Недостающие записи добавляются в таблицу model пакетно, без фиксации изменений"""
+        titles = list(titles)
+        title_dict = self._select_title_ids(model, id_column, titles)
+
+        missing_titles = [title for title in titles if title not in title_dict]
+        if missing_titles:
+            self._insert_many(model, [{'title': title} for title in missing_titles])
+            title_dict.update(self._select_title_ids(model, id_column, missing_titles))
+        return title_dict
+
+    def _insert_many(self, model, rows: list[dict[str, Any]], returning: ColumnElement | None = None) -> list:
+        """Пакетное добавление записей многострочными INSERT ... VALUES без фиксации изменений;
+        Один оператор на пакет, а не на строку, чтобы триггеры полнотекстового индекса
+        не сбрасывали индекс на диск после каждой строки;
+        Если задан столбец returning, возвращаются его значения у добавленных записей (INSERT ... RETURNING)"""
+        if not rows:
+            return []
+        values = []
+        batch_size = max(_MAX_QUERY_PARAMETERS // len(rows[0]), 1)
+        for start in range(0, len(rows), batch_size):
+            statement = insert(model).values(rows[start:start + batch_size])
+            if returning is None:
+                self.session.execute(statement)
+            else:
+                values.extend(self.session.execute(statement.returning(returning)).scalars())
+        return values
+
+    def _select_title_ids(self, model: type[Author] | type[Genre], id_column, titles: list[str]) -> dict[str, int]:
+        """Ищет ИД записей model по списку названий, разбивая список на части под ограничение SQLite"""
+        title_dict = {}
+        for chunk in _chunks(titles):
+            statement = select(model.title, id_column).select_from(model).where(model.title.in_(chunk))
+            title_dict.update(self.session.execute(statement).tuples().all())
+        return title_dict
 
     def clear_all_user_data(self):
         """Удаление всех книг, авторов и жанров пользователя"""
+        self._delete_all_user_data()
+        self.commit()
+        self._notify(CatalogChange('reset'))
+
+    def delete_account(self):
+        """Удаление пользователя вместе со всеми его книгами, авторами и жанрами одной транзакцией"""
+        self._delete_all_user_data()
+        self.session.execute(delete(User).where(User.UserId == self.user_id))
+        self.commit()
+        self._notify(CatalogChange('reset'))
+
+    def run_maintenance(self) -> MaintenanceReport:
+        """Обслуживание всей базы данных (database/maintenance.py): удаление жанров и авторов,
+        которые не использует ни один пользователь, очистка свободных страниц и ANALYZE;
+        Сессия предварительно закрывается, чтобы ее подключение не удерживало транзакцию"""
+        self.session.close()
+        return run_maintenance(self.session.get_bind())
+
+    def _delete_all_user_data(self) -> int:
+        """Удаление всех книг, авторов и жанров пользователя без фиксации изменений; возвращает количество
+        удаленных книг"""
         clear_books_statement = delete(Book).where(Book.user_id_book_fk == self.user_id)
         clear_user_genre_links = delete(UserGenreLink).where(UserGenreLink.UserId == self.user_id)
         clear_user_author_links = delete(UserAuthorLink).where(UserAuthorLink.UserId == self.user_id)
 
-        self.session.execute(clear_books_statement)
+        deleted = self.session.execute(clear_books_statement).rowcount
         self.session.execute(clear_user_genre_links)
         self.session.execute(clear_user_author_links)
-
-        self.commit()
+        return deleted
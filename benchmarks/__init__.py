@@ -0,0 +1 @@
+"""Бенчмарки производительности работы с базой данных"""
@@ -0,0 +1,99 @@
+"""Сравнение задержки поиска книг до и после создания индексов (миграция 2)
+Запуск из корня проекта: python -m benchmarks.index_search --users 1000 --books 1000000"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.synthetic import SyntheticConfig, fill_database
+from database.migrations import _create_search_indexes, migrate
+from database.models import _Base, User
+from database.session import DatabaseSessionManager, create_database_engine
+from sqlalchemy import Engine, select
+from UserDatabaseManager import UserDatabaseManager
+
+
+def _search_cases() -> dict[str, Callable[[UserDatabaseManager], object]]:
+    """Набор измеряемых запросов: поиск книг с разными фильтрами и поиск пользователя при входе"""
+    def login(manager: UserDatabaseManager):
+        statement = select(User.UserId).where(User.username == f'user{manager.user_id}')
+        return manager.session.execute(statement).first()
+
+    def by_author(manager: UserDatabaseManager):
+        return manager.search_books(author=manager.get_user_authors()[0][0], sort_by='Названию')
+
+    def by_genre(manager: UserDatabaseManager):
+        return manager.search_books(genre=manager.get_user_genres()[0][0], sort_by='Названию')
+
+    return {
+        'все книги': lambda manager: manager.search_books(sort_by='Названию'),
+        'название': lambda manager: manager.search_books(title='мир', sort_by='Названию'),
+        'автор': by_author,
+        'жанр': by_genre,
+        'статус': lambda manager: manager.search_books(status='Читается', sort_by='Автору'),
+        'жанры пользователя': lambda manager: manager.get_user_genres(),
+        'вход': login,
+    }
+
+
+def measure(engine: Engine, user_ids: list[int], repeat: int) -> dict[str, float]:
+    """Медианное время выполнения каждого запроса в миллисекундах"""
+    session_manager = DatabaseSessionManager(engine)
+    results = {}
+    for name, case in _search_cases().items():
+        timings = []
+        for user_id in user_ids:
+            manager = UserDatabaseManager(user_id, session_manager)
+            # Замеряются запросы к базе данных, а не кэш результатов поиска
+            manager.search_cache.max_rows = 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                case(manager)
+                timings.append((time.perf_counter() - started) * 1000)
+            manager.close()
+        results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--books', type=int, default=1_000_000)
+    parser.add_argument('--authors', type=int, default=20_000)
+    parser.add_argument('--genres', type=int, default=200)
+    parser.add_argument('--sample', type=int, default=20, help='количество пользователей для замеров')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database_engine(f'sqlite:///{os.path.join(directory, "benchmark.sqlite")}')
+        migrate(engine)
+        with engine.begin() as connection:
+            for table in _Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.drop(connection)
+
+        started = time.perf_counter()
+        fill_database(engine, SyntheticConfig(args.users, max(args.books // args.users, 1), args.authors, args.genres))
+        print(f'База данных заполнена за {time.perf_counter() - started:.1f} с')
+
+        user_ids = random.Random(1).sample(range(1, args.users + 1), min(args.sample, args.users))
+        before = measure(engine, user_ids, args.repeat)
+
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            _create_search_indexes(connection)
+        print(f'Индексы созданы за {time.perf_counter() - started:.1f} с')
+        after = measure(engine, user_ids, args.repeat)
+        engine.dispose()
+
+    print(f'{"запрос":<20}{"до, мс":>12}{"после, мс":>12}{"ускорение":>12}')
+    for name in before:
+        print(f'{name:<20}{before[name]:>12.2f}{after[name]:>12.2f}{before[name] / after[name]:>11.1f}x')
+
+
+if __name__ == '__main__':
+    main()
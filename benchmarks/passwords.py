@@ -0,0 +1,52 @@
+"""Подбор стоимости хэширования паролей (database/passwords.py) для текущего компьютера
+Запуск из корня проекта:
+    python -m benchmarks.passwords --target-ms 250
+Измеряется медиана времени вычисления scrypt для n = 2^10 ... 2^20 (r и p - текущие параметры);
+Выводится наибольшее n, при котором проверка пароля укладывается в целевое время, и переменная окружения
+для него; завершается с кодом 1, если текущие параметры медленнее цели"""
+import argparse
+import statistics
+import sys
+import time
+
+from database.passwords import PARAMETERS, SCRYPT_N_ENV, ScryptParameters, hash_password
+
+# Цель: проверка пароля при входе занимает не больше стольких миллисекунд
+LOGIN_TARGET_MS = 250.0
+
+
+def measure(parameters: ScryptParameters, repeat: int) -> float:
+    """Медиана времени хэширования пароля с параметрами parameters в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hash_password('password', parameters)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--target-ms', type=float, default=LOGIN_TARGET_MS)
+    args = parser.parse_args()
+
+    best = None
+    for power in range(10, 21):
+        parameters = PARAMETERS._replace(n=2 ** power)
+        elapsed = measure(parameters, args.repeat)
+        mark = '  (текущие)' if parameters == PARAMETERS else ''
+        print(f'n = 2^{power:<3}{elapsed:10.1f} мс{mark}')
+        if elapsed > args.target_ms:
+            break
+        best = parameters
+
+    current = measure(PARAMETERS, args.repeat)
+    print(f'Текущие параметры {tuple(PARAMETERS)}: {current:.1f} мс, цель {args.target_ms:.0f} мс')
+    if best is not None:
+        print(f'Рекомендуется {SCRYPT_N_ENV}={best.n}')
+    return 1 if current > args.target_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Нагрузочный тест сервера библиотеки (server.py): несколько клиентов одновременно ищут книги и изменяют данные
+Запуск из корня проекта:
+    python -m benchmarks.server_load --clients 16 --seconds 10 --write-ratio 0.2
+    python -m benchmarks.server_load --max-batch 1   # сравнение без групповой фиксации
+Сервер запускается отдельным процессом на временной синтетической базе данных; с --url используется уже
+запущенный сервер, пользователи которого - user<N> с паролем password (benchmarks/synthetic.py);
+Выводятся пропускная способность, задержки по операциям, доля ответов 304 и среднее количество изменений
+в одной транзакции групповой фиксации"""
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any
+
+from benchmarks.synthetic import STATUSES, WORDS, SyntheticConfig, fill_database
+from database.group_commit import GROUP_COMMIT_MAX_REQUESTS
+from database.migrations import migrate
+from database.session import create_database_engine
+from LibraryClient import LibraryConnection, login
+from RemoteUserDatabaseManager import RemoteUserDatabaseManager
+from server import READER_THREADS
+from UserDatabaseManager import CatalogChange
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Фильтры поиска, из которых клиенты выбирают случайно: повторяющиеся запросы проверяют ответы 304
+SEARCH_TITLES = (None,) + WORDS[:5]
+SEARCH_STATUSES = (None,) + STATUSES
+
+
+def _percentile(timings: list[float], fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class _Client(threading.Thread):
+    """Клиент: случайные запросы поиска и статистики, с вероятностью write_ratio - добавление или удаление книги"""
+
+    def __init__(self, manager: RemoteUserDatabaseManager, deadline: float, write_ratio: float, seed: int):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.deadline = deadline
+        self.write_ratio = write_ratio
+        self.rng = random.Random(seed)
+        self.timings: dict[str, list[float]] = {}
+        self.errors = 0
+        self._added_ids: list[int] = []
+        manager.add_change_listener(self._on_change)
+
+    def _on_change(self, change: CatalogChange):
+        """ИД добавленных клиентом книг, которые он потом удаляет"""
+        if change.kind == 'book' and change.added is not None:
+            self._added_ids.append(change.added[0])
+
+    def _operation(self, author_id: int, genre_id: int) -> tuple[str, Any]:
+        if self.rng.random() < self.write_ratio:
+            if self._added_ids and self.rng.random() < 0.5:
+                book_id = self._added_ids.pop(self.rng.randrange(len(self._added_ids)))
+                return 'delete_book', lambda: self.manager.delete_book(book_id)
+            return 'add_book', lambda: self.manager.add_book(f'нагрузка {self.rng.random()}', author_id, genre_id,
+                                                             self.rng.choice(STATUSES))
+        if self.rng.random() < 0.1:
+            return 'get_statistics', self.manager.get_statistics
+        title, status = self.rng.choice(SEARCH_TITLES), self.rng.choice(SEARCH_STATUSES)
+        return 'search_books_page', lambda: self.manager.search_books_page(title, status=status, sort_by='Названию')
+
+    def run(self):
+        author_id = self.manager.get_user_authors()[0][1]
+        genre_id = self.manager.get_user_genres()[0][1]
+        while time.perf_counter() < self.deadline:
+            name, function = self._operation(author_id, genre_id)
+            started = time.perf_counter()
+            try:
+                function()
+            except Exception:
+                self.errors += 1
+                continue
+            self.timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        for book_id in self._added_ids:
+            self.manager.delete_book(book_id)
+        self.manager.close()
+
+
+def _start_server(directory: str, args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    """Синтетическая база данных и процесс сервера на свободном порту; возвращает процесс и адрес сервера"""
+    database = os.path.join(directory, 'server_load.sqlite')
+    engine = create_database_engine(f'sqlite:///{database}')
+    migrate(engine)
+    fill_database(engine, SyntheticConfig(args.users, args.books, authors=2000, genres=100))
+    engine.dispose()
+
+    process = subprocess.Popen([sys.executable, os.path.join(PROJECT_DIRECTORY, 'server.py'), '--port', '0',
+                                '--database', database, '--readers', str(args.readers),
+                                '--max-batch', str(args.max_batch)],
+                               cwd=PROJECT_DIRECTORY, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    url = process.stdout.readline().rsplit(' ', 1)[-1].strip()
+    if not url:
+        process.kill()
+        raise RuntimeError('Сервер не запустился')
+    return process, url
+
+
+def run_load(url: str, args: argparse.Namespace) -> dict[str, Any]:
+    """Запуск клиентов и сбор замеров"""
+    managers = []
+    for number in range(args.clients):
+        connection = login(url, f'user{number % args.users + 1}', 'password')
+        if connection is None:
+            raise RuntimeError(f'Не удалось войти как user{number % args.users + 1}')
+        managers.append(RemoteUserDatabaseManager(connection))
+
+    stats_connection = LibraryConnection(url)
+    stats_before = stats_connection.call('GET', '/stats').json()
+    started = time.perf_counter()
+    clients = [_Client(manager, started + args.seconds, args.write_ratio, seed)
+               for seed, manager in enumerate(managers)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+    stats_after = stats_connection.call('GET', '/stats').json()
+
+    timings: dict[str, list[float]] = {}
+    for client in clients:
+        for name, values in client.timings.items():
+            timings.setdefault(name, []).extend(values)
+    counters = {name: stats_after[name] - stats_before[name]
+                for name in ('reads', 'not_modified', 'batches', 'writes', 'failed_writes')}
+    return {'seconds': elapsed, 'timings': timings, 'errors': sum(client.errors for client in clients),
+            'server': counters}
+
+
+def _print_report(result: dict[str, Any]):
+    timings, server = result['timings'], result['server']
+    operations = sum(len(values) for values in timings.values())
+    print(f'{"операция":<20}{"запросов":>10}{"медиана, мс":>14}{"p95, мс":>10}{"в секунду":>12}')
+    for name, values in sorted(timings.items()):
+        print(f'{name:<20}{len(values):>10}{statistics.median(values):>14.2f}{_percentile(values, 0.95):>10.2f}'
+              f'{len(values) / result["seconds"]:>12.0f}')
+    print(f'Всего: {operations} запросов за {result["seconds"]:.1f} с, {operations / result["seconds"]:.0f} в секунду, '
+          f'ошибок: {result["errors"]}')
+    conditional = server['reads'] + server['not_modified']
+    print(f'Ответов 304: {server["not_modified"]} из {conditional} запросов чтения '
+          f'({server["not_modified"] / max(conditional, 1):.0%})')
+    print(f'Изменений: {server["writes"]} в {server["batches"]} транзакциях '
+          f'({server["writes"] / max(server["batches"], 1):.1f} на транзакцию), отменено: {server["failed_writes"]}')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='адрес запущенного сервера (по умолчанию запускается временный)')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='доля запросов изменения')
+    parser.add_argument('--users', type=int, default=8, help='пользователей, между которыми делятся клиенты')
+    parser.add_argument('--books', type=int, default=5000, help='книг на пользователя во временной базе данных')
+    parser.add_argument('--readers', type=int, default=READER_THREADS, help='потоков чтения временного сервера')
+    parser.add_argument('--max-batch', type=int, default=GROUP_COMMIT_MAX_REQUESTS,
+                        help='ограничение групповой фиксации временного сервера (1 - без групповой фиксации)')
+    args = parser.parse_args()
+
+    if args.url is not None:
+        _print_report(run_load(args.url, args))
+        return 0
+    with tempfile.TemporaryDirectory() as directory:
+        process, url = _start_server(directory, args)
+        try:
+            _print_report(run_load(url, args))
+        finally:
+            process.terminate()
+            process.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
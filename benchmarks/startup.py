@@ -0,0 +1,102 @@
+"""Проверка холодного запуска приложения: окно входа должно появляться без загрузки SQLAlchemy и главного окна
+Запуск из корня проекта:
+    python -m benchmarks.startup --repeat 5 --target-ms 600
+Проверяется список модулей, которые загружает import main (по выводу python -X importtime): среди них не должно
+быть FORBIDDEN_MODULES; затем измеряется медиана времени от запуска интерпретатора до показа окна входа.
+Первый запуск не учитывается (он может обновить схему базы данных). Также проверяется, что import cli
+не загружает CLI_FORBIDDEN_MODULES. Завершается с кодом 1, если загружен запрещенный модуль
+или время запуска больше цели"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Модули, которые должны загружаться только в фоне после показа окна входа
+FORBIDDEN_MODULES = ('sqlalchemy', 'MainMenu', 'AddForms', 'UserDatabaseManager', 'DatabaseExecutor',
+                     'database.models')
+# Модули, которые не должна загружать командная строка (cli.py) при запуске
+CLI_FORBIDDEN_MODULES = ('PyQt6', 'ui', 'sqlalchemy')
+# Цель: окно входа показывается не позже чем через столько миллисекунд после запуска интерпретатора
+STARTUP_TARGET_MS = 600.0
+
+# Дочерний процесс показывает окно входа и сразу завершается, не запуская фоновую загрузку
+_SHOW_LOGIN_WINDOW = '''
+import os
+import main
+app_manager = main.AppManager()
+app_manager.show_login_window()
+app_manager.app.processEvents()
+print('shown', flush=True)
+os._exit(0)
+'''
+
+
+def import_times(module: str = 'main') -> dict[str, tuple[int, int]]:
+    """Модули, загружаемые import module: имя -> (собственное время, суммарное время) в микросекундах"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def forbidden_imports(modules: dict[str, tuple[int, int]],
+                      forbidden_modules: tuple[str, ...] = FORBIDDEN_MODULES) -> list[str]:
+    """Запрещенные модули (и их подмодули) среди загруженных"""
+    return sorted(name for name in modules
+                  if any(name == forbidden or name.startswith(f'{forbidden}.') for forbidden in forbidden_modules))
+
+
+def measure_startup(platform: str) -> float:
+    """Время от запуска интерпретатора до показа окна входа в миллисекундах"""
+    environment = dict(os.environ, QT_QPA_PLATFORM=platform)
+    started = time.perf_counter()
+    with subprocess.Popen([sys.executable, '-c', _SHOW_LOGIN_WINDOW], cwd=ROOT, env=environment,
+                          stdout=subprocess.PIPE, text=True) as process:
+        line = process.stdout.readline()
+        elapsed = (time.perf_counter() - started) * 1000
+    if line.strip() != 'shown':
+        raise RuntimeError('Окно входа не было показано')
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--target-ms', type=float, default=STARTUP_TARGET_MS)
+    parser.add_argument('--platform', default='offscreen', help='платформа Qt (QT_QPA_PLATFORM)')
+    parser.add_argument('--top', type=int, default=10, help='сколько самых медленных модулей показать')
+    args = parser.parse_args()
+
+    modules = import_times()
+    print(f'import main: {modules["main"][1] / 1000:.1f} мс, модулей: {len(modules)}')
+    for name, (self_us, _) in sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f'    {self_us / 1000:8.1f} мс  {name}')
+    forbidden = forbidden_imports(modules)
+    if forbidden:
+        print(f'При старте загружаются модули, которые должны загружаться в фоне: {", ".join(forbidden)}')
+
+    cli_modules = import_times('cli')
+    cli_forbidden = forbidden_imports(cli_modules, CLI_FORBIDDEN_MODULES)
+    print(f'import cli: {cli_modules["cli"][1] / 1000:.1f} мс, модулей: {len(cli_modules)}')
+    if cli_forbidden:
+        print(f'Командная строка загружает при старте: {", ".join(cli_forbidden)}')
+
+    measure_startup(args.platform)
+    timings = [measure_startup(args.platform) for _ in range(args.repeat)]
+    median = statistics.median(timings)
+    print(f'Окно входа показано через {median:.0f} мс (медиана {args.repeat} запусков, '
+          f'мин. {min(timings):.0f} мс), цель {args.target_ms:.0f} мс')
+
+    return 1 if forbidden or cli_forbidden or median > args.target_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
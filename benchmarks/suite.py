@@ -0,0 +1,262 @@
+"""Бенчмарк методов UserDatabaseManager на синтетических базах данных нескольких масштабов
+Запуск из корня проекта:
+    python -m benchmarks.suite run --scale 10x100 --scale 100x1000 --output results.json
+    python -m benchmarks.suite compare baseline.json results.json --threshold 0.2
+Масштаб задается как <пользователи>x<книги на пользователя>; compare завершается с кодом 1 при регрессиях"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+import sqlalchemy
+from benchmarks.synthetic import STATUSES, SyntheticConfig, fill_database, parse_status_weights
+from database.migrations import migrate
+from database.session import DatabaseSessionManager, create_database_engine
+from UserDatabaseManager import UserDatabaseManager, CatalogChange, RELEVANCE_SORT
+
+DEFAULT_SCALES = ('10x100', '100x1000')
+# Фильтры поиска книг, все сочетания которых измеряются
+SEARCH_FILTERS = ('title', 'author', 'genre', 'status')
+# Длинная строка поиска использует полнотекстовый индекс, короткая - LIKE
+FULLTEXT_TITLE = 'мир'
+LIKE_TITLE = 'ми'
+
+
+def _percentile(timings: list[float], fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _summary(timings: list[float]) -> dict[str, float | int]:
+    """Статистика замеров в миллисекундах"""
+    return {
+        'median_ms': statistics.median(timings),
+        'p95_ms': _percentile(timings, 0.95),
+        'min_ms': min(timings),
+        'samples': len(timings),
+    }
+
+
+class _Recorder:
+    """Сбор замеров по операциям и ИД, которые сообщают изменения каталога"""
+
+    def __init__(self):
+        self.timings: dict[str, list[float]] = {}
+        self.changes: list[CatalogChange] = []
+
+    def time(self, name: str, function: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        result = function()
+        self.timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        return result
+
+    def last_added_id(self) -> int:
+        return self.changes[-1].added[0]
+
+
+def _search_cases(manager: UserDatabaseManager) -> dict[str, Callable[[], Any]]:
+    """Поиск книг со всеми сочетаниями фильтров, варианты сортировки, первая страница постраничного поиска
+    поиск жанров / авторов и статистика библиотеки"""
+    author = manager.get_user_authors()[0][0]
+    genre = manager.get_user_genres()[0][0]
+    values = {'title': FULLTEXT_TITLE, 'author': author, 'genre': genre, 'status': STATUSES[-1]}
+
+    cases = {}
+    for mask in itertools.product((False, True), repeat=len(SEARCH_FILTERS)):
+        filters = {name: values[name] for name, enabled in zip(SEARCH_FILTERS, mask) if enabled}
+        name = f'search_books[{"+".join(filters) or "-"}]'
+        cases[name] = lambda filters=filters: manager.search_books(**filters, sort_by='Названию')
+    cases['search_books[-] sort=Автору'] = lambda: manager.search_books(sort_by='Автору')
+    cases['search_books[title] sort=релевантность'] = lambda: manager.search_books(FULLTEXT_TITLE,
+                                                                                   sort_by=RELEVANCE_SORT)
+    cases['search_books[title:like]'] = lambda: manager.search_books(LIKE_TITLE, sort_by='Названию')
+    cases['search_books_page[-]'] = lambda: manager.search_books_page(sort_by='Названию')
+    cases['search_books_page[-] sort=Автору'] = lambda: manager.search_books_page(sort_by='Автору')
+    cases['get_user_genres'] = manager.get_user_genres
+    cases['get_user_authors'] = manager.get_user_authors
+    cases['search_genres[-]'] = lambda: manager.search_genres('')
+    cases['search_genres[title]'] = lambda: manager.search_genres(genre)
+    cases['search_authors[-]'] = lambda: manager.search_authors('')
+    cases['search_authors[title]'] = lambda: manager.search_authors(author)
+    cases['get_statistics'] = manager.get_statistics
+    return cases
+
+
+def _measure_user(manager: UserDatabaseManager, recorder: _Recorder, repeat: int, directory: str):
+    """Замеры всех методов для одного пользователя; данные пользователя в конце удаляются"""
+    for name, case in _search_cases(manager).items():
+        for _ in range(repeat):
+            recorder.time(name, case)
+
+    genre_id = manager.get_user_genres()[0][1]
+    author_id = manager.get_user_authors()[0][1]
+    recorder.time('get_genre', lambda: manager.get_genre(genre_id))
+    recorder.time('get_author', lambda: manager.get_author(author_id))
+
+    for kind, add, edit, delete in (('genre', manager.add_genre, manager.edit_genre, manager.delete_genre),
+                                    ('author', manager.add_author, manager.edit_author, manager.delete_author)):
+        added_ids = []
+        for number in range(repeat):
+            recorder.time(f'add_{kind}', lambda: add(f'бенчмарк {manager.user_id} {number}'))
+            added_ids.append(recorder.last_added_id())
+        edited_ids = []
+        for number, item_id in enumerate(added_ids):
+            recorder.time(f'edit_{kind}', lambda: edit(item_id, f'бенчмарк {manager.user_id} {number} изменен'))
+            edited_ids.append(recorder.last_added_id())
+        for item_id in edited_ids:
+            recorder.time(f'delete_{kind}', lambda: delete(item_id))
+
+    book_ids = []
+    for number in range(repeat):
+        recorder.time('add_book', lambda: manager.add_book(f'бенчмарк {number}', author_id, genre_id, STATUSES[0]))
+        book_ids.append(recorder.last_added_id())
+    for book_id in book_ids:
+        recorder.time('get_book', lambda: manager.get_book(book_id))
+        recorder.time('edit_book', lambda: manager.edit_book(book_id, 'бенчмарк', author_id, genre_id, STATUSES[1]))
+    for book_id in book_ids:
+        recorder.time('delete_book', lambda: manager.delete_book(book_id))
+
+    filename = os.path.join(directory, f'user{manager.user_id}.csv')
+    for _ in range(repeat):
+        recorder.time('export_csv', lambda: manager.export_csv(filename))
+    for _ in range(repeat):
+        recorder.time('import_csv', lambda: manager.import_csv(filename))
+    # Повторный импорт того же файла слиянием: книги читаются, но ничего не записывается
+    for _ in range(repeat):
+        recorder.time('merge_csv', lambda: manager.merge_csv(filename))
+    recorder.time('clear_all_user_data', manager.clear_all_user_data)
+
+
+def run_scale(config: SyntheticConfig, sample: int, repeat: int) -> dict[str, Any]:
+    """Создание синтетической базы данных масштаба config и замеры на sample случайных пользователях"""
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database_engine(f'sqlite:///{os.path.join(directory, "benchmark.sqlite")}')
+        migrate(engine)
+        started = time.perf_counter()
+        fill_database(engine, config)
+        fill_seconds = time.perf_counter() - started
+
+        session_manager = DatabaseSessionManager(engine)
+        recorder = _Recorder()
+        user_ids = random.Random(config.seed).sample(range(1, config.users + 1), min(sample, config.users))
+        for user_id in user_ids:
+            manager = UserDatabaseManager(user_id, session_manager)
+            # Замеряются запросы к базе данных, а не кэш результатов поиска
+            manager.search_cache.max_rows = 0
+            manager.add_change_listener(recorder.changes.append)
+            _measure_user(manager, recorder, repeat, directory)
+            manager.close()
+        engine.dispose()
+
+    return {
+        'config': config._asdict(),
+        'fill_seconds': fill_seconds,
+        'operations': {name: _summary(timings) for name, timings in recorder.timings.items()},
+    }
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any], threshold: float,
+            min_delta_ms: float) -> list[tuple[str, str, float, float, bool]]:
+    """Сравнение медиан двух запусков по общим масштабам и операциям;
+    Регрессия - замедление больше чем в (1 + threshold) раз и больше чем на min_delta_ms"""
+    rows = []
+    for scale, current_scale in current['scales'].items():
+        baseline_scale = baseline['scales'].get(scale)
+        if baseline_scale is None:
+            continue
+        for name, result in current_scale['operations'].items():
+            if name not in baseline_scale['operations']:
+                continue
+            before = baseline_scale['operations'][name]['median_ms']
+            after = result['median_ms']
+            regression = after > before * (1 + threshold) and after - before > min_delta_ms
+            rows.append((scale, name, before, after, regression))
+    return rows
+
+
+def _run(args: argparse.Namespace):
+    results = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'sqlalchemy': sqlalchemy.__version__,
+            'platform': platform.platform(),
+            'sample': args.sample,
+            'repeat': args.repeat,
+        },
+        'scales': {},
+    }
+    for scale in args.scale or DEFAULT_SCALES:
+        users, books_per_user = (int(value) for value in scale.split('x'))
+        config = SyntheticConfig(users, books_per_user, args.authors, args.genres,
+                                 status_weights=args.statuses, seed=args.seed)
+        print(f'Масштаб {config.name}...', file=sys.stderr)
+        results['scales'][config.name] = run_scale(config, args.sample, args.repeat)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+def _compare(args: argparse.Namespace) -> int:
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    with open(args.current, encoding='utf-8') as file:
+        current = json.load(file)
+
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+    print(f'{"масштаб":<12}{"операция":<42}{"было, мс":>12}{"стало, мс":>12}{"изменение":>12}')
+    for scale, name, before, after, regression in rows:
+        change = after / before if before > 0 else float('inf')
+        mark = '  РЕГРЕССИЯ' if regression else ''
+        print(f'{scale:<12}{name:<42}{before:>12.3f}{after:>12.3f}{change:>11.2f}x{mark}')
+
+    regressions = sum(row[-1] for row in rows)
+    print(f'Регрессий: {regressions}')
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='замеры и запись результатов в JSON')
+    run_parser.add_argument('--scale', action='append', help=f'по умолчанию {", ".join(DEFAULT_SCALES)}')
+    run_parser.add_argument('--authors', type=int, default=20_000)
+    run_parser.add_argument('--genres', type=int, default=200)
+    run_parser.add_argument('--statuses', type=parse_status_weights, default=(1.0, 1.0, 1.0),
+                            help=f'веса статусов {", ".join(STATUSES)} через запятую')
+    run_parser.add_argument('--sample', type=int, default=5, help='количество пользователей для замеров')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='файл результатов (по умолчанию - стандартный вывод)')
+
+    compare_parser = subparsers.add_parser('compare', help='сравнение двух файлов результатов')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='допустимое относительное замедление')
+    compare_parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                                help='замедление меньше этого значения считается шумом')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        _run(args)
+        return 0
+    return _compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
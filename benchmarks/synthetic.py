@@ -0,0 +1,72 @@
+"""Генератор синтетических баз данных для бенчмарков"""
+import random
+from typing import NamedTuple
+
+from sqlalchemy import Engine
+
+STATUSES = ('В планах', 'Читается', 'Прочитано')
+WORDS = ('война', 'мир', 'преступление', 'наказание', 'мастер', 'маргарита', 'отцы', 'дети', 'идиот', 'бесы',
+         'тихий', 'дон', 'мертвые', 'души', 'герой', 'нашего', 'времени', 'горе', 'от', 'ума')
+BOOKS_BATCH_SIZE = 180
+
+
+class SyntheticConfig(NamedTuple):
+    """Параметры синтетической базы данных;
+    status_weights - относительные частоты статусов книг в порядке STATUSES"""
+    users: int
+    books_per_user: int
+    authors: int = 20_000
+    genres: int = 200
+    authors_per_user: int = 20
+    genres_per_user: int = 10
+    status_weights: tuple[float, ...] = (1.0, 1.0, 1.0)
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        """Короткое имя масштаба: пользователи x книги на пользователя"""
+        return f'{self.users}x{self.books_per_user}'
+
+
+def parse_status_weights(value: str) -> tuple[float, ...]:
+    """Разбор распределения статусов из строки вида '5,2,3' (в порядке STATUSES)"""
+    weights = tuple(float(weight) for weight in value.split(','))
+    if len(weights) != len(STATUSES) or any(weight < 0 for weight in weights) or not any(weights):
+        raise ValueError(f'Ожидается {len(STATUSES)} неотрицательных веса через запятую: {value}')
+    return weights
+
+
+def fill_database(engine: Engine, config: SyntheticConfig):
+    """Заполнение пустой базы данных синтетическими пользователями, авторами, жанрами и книгами;
+    Пароли пользователей - 'password', имена - user<ИД>"""
+    rng = random.Random(config.seed)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.executemany('INSERT INTO users (UserId, username, password) VALUES (?, ?, ?)',
+                           ((user_id, f'user{user_id}', 'password') for user_id in range(1, config.users + 1)))
+        cursor.executemany('INSERT INTO authors (AuthorId, title) VALUES (?, ?)',
+                           ((author_id, f'автор {author_id}') for author_id in range(1, config.authors + 1)))
+        cursor.executemany('INSERT INTO genres (GenreId, title) VALUES (?, ?)',
+                           ((genre_id, f'жанр {genre_id}') for genre_id in range(1, config.genres + 1)))
+
+        for user_id in range(1, config.users + 1):
+            user_authors = rng.sample(range(1, config.authors + 1), min(config.authors_per_user, config.authors))
+            user_genres = rng.sample(range(1, config.genres + 1), min(config.genres_per_user, config.genres))
+            cursor.executemany('INSERT INTO user_author_links (UserId, AuthorId) VALUES (?, ?)',
+                               ((user_id, author_id) for author_id in user_authors))
+            cursor.executemany('INSERT INTO user_genre_links (UserId, GenreId) VALUES (?, ?)',
+                               ((user_id, genre_id) for genre_id in user_genres))
+            statuses = rng.choices(STATUSES, config.status_weights, k=config.books_per_user)
+            user_books = [(f'{rng.choice(WORDS)} {rng.choice(WORDS)} {number}', rng.choice(user_authors),
+                           rng.choice(user_genres), status, user_id)
+                          for number, status in enumerate(statuses)]
+            # Многострочные INSERT: триггер полнотекстового индекса срабатывает один раз на пакет строк
+            for start in range(0, len(user_books), BOOKS_BATCH_SIZE):
+                batch = user_books[start:start + BOOKS_BATCH_SIZE]
+                cursor.execute('INSERT INTO books (title, author_id_book_fk, genre_id_book_fk, status, '
+                               'user_id_book_fk) VALUES ' + ', '.join(['(?, ?, ?, ?, ?)'] * len(batch)),
+                               [value for book in batch for value in book])
+        connection.commit()
+    finally:
+        connection.close()
@@ -0,0 +1,328 @@
+"""Командная строка для пакетной работы с библиотеками без графического интерфейса:
+импорт и экспорт csv, поиск книг, статистика, обслуживание базы данных и управление пользователями
+Запуск из корня проекта:
+    python cli.py users add ivan --password-stdin < password.txt
+    python cli.py import ivan books.csv
+    python cli.py import --jobs 4 ivan ivan.csv maria maria.csv petr petr.csv
+    cat books.csv | python cli.py import ivan -
+    python cli.py import --merge ivan books.csv
+    python cli.py export ivan - | gzip > ivan.csv.gz
+    python cli.py search ivan --author "лев толстой" --sort Автору
+    python cli.py stats ivan
+    python cli.py vacuum
+Импорт и экспорт принимают пары ПОЛЬЗОВАТЕЛЬ ФАЙЛ; с --jobs N пары обрабатываются в N процессах
+(запись в SQLite выполняется по очереди, параллельно идут чтение и разбор файлов), '-' - stdin / stdout;
+import --merge записывает только отличия файла от библиотеки (UserDatabaseManager.merge_csv);
+Модуль не загружает PyQt6 и пакет ui, SQLAlchemy загружается только командами, которым нужна база данных"""
+import argparse
+import csv
+import getpass
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache, partial
+from typing import Any, Callable
+
+from database.startup import DATABASE_PATH, SCHEMA_VERSION, add_user, find_user, list_users, read_schema_version, \
+    set_password
+
+# Сколько секунд процесс ждет, пока другой процесс держит блокировку записи базы данных:
+# импорт большого файла другим процессом может занимать минуты
+BUSY_TIMEOUT_SECONDS = 600.0
+# Сколько ошибок строк импорта выводится в stderr для одного файла
+PRINTED_ERRORS = 20
+STDIO = '-'
+
+
+class CliError(Exception):
+    """Ошибка команды: сообщение выводится в stderr, программа завершается с кодом 1"""
+
+
+@lru_cache(maxsize=None)
+def _session_manager(database: str):
+    """Менеджер сессий базы данных database (один на процесс); схема обновляется, если ее версия устарела"""
+    from database.migrations import migrate
+    from database.session import DatabaseSessionManager, create_database_engine
+
+    engine = create_database_engine(f'sqlite:///{database}', busy_timeout=BUSY_TIMEOUT_SECONDS)
+    if read_schema_version(database) < SCHEMA_VERSION:
+        migrate(engine)
+    return DatabaseSessionManager(engine)
+
+
+def _ensure_schema(database: str):
+    """Создание или обновление схемы базы данных, если ее версия устарела (только тогда загружается SQLAlchemy)"""
+    if read_schema_version(database) < SCHEMA_VERSION:
+        _session_manager(database)
+
+
+def _user_id(database: str, username: str) -> int:
+    record = find_user(username, database) if os.path.exists(database) else None
+    if record is None:
+        raise CliError(f'Пользователь {username} не найден')
+    return record[0]
+
+
+def _manager(database: str, username: str):
+    """UserDatabaseManager пользователя username; результаты поиска не кэшируются - команда читает их один раз"""
+    from UserDatabaseManager import UserDatabaseManager
+
+    manager = UserDatabaseManager(_user_id(database, username), _session_manager(database))
+    manager.search_cache.max_rows = 0
+    return manager
+
+
+def _pairs(values: list[str]) -> list[tuple[str, str]]:
+    """Разбор аргументов ПОЛЬЗОВАТЕЛЬ ФАЙЛ [ПОЛЬЗОВАТЕЛЬ ФАЙЛ ...]"""
+    if len(values) % 2:
+        raise CliError('Ожидаются пары ПОЛЬЗОВАТЕЛЬ ФАЙЛ')
+    pairs = list(zip(values[::2], values[1::2]))
+    if len(pairs) > 1 and any(filename == STDIO for _, filename in pairs):
+        raise CliError(f'"{STDIO}" можно использовать только с одной парой ПОЛЬЗОВАТЕЛЬ ФАЙЛ')
+    return pairs
+
+
+def _progress_printer(label: str, unit: str) -> Callable[..., bool]:
+    """progress_callback, выводящий прогресс в одну строку stderr"""
+    def report(done: int, total: int, rows: int | None = None) -> bool:
+        if unit == 'bytes':
+            size = f'{done / 2 ** 20:.1f} из {total / 2 ** 20:.1f} МБ' if total else f'{done / 2 ** 20:.1f} МБ'
+            text = f'{size}, строк {rows}'
+        else:
+            text = f'{done} из {total} книг'
+        print(f'\r{label}: {text}', end='', file=sys.stderr, flush=True)
+        return True
+    return report
+
+
+def _import_job(database: str, username: str, filename: str, progress: bool, merge: bool = False) -> tuple[str, Any]:
+    """Импорт одного файла (выполняется в рабочем процессе при --jobs больше 1)"""
+    manager = _manager(database, username)
+    try:
+        source = sys.stdin.buffer if filename == STDIO else filename
+        import_csv = manager.merge_csv if merge else manager.import_csv
+        report = import_csv(source, _progress_printer(username, 'bytes') if progress else None)
+    finally:
+        manager.close()
+        if progress:
+            print(file=sys.stderr)
+    return username, report
+
+
+def _export_job(database: str, username: str, filename: str, progress: bool) -> tuple[str, float]:
+    """Экспорт книг одного пользователя (выполняется в рабочем процессе при --jobs больше 1)"""
+    manager = _manager(database, username)
+    started = time.perf_counter()
+    try:
+        target = sys.stdout if filename == STDIO else filename
+        manager.export_csv(target, _progress_printer(username, 'books') if progress else None)
+    finally:
+        manager.close()
+        if progress:
+            print(file=sys.stderr)
+    return username, time.perf_counter() - started
+
+
+def _run_jobs(job: Callable[..., tuple[str, Any]], args: argparse.Namespace,
+              on_result: Callable[[str, Any], None]) -> int:
+    """Выполнение job для каждой пары ПОЛЬЗОВАТЕЛЬ ФАЙЛ: в этом процессе или в args.jobs рабочих процессах;
+    Ошибка одной пары не прерывает остальные; возвращает код завершения;
+    Закрытый читателем stdout (BrokenPipeError) и прерывание (Ctrl+C) прерывают все пары и обрабатываются в main()"""
+    pairs = _pairs(args.pairs)
+    failed = 0
+    if args.jobs <= 1 or len(pairs) == 1:
+        for username, filename in pairs:
+            try:
+                on_result(*job(args.database, username, filename, args.progress))
+            except (BrokenPipeError, KeyboardInterrupt):
+                raise
+            except Exception as error:
+                failed += 1
+                print(f'{username}: {error}', file=sys.stderr)
+        return 1 if failed else 0
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(job, args.database, username, filename, False): username
+                   for username, filename in pairs}
+        for future in as_completed(futures):
+            try:
+                on_result(*future.result())
+            except (BrokenPipeError, KeyboardInterrupt):
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            except Exception as error:
+                failed += 1
+                print(f'{futures[future]}: {error}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _command_import(args: argparse.Namespace) -> int:
+    def on_result(username: str, report):
+        # Отчет выводится в stderr, если stdout занят данными
+        print(f'{username}: импортировано книг {report.rows} (добавлено {report.inserted}, изменено {report.updated}, '
+              f'удалено {report.deleted}), пропущено строк {report.skipped} '
+              f'({report.seconds:.1f} с, {report.encoding}, разделитель {report.delimiter!r})', file=sys.stderr)
+        for error in report.errors[:PRINTED_ERRORS]:
+            print(f'{username}: строка {error.line}: {error.message}', file=sys.stderr)
+        if report.skipped > PRINTED_ERRORS:
+            print(f'{username}: ... еще {report.skipped - PRINTED_ERRORS} строк с ошибками', file=sys.stderr)
+
+    return _run_jobs(partial(_import_job, merge=args.merge), args, on_result)
+
+
+def _command_export(args: argparse.Namespace) -> int:
+    def on_result(username: str, seconds: float):
+        print(f'{username}: экспорт завершен ({seconds:.1f} с)', file=sys.stderr)
+
+    return _run_jobs(_export_job, args, on_result)
+
+
+def _command_search(args: argparse.Namespace) -> int:
+    """Книги пользователя в формате csv в stdout; результат читается и выводится постранично"""
+    manager = _manager(args.database, args.username)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(('Book', 'Author', 'Genre', 'Status'))
+    continuation = None
+    try:
+        while True:
+            page = manager.search_books_page(args.title, args.author, args.genre, args.status, args.sort,
+                                             after=continuation)
+            writer.writerows(book[1:] for book in page.rows)
+            continuation = page.continuation
+            if continuation is None:
+                return 0
+    finally:
+        manager.close()
+
+
+def _command_stats(args: argparse.Namespace) -> int:
+    manager = _manager(args.database, args.username)
+    try:
+        statistics = manager.get_statistics()
+    finally:
+        manager.close()
+    print(f'Всего книг: {statistics.books}')
+    for caption, groups in (('Статусы', statistics.statuses), ('Жанры', statistics.genres),
+                            ('Авторы', statistics.authors)):
+        print(f'{caption}:')
+        for title, books in groups[:args.top]:
+            print(f'    {books:>8}  {title}')
+    return 0
+
+
+def _command_vacuum(args: argparse.Namespace) -> int:
+    from database.maintenance import run_maintenance
+
+    report = run_maintenance(_session_manager(args.database).engine)
+    print(f'Удалено неиспользуемых жанров: {report.genres}, авторов: {report.authors}; '
+          f'освобождено {report.bytes_reclaimed / 1024:.0f} КБ, размер базы данных {report.bytes_after / 1024:.0f} КБ '
+          f'({report.seconds:.1f} с)')
+    return 0
+
+
+def _read_password(args: argparse.Namespace) -> str:
+    """Пароль из первой строки stdin (--password-stdin) или из двух запросов в терминале"""
+    if args.password_stdin:
+        password = sys.stdin.readline().rstrip('\r\n')
+    else:
+        password = getpass.getpass('Пароль: ')
+        if password != getpass.getpass('Повторите пароль: '):
+            raise CliError('Введенные пароли не совпадают')
+    if not password:
+        raise CliError('Пароль не может быть пустым')
+    return password
+
+
+def _command_users(args: argparse.Namespace) -> int:
+    if args.action == 'list':
+        # Список пользователей читает счетчики книг, поэтому схема должна быть актуальной
+        _ensure_schema(args.database)
+        for user_id, username, books in list_users(args.database):
+            print(f'{user_id:>6}  {username}  ({books} книг)')
+        return 0
+    if args.username is None:
+        raise CliError('Укажите имя пользователя')
+
+    if args.action == 'add':
+        _ensure_schema(args.database)
+        user_id = add_user(args.username, _read_password(args), args.database)
+        if user_id is None:
+            raise CliError(f'Пользователь {args.username} уже существует')
+        print(user_id)
+    elif args.action == 'passwd':
+        _user_id(args.database, args.username)
+        set_password(args.username, _read_password(args), args.database)
+    else:
+        manager = _manager(args.database, args.username)
+        try:
+            manager.delete_account()
+        finally:
+            manager.close()
+    return 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default=DATABASE_PATH, help='файл базы данных SQLite')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in (('import', 'импорт csv (все книги пользователя заменяются, с --merge - только отличия)'),
+                            ('export', 'экспорт книг в csv')):
+        command_parser = subparsers.add_parser(name, help=help_text)
+        command_parser.add_argument('pairs', nargs='+', metavar='ПОЛЬЗОВАТЕЛЬ ФАЙЛ',
+                                    help=f'пары имя пользователя и файл, "{STDIO}" - stdin / stdout')
+        command_parser.add_argument('--jobs', type=int, default=1, help='количество рабочих процессов')
+        command_parser.add_argument('--progress', action='store_true', help='прогресс в stderr (без --jobs)')
+        if name == 'import':
+            command_parser.add_argument('--merge', action='store_true',
+                                        help='слияние с библиотекой: записываются только отличия от файла')
+
+    search_parser = subparsers.add_parser('search', help='поиск книг, результат в формате csv в stdout')
+    search_parser.add_argument('username')
+    search_parser.add_argument('--title')
+    search_parser.add_argument('--author')
+    search_parser.add_argument('--genre')
+    search_parser.add_argument('--status')
+    search_parser.add_argument('--sort', default='Названию', help='Названию, Автору или Релевантности')
+
+    stats_parser = subparsers.add_parser('stats', help='статистика библиотеки пользователя')
+    stats_parser.add_argument('username')
+    stats_parser.add_argument('--top', type=int, default=10, help='сколько жанров и авторов показать')
+
+    subparsers.add_parser('vacuum', help='обслуживание базы данных: удаление неиспользуемых записей, VACUUM, ANALYZE')
+
+    users_parser = subparsers.add_parser('users', help='управление пользователями')
+    users_parser.add_argument('action', choices=('list', 'add', 'passwd', 'delete'))
+    users_parser.add_argument('username', nargs='?')
+    users_parser.add_argument('--password-stdin', action='store_true', help='пароль из первой строки stdin')
+    return parser
+
+
+_COMMANDS = {
+    'import': _command_import,
+    'export': _command_export,
+    'search': _command_search,
+    'stats': _command_stats,
+    'vacuum': _command_vacuum,
+    'users': _command_users,
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parser().parse_args(argv)
+    # csv записывает собственные концы строк; кодировка вывода не зависит от локали
+    sys.stdout.reconfigure(encoding='utf-8', newline='')
+    try:
+        return _COMMANDS[args.command](args)
+    except CliError as error:
+        print(error, file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # Читатель stdout (например, head) завершился раньше: оставшийся вывод отбрасывается
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
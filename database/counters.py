@@ -0,0 +1,49 @@
+"""Счетчики книг пользователя по статусам, жанрам и авторам в таблице book_counters
+Счетчики изменяются триггерами на таблице books при каждом добавлении, изменении и удалении книги,
+поэтому статистика библиотеки и проверка использования жанра / автора не просматривают книги"""
+from sqlalchemy import Connection
+
+# (измерение, поле таблицы books)
+COUNTER_DIMENSIONS = (
+    ('status', 'status'),
+    ('genre', 'genre_id_book_fk'),
+    ('author', 'author_id_book_fk'),
+)
+
+
+def _increment(dimension: str, field: str) -> str:
+    return (f"INSERT INTO book_counters (UserId, dimension, value, books) "
+            f"VALUES (new.user_id_book_fk, '{dimension}', CAST(new.{field} AS TEXT), 1) "
+            f"ON CONFLICT (UserId, dimension, value) DO UPDATE SET books = books + 1;")
+
+
+def _decrement(dimension: str, field: str) -> str:
+    condition = (f"UserId = old.user_id_book_fk AND dimension = '{dimension}' "
+                 f"AND value = CAST(old.{field} AS TEXT)")
+    return (f'UPDATE book_counters SET books = books - 1 WHERE {condition}; '
+            f'DELETE FROM book_counters WHERE {condition} AND books <= 0;')
+
+
+def create_book_counters(connection: Connection):
+    """Создание триггеров, поддерживающих book_counters, и пересчет счетчиков по существующим книгам"""
+    increments = ' '.join(_increment(dimension, field) for dimension, field in COUNTER_DIMENSIONS)
+    decrements = ' '.join(_decrement(dimension, field) for dimension, field in COUNTER_DIMENSIONS)
+    fields = ', '.join(field for _, field in COUNTER_DIMENSIONS)
+
+    connection.exec_driver_sql(f'CREATE TRIGGER IF NOT EXISTS book_counters_insert AFTER INSERT ON books '
+                               f'BEGIN {increments} END')
+    connection.exec_driver_sql(f'CREATE TRIGGER IF NOT EXISTS book_counters_delete AFTER DELETE ON books '
+                               f'BEGIN {decrements} END')
+    connection.exec_driver_sql(f'CREATE TRIGGER IF NOT EXISTS book_counters_update '
+                               f'AFTER UPDATE OF user_id_book_fk, {fields} ON books '
+                               f'BEGIN {decrements} {increments} END')
+    rebuild_book_counters(connection)
+
+
+def rebuild_book_counters(connection: Connection):
+    """Полный пересчет счетчиков одним GROUP BY по каждому измерению"""
+    connection.exec_driver_sql('DELETE FROM book_counters')
+    for dimension, field in COUNTER_DIMENSIONS:
+        connection.exec_driver_sql(f"INSERT INTO book_counters (UserId, dimension, value, books) "
+                                   f"SELECT user_id_book_fk, '{dimension}', CAST({field} AS TEXT), COUNT(*) "
+                                   f"FROM books GROUP BY user_id_book_fk, {field}")
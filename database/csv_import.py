@@ -0,0 +1,263 @@
+"""Потоковое чтение csv для импорта книг: определение кодировки и диалекта, проверка строк порциями
+с отчетом об ошибках по строкам и чтение файла в фоновом потоке параллельно с записью в базу данных;
+Расход памяти не зависит от размера файла: в памяти находится не больше PREFETCH_CHUNKS порций"""
+import codecs
+import csv
+import io
+import os
+import queue
+import threading
+from contextlib import nullcontext
+from typing import BinaryIO, Iterator, NamedTuple
+
+# Количество строк в одной порции: порция проверяется и записывается в базу данных целиком
+IMPORT_CHUNK_ROWS = 5000
+# Сколько прочитанных порций может ждать записи в базу данных
+PREFETCH_CHUNKS = 2
+# Сколько байт начала файла используется для определения кодировки и диалекта
+SNIFF_BYTES = 64 * 1024
+# Сколько ошибок сохраняется в отчете (остальные только считаются)
+MAX_REPORTED_ERRORS = 1000
+
+BOOK_STATUSES = ('В планах', 'Читается', 'Прочитано')
+# Названия столбцов (в нижнем регистре) -> поле книги; без заголовка столбцы идут в порядке экспорта
+COLUMN_NAMES = {
+    'book': 'title', 'title': 'title', 'книга': 'title', 'название': 'title',
+    'author': 'author', 'автор': 'author',
+    'genre': 'genre', 'жанр': 'genre',
+    'status': 'status', 'статус': 'status',
+}
+FIELDS = ('title', 'author', 'genre', 'status')
+# Названия столбцов в сообщениях об ошибках - как в заголовке экспорта
+FIELD_COLUMNS = {'title': 'Book', 'author': 'Author', 'genre': 'Genre', 'status': 'Status'}
+DELIMITERS = ',;\t|'
+# Кодировка файлов без BOM, которые не являются корректным UTF-8 (выгрузки из Excel на русской Windows)
+FALLBACK_ENCODING = 'cp1251'
+
+
+class CsvFormatError(ValueError):
+    """Файл нельзя импортировать целиком: неизвестная кодировка, нет нужных столбцов, ошибка чтения"""
+
+
+class CsvRowError(NamedTuple):
+    """Ошибка в строке файла: номер строки файла (с 1) и описание"""
+    line: int
+    message: str
+
+
+class CsvChunk(NamedTuple):
+    """Порция проверенных строк: записи (название, автор, жанр, статус) в нижнем регистре, ошибки строк порции,
+    прочитано байт файла и строк данных от начала файла"""
+    records: list[tuple[str, str, str, str]]
+    errors: list[CsvRowError]
+    bytes_read: int
+    rows_read: int
+
+
+def sniff_encoding(head: bytes) -> str:
+    """Кодировка по BOM или по тому, является ли начало файла корректным UTF-8"""
+    for bom, encoding in ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'),
+                          (codecs.BOM_UTF16_BE, 'utf-16')):
+        if head.startswith(bom):
+            return encoding
+    try:
+        # final=False: последний символ может быть обрезан границей SNIFF_BYTES
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+    return 'utf-8'
+
+
+def _sniff_dialects(sample: str) -> list[type[csv.Dialect] | csv.Dialect]:
+    """Диалекты-кандидаты: найденный csv.Sniffer (если удалось), затем csv.excel с каждым из DELIMITERS;
+    Sniffer не справляется с образцами, в которых есть строки с ошибками"""
+    candidates = [type(f'excel_{ord(delimiter)}', (csv.excel,), {'delimiter': delimiter})
+                  for delimiter in DELIMITERS]
+    # Последняя строка образца может быть обрезана
+    if '\n' in sample:
+        sample = sample[:sample.rindex('\n') + 1]
+    try:
+        return [csv.Sniffer().sniff(sample, delimiters=DELIMITERS)] + candidates
+    except csv.Error:
+        return candidates
+
+
+def _header_columns(row: list[str]) -> dict[str, int]:
+    """Номера столбцов полей книги, названия которых есть в строке row"""
+    columns = {}
+    for index, name in enumerate(row):
+        field = COLUMN_NAMES.get(name.strip().lower())
+        if field is not None:
+            columns.setdefault(field, index)
+    return columns
+
+
+def _is_book_row(row: list[str]) -> bool:
+    """Похожа ли строка на книгу в порядке столбцов экспорта (для файлов без заголовка)"""
+    statuses = {status.lower() for status in BOOK_STATUSES}
+    return len(row) >= len(FIELDS) and row[FIELDS.index('status')].strip().lower() in statuses
+
+
+class _CountingReader(io.RawIOBase):
+    """Двоичный поток: сначала байты head, затем stream; bytes_read - количество прочитанных байт"""
+
+    def __init__(self, head: bytes, stream: BinaryIO):
+        super().__init__()
+        self._head = memoryview(head)
+        self._stream = stream
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._head:
+            size = min(len(buffer), len(self._head))
+            buffer[:size] = self._head[:size]
+            self._head = self._head[size:]
+        else:
+            read = getattr(self._stream, 'read1', self._stream.read)
+            data = read(len(buffer))
+            size = len(data)
+            buffer[:size] = data
+        self.bytes_read += size
+        return size
+
+
+class CsvBookReader:
+    """Чтение книг из csv порциями по chunk_rows строк; кодировка и диалект определяются при создании;
+    source - имя файла или двоичный поток, который читается один раз (например, sys.stdin.buffer):
+    размер потока неизвестен, и total_bytes для него равен 0"""
+
+    def __init__(self, source: str | BinaryIO, chunk_rows: int = IMPORT_CHUNK_ROWS):
+        self.source = source
+        self.chunk_rows = chunk_rows
+        if isinstance(source, str):
+            self.total_bytes = os.path.getsize(source)
+            with open(source, 'rb') as file:
+                head = file.read(SNIFF_BYTES)
+            # Файл читается заново с начала
+            self._head = b''
+        else:
+            self.total_bytes = 0
+            head = source.read(SNIFF_BYTES)
+            self._head = head
+        self.encoding = sniff_encoding(head)
+        sample = head.decode(self.encoding, errors='ignore')
+        self.dialect, self.columns, self.has_header = self._choose_dialect(sample)
+
+    @staticmethod
+    def _choose_dialect(sample: str) -> tuple[type[csv.Dialect] | csv.Dialect, dict[str, int], bool]:
+        """Первый диалект-кандидат, в котором первая строка - заголовок со всеми столбцами, иначе первый,
+        в котором она похожа на книгу (файл без заголовка)"""
+        dialects = _sniff_dialects(sample)
+        first_rows = [next(csv.reader(io.StringIO(sample), dialect), []) for dialect in dialects]
+        best_header: dict[str, int] = {}
+        for dialect, first_row in zip(dialects, first_rows):
+            columns = _header_columns(first_row)
+            if len(columns) == len(FIELDS):
+                return dialect, columns, True
+            if len(columns) > len(best_header):
+                best_header = columns
+        for dialect, first_row in zip(dialects, first_rows):
+            if _is_book_row(first_row):
+                return dialect, {field: index for index, field in enumerate(FIELDS)}, False
+        if best_header:
+            missing = ', '.join(FIELD_COLUMNS[field] for field in FIELDS if field not in best_header)
+            raise CsvFormatError(f'В заголовке нет столбцов: {missing}')
+        raise CsvFormatError(f'Не удалось определить разделитель столбцов: ожидаются столбцы '
+                             f'{", ".join(FIELD_COLUMNS.values())}')
+
+    def chunks(self) -> Iterator[CsvChunk]:
+        """Проверенные порции строк файла; строки с ошибками пропускаются и попадают в ошибки порции"""
+        source = open(self.source, 'rb') if isinstance(self.source, str) else nullcontext(self.source)
+        with source as binary_file:
+            counter = _CountingReader(self._head, binary_file)
+            file = io.TextIOWrapper(io.BufferedReader(counter), encoding=self.encoding, newline='')
+            reader = csv.reader(file, self.dialect)
+            if self.has_header:
+                next(reader, None)
+            width = max(self.columns.values()) + 1
+            columns = tuple(self.columns[field] for field in FIELDS)
+            statuses = {status.lower(): status for status in BOOK_STATUSES}
+            records, errors, rows = [], [], 0
+            try:
+                for row in reader:
+                    if not row:
+                        continue
+                    rows += 1
+                    error = None
+                    if len(row) < width:
+                        error = f'ожидается {width} полей, получено {len(row)}'
+                    else:
+                        title, author, genre, status = (row[column].strip() for column in columns)
+                        status = statuses.get(status.lower())
+                        if not title or not author or not genre:
+                            error = 'пустое название, автор или жанр'
+                        elif status is None:
+                            error = f'неизвестный статус "{row[columns[3]]}"'
+                        else:
+                            records.append((title.lower(), author.lower(), genre.lower(), status))
+                    if error is not None:
+                        errors.append(CsvRowError(reader.line_num, error))
+                    if len(records) + len(errors) >= self.chunk_rows:
+                        yield CsvChunk(records, errors, counter.bytes_read, rows)
+                        records, errors = [], []
+            except (UnicodeDecodeError, csv.Error) as error:
+                raise CsvFormatError(f'Строка {reader.line_num + 1}: {error}') from error
+            yield CsvChunk(records, errors, counter.bytes_read, rows)
+
+
+class Prefetcher:
+    """Итерация по iterator в фоновом потоке с очередью на depth элементов: следующая порция читается,
+    пока предыдущая записывается в базу данных; исключение фонового потока передается потребителю;
+    Используется как контекстный менеджер: при выходе фоновый поток останавливается"""
+    _END = object()
+
+    def __init__(self, iterator: Iterator, depth: int = PREFETCH_CHUNKS):
+        self._iterator = iterator
+        self._queue: queue.Queue = queue.Queue(maxsize=depth)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='csv-prefetch', daemon=True)
+
+    def __enter__(self) -> 'Prefetcher':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        # Освобождение места в очереди, если фоновый поток ждет его
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        self._thread.join()
+
+    def __iter__(self) -> Iterator:
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def _put(self, item) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self):
+        try:
+            for item in self._iterator:
+                if not self._put(item):
+                    return
+        except BaseException as error:
+            self._put(error)
+            return
+        self._put(self._END)
@@ -0,0 +1,81 @@
+"""Слияние импортируемого csv с библиотекой пользователя (UserDatabaseManager.merge_csv): вместо удаления всех книг
+и добавления их заново вычисляется разница между файлом и библиотекой;
+Книга определяется ключом - хэшем нормализованных названия, автора и жанра: книга с тем же ключом и другим статусом
+изменяется, книги, которых нет в файле, удаляются, строки файла, которых нет в библиотеке, добавляются;
+Книги с одинаковым ключом сопоставляются по количеству: лишние строки файла добавляются, лишние книги удаляются"""
+import hashlib
+from typing import Iterable, NamedTuple
+
+# Размер ключа книги в байтах: совпадение 128-битных ключей разных книг практически невозможно
+MERGE_KEY_BYTES = 16
+
+
+def merge_key(title: str, author: str, genre: str) -> bytes:
+    """Ключ книги: хэш названия, автора и жанра без пробелов по краям и в нижнем регистре (как в CsvBookReader);
+    Хэш фиксированного размера занимает в памяти меньше, чем три строки"""
+    normalized = f'{title.strip()}\0{author.strip()}\0{genre.strip()}'.lower()
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=MERGE_KEY_BYTES).digest()
+
+
+class CsvMergeDelta(NamedTuple):
+    """Разница между файлом и библиотекой: добавляемые строки файла (название, автор, жанр, статус),
+    ИД изменяемых книг по новому статусу, ИД удаляемых книг, названия авторов и жанров файла"""
+    inserts: list[tuple[str, str, str, str]]
+    updates: dict[str, list[int]]
+    deletes: list[int]
+    authors: set[str]
+    genres: set[str]
+
+    @property
+    def updated(self) -> int:
+        """Количество изменяемых книг"""
+        return sum(map(len, self.updates.values()))
+
+
+class CsvMergeDiff:
+    """Вычисление CsvMergeDelta за один проход по файлу: строки передаются в add порциями, затем один раз
+    вызывается delta;
+    Кроме ключей книг библиотеки в памяти хранятся только строки файла, для которых нет книги с тем же ключом
+    и статусом, - их количество пропорционально разнице, а не размеру файла"""
+
+    def __init__(self, books: Iterable[tuple[int, str, str, str, str]]):
+        """books - книги библиотеки: (ИД, название, автор, жанр, статус)"""
+        # Ключ -> еще не сопоставленные строкам файла книги библиотеки с этим ключом: [(ИД, статус), ...]
+        self._books: dict[bytes, list[tuple[int, str]]] = {}
+        for book_id, title, author, genre, status in books:
+            self._books.setdefault(merge_key(title, author, genre), []).append((book_id, status))
+        self._unmatched: list[tuple[bytes, tuple[str, str, str, str]]] = []
+        self._authors: set[str] = set()
+        self._genres: set[str] = set()
+
+    def add(self, records: Iterable[tuple[str, str, str, str]]):
+        """Сопоставление порции строк файла книгам библиотеки с тем же ключом и статусом (неизменные книги)"""
+        for record in records:
+            title, author, genre, status = record
+            self._authors.add(author)
+            self._genres.add(genre)
+            key = merge_key(title, author, genre)
+            books = self._books.get(key)
+            match = next((index for index, book in enumerate(books) if book[1] == status), None) if books else None
+            if match is None:
+                self._unmatched.append((key, record))
+                continue
+            books[match] = books[-1]
+            books.pop()
+            if not books:
+                del self._books[key]
+
+    def delta(self) -> CsvMergeDelta:
+        """Несопоставленная строка файла изменяет статус оставшейся книги с тем же ключом или добавляется,
+        если такой книги нет; оставшиеся книги библиотеки удаляются"""
+        inserts: list[tuple[str, str, str, str]] = []
+        updates: dict[str, list[int]] = {}
+        for key, record in self._unmatched:
+            books = self._books.get(key)
+            if not books:
+                inserts.append(record)
+                continue
+            book_id, _ = books.pop()
+            updates.setdefault(record[3], []).append(book_id)
+        deletes = [book_id for books in self._books.values() for book_id, _ in books]
+        return CsvMergeDelta(inserts, updates, deletes, self._authors, self._genres)
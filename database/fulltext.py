@@ -0,0 +1,154 @@
+"""Полнотекстовый поиск по названиям книг, авторов и жанров на SQLite FTS5
+Индексы books_fts, authors_fts и genres_fts хранят только токены и ссылаются на основные таблицы
+(external content); синхронизация с основными таблицами выполняется триггерами;
+Токенизатор убирает диакритические знаки латиницы, но различает е и ё, поэтому ё заменяется на е
+при индексации (в триггерах) и в строке поиска"""
+import re
+import unicodedata
+from typing import Callable
+
+from sqlalchemy import Connection, column, table
+
+# Поиск через FTS используется только для запросов не короче этой длины,
+# более короткие запросы выполняются через LIKE
+MIN_FULLTEXT_TERM_LENGTH = 3
+
+BOOKS_FTS = table('books_fts', column('rowid'), column('rank'), column('books_fts'))
+AUTHORS_FTS = table('authors_fts', column('rowid'), column('rank'), column('authors_fts'))
+GENRES_FTS = table('genres_fts', column('rowid'), column('rank'), column('genres_fts'))
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+_TOKENIZER = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+# Замены букв, которые поиск не различает, сверх замен токенизатора
+_FOLDED_LETTERS = {'ё': 'е', 'Ё': 'Е'}
+
+# (индекс, основная таблица, ключевое поле, индексируемые поля)
+_FULLTEXT_INDEXES = (
+    ('books_fts', 'books', 'BookId', ('title', 'user_id_book_fk')),
+    ('authors_fts', 'authors', 'AuthorId', ('title',)),
+    ('genres_fts', 'genres', 'GenreId', ('title',)),
+)
+
+
+class _FoldTable(dict):
+    """Таблица для str.translate, заполняемая по мере появления новых символов: символ латиницы
+    с диакритическими знаками заменяется основной буквой (разложение NFD), отдельные комбинируемые знаки
+    удаляются, ё заменяется на е"""
+    def __missing__(self, code: int) -> str:
+        character = chr(code)
+        if unicodedata.combining(character):
+            folded = ''
+        else:
+            decomposed = unicodedata.normalize('NFD', character)
+            folded = decomposed[0] if len(decomposed) > 1 and decomposed[0].isascii() else character
+            folded = _FOLDED_LETTERS.get(folded, folded)
+        self[code] = folded
+        return folded
+
+
+_FOLD_TABLE = _FoldTable()
+# Текст только из ASCII и кириллицы без ё и комбинируемых знаков fold_title не меняет (кроме регистра)
+_UNFOLDED_PATTERN = re.compile(r'[\x00-\x7f\u0400\u0402-\u0450\u0452-\u0482\u048a-\u04ff]*')
+
+
+def fold_title(text: str) -> str:
+    """Текст в том виде, в котором его сравнивает полнотекстовый индекс: в нижнем регистре,
+    без диакритических знаков и с е вместо ё"""
+    text = text.lower()
+    return text if _UNFOLDED_PATTERN.fullmatch(text) else text.translate(_FOLD_TABLE)
+
+
+def _indexed_value(name: str, row: str = '') -> str:
+    """SQL-выражение значения поля name, которое записывается в индекс: названия - с заменами _FOLDED_LETTERS;
+    row - префикс строки триггера (new. или old.)"""
+    expression = f'{row}{name}'
+    if name == 'title':
+        for letter, replacement in _FOLDED_LETTERS.items():
+            expression = f"replace({expression}, '{letter}', '{replacement}')"
+    return expression
+
+
+def build_match_query(term: str, prefix: bool = True) -> str | None:
+    """Преобразует строку поиска в запрос FTS5: все слова должны встречаться в названии;
+    При prefix=True слово может быть началом слова в названии, иначе ищется точное совпадение слова;
+    Возвращает None, если строка слишком короткая для полнотекстового поиска"""
+    tokens = _TOKEN_PATTERN.findall(fold_title(term))
+    if not tokens or len(''.join(tokens)) < MIN_FULLTEXT_TERM_LENGTH:
+        return None
+    suffix = '*' if prefix else ''
+    return ' AND '.join(f'"{token}"{suffix}' for token in tokens)
+
+
+def build_user_match_query(term: str, user_id: int, prefix: bool = True) -> str | None:
+    """Запрос FTS5 к индексу книг, ограниченный книгами пользователя user_id"""
+    match_query = build_match_query(term, prefix)
+    if match_query is None:
+        return None
+    return f'user_id_book_fk : "{int(user_id)}" AND title : ({match_query})'
+
+
+def title_matcher(term: str) -> Callable[[str], bool]:
+    """Проверка в памяти, найдет ли поиск по строке term название (названия хранятся в нижнем регистре):
+    для длинных строк каждое слово term должно быть началом какого-либо слова названия (как в индексе FTS5;
+    term и название сравниваются после fold_title), для коротких - term должен быть подстрокой названия (как в LIKE);
+    Проверки строятся один раз, чтобы быстро фильтровать большие результаты поиска"""
+    tokens = _TOKEN_PATTERN.findall(fold_title(term))
+    if not tokens or len(''.join(tokens)) < MIN_FULLTEXT_TERM_LENGTH:
+        substring = term.lower()
+        return lambda title: substring in title
+    # Быстрая проверка подстроки отсекает большинство названий до регулярного выражения
+    checks = [(token, re.compile(rf'(?<!\w){re.escape(token)}').search) for token in tokens]
+
+    def matches(title: str) -> bool:
+        title = fold_title(title)
+        for token, search in checks:
+            if token not in title or search(title) is None:
+                return False
+        return True
+
+    return matches
+
+
+def matches_title(term: str, title: str) -> bool:
+    """Найдет ли поиск по строке term название title (см. title_matcher)"""
+    return title_matcher(term)(title)
+
+
+def is_refinement(previous: str | None, term: str | None) -> bool:
+    """Является ли результат поиска по term подмножеством результата поиска по previous
+    (None - поиск без фильтра по названию); тогда новый результат можно получить фильтрацией предыдущего"""
+    if previous is None or not previous:
+        return True
+    if term is None or not term.lower().startswith(previous.lower()):
+        return False
+    # Дописанная строка поиска не может перейти от FTS к LIKE; при переходе от LIKE к FTS подмножество
+    # не гарантировано: FTS находит и названия с диакритическими знаками и ё, которые LIKE пропускает
+    return build_match_query(previous) is not None or build_match_query(term) is None
+
+
+def create_fulltext_indexes(connection: Connection):
+    """Создание индексов FTS5, триггеров синхронизации и заполнение индексов по существующим данным;
+    Повторный вызов пересоздает триггеры и заново заполняет индексы"""
+    for index, content, key, columns in _FULLTEXT_INDEXES:
+        column_list = ', '.join(columns)
+        values = ', '.join(_indexed_value(name) for name in columns)
+        new_values = ', '.join(_indexed_value(name, 'new.') for name in columns)
+        old_values = ', '.join(_indexed_value(name, 'old.') for name in columns)
+        insert_new = f'INSERT INTO {index} (rowid, {column_list}) VALUES (new.{key}, {new_values});'
+        delete_old = (f"INSERT INTO {index} ({index}, rowid, {column_list}) "
+                      f"VALUES ('delete', old.{key}, {old_values});")
+
+        connection.exec_driver_sql(f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({column_list}, "
+                                   f"content = '{content}', content_rowid = '{key}', {_TOKENIZER})")
+        for event in ('insert', 'delete', 'update'):
+            connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {index}_{event}')
+        connection.exec_driver_sql(f'CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {content} '
+                                   f'BEGIN {insert_new} END')
+        connection.exec_driver_sql(f'CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {content} '
+                                   f'BEGIN {delete_old} END')
+        connection.exec_driver_sql(f'CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF {column_list} '
+                                   f'ON {content} BEGIN {delete_old} {insert_new} END')
+        # 'rebuild' проиндексировал бы названия без замен _FOLDED_LETTERS
+        connection.exec_driver_sql(f"INSERT INTO {index} ({index}) VALUES ('delete-all')")
+        connection.exec_driver_sql(f'INSERT INTO {index} (rowid, {column_list}) '
+                                   f'SELECT {key}, {values} FROM {content}')
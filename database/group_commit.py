@@ -0,0 +1,163 @@
+"""Групповая фиксация изменений: единственный поток записи выполняет запросы из очереди и фиксирует все запросы,
+накопившиеся за время предыдущей фиксации, одной транзакцией;
+Каждый запрос выполняется в своей точке сохранения (SAVEPOINT): ошибка одного запроса отменяет только его изменения;
+Результат запроса становится доступен только после фиксации транзакции, в которую он вошел"""
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Iterable, NamedTuple
+
+from database.session import create_database_engine
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+
+# Сколько запросов может войти в одну транзакцию
+GROUP_COMMIT_MAX_REQUESTS = 256
+
+
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    """Драйвер sqlite3 не начинает транзакции сам (иначе SAVEPOINT без BEGIN фиксируется при RELEASE)"""
+    dbapi_connection.isolation_level = None
+
+
+def _begin_immediate(connection):
+    """Транзакция потока записи сразу берет блокировку записи: без повышения блокировки посреди транзакции
+    не возникает взаимоблокировки с другими процессами"""
+    connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def create_writer_engine(url: str, busy_timeout: float | None = None) -> Engine:
+    """Движок для GroupCommitWriter: транзакции начинаются явно, поэтому точки сохранения работают внутри них"""
+    engine = create_database_engine(url, busy_timeout)
+    event.listen(engine, 'connect', _disable_driver_transactions)
+    event.listen(engine, 'begin', _begin_immediate)
+    return engine
+
+
+class GroupCommitStats(NamedTuple):
+    """Счетчики потока записи: зафиксированные транзакции и запросы, отмененные ошибкой запросы"""
+    batches: int
+    requests: int
+    failed: int
+
+    @property
+    def requests_per_batch(self) -> float:
+        """Среднее количество запросов в одной транзакции"""
+        return self.requests / self.batches if self.batches else 0.0
+
+
+class _WriteRequest(NamedTuple):
+    function: Callable[[Session], Any]
+    user_id: int | None
+    exclusive: bool
+    future: Future
+
+
+class GroupCommitWriter:
+    """Очередь изменений базы данных с единственным потоком записи;
+    submit ставит в очередь функцию, которая получит сессию потока записи и не должна фиксировать изменения сама;
+    on_committed вызывается в потоке записи с ИД пользователей, изменения которых зафиксированы,
+    до того как результаты запросов станут доступны"""
+
+    def __init__(self, engine: Engine, on_committed: Callable[[set[int]], None] | None = None,
+                 max_requests: int = GROUP_COMMIT_MAX_REQUESTS):
+        self.engine = engine
+        self.session = Session(engine)
+        self.max_requests = max_requests
+        self._on_committed = on_committed
+        self._queue: queue.SimpleQueue[_WriteRequest | None] = queue.SimpleQueue()
+        self._batches = 0
+        self._requests = 0
+        self._failed = 0
+        self._thread = threading.Thread(target=self._run, name='writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, function: Callable[[Session], Any], user_id: int | None = None,
+               exclusive: bool = False) -> Future:
+        """Постановка изменения в очередь; user_id - пользователь, данные которого изменяет функция;
+        exclusive=True - функция выполняется вне транзакции (например, обслуживание базы данных),
+        после фиксации уже накопившихся запросов"""
+        future = Future()
+        self._queue.put(_WriteRequest(function, user_id, exclusive, future))
+        return future
+
+    def stats(self) -> GroupCommitStats:
+        """Текущие счетчики"""
+        return GroupCommitStats(self._batches, self._requests, self._failed)
+
+    def close(self):
+        """Выполнение уже поставленных запросов и остановка потока записи"""
+        self._queue.put(None)
+        self._thread.join()
+        self.session.close()
+        self.engine.dispose()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            request = self._queue.get()
+            if request is None:
+                break
+            batch = [request]
+            while not batch[-1].exclusive and len(batch) < self.max_requests:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+
+            exclusive = batch.pop() if batch[-1].exclusive else None
+            if batch:
+                self._commit(batch)
+            if exclusive is not None and exclusive.future.set_running_or_notify_cancel():
+                self._complete(exclusive, lambda: exclusive.function(self.session))
+
+    def _commit(self, batch: list[_WriteRequest]):
+        """Выполнение пакета запросов в точках сохранения одной транзакции и ее фиксация"""
+        done = []
+        for request in batch:
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            try:
+                with self.session.begin_nested():
+                    result = request.function(self.session)
+            except Exception as error:
+                self._failed += 1
+                request.future.set_exception(error)
+            else:
+                done.append((request, result))
+
+        try:
+            self.session.commit()
+        except Exception as error:
+            self.session.rollback()
+            self._failed += len(done)
+            for request, _ in done:
+                request.future.set_exception(error)
+            return
+        finally:
+            self.session.close()
+
+        self._batches += 1
+        self._requests += len(done)
+        self._notify_committed(request.user_id for request, _ in done)
+        for request, result in done:
+            request.future.set_result(result)
+
+    def _complete(self, request: _WriteRequest, function: Callable[[], Any]):
+        try:
+            result = function()
+        except Exception as error:
+            self._failed += 1
+            request.future.set_exception(error)
+        else:
+            self._notify_committed((request.user_id,))
+            request.future.set_result(result)
+
+    def _notify_committed(self, user_ids: Iterable[int | None]):
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if user_ids and self._on_committed is not None:
+            self._on_committed(user_ids)
@@ -0,0 +1,117 @@
+"""Обслуживание общей базы данных: удаление жанров и авторов, на которые не ссылается ни один пользователь
+и ни одна книга, возврат свободных страниц файлу и обновление статистики планировщика запросов
+Запускается только явно: из меню главного окна, командой cli.py vacuum или через сервер библиотеки;
+результат каждого запуска записывается в таблицу maintenance_runs"""
+import time
+from typing import NamedTuple
+
+from database.models import MaintenanceRun
+from sqlalchemy import Connection, Engine, insert
+
+# Сколько записей удаляется одним оператором: каждый пакет - отдельная короткая транзакция,
+# чтобы не задерживать запись из интерфейса
+ORPHAN_BATCH_SIZE = 500
+
+# (таблица, ключевое поле, связующая таблица, измерение в book_counters)
+_SHARED_TITLE_TABLES = (
+    ('genres', 'GenreId', 'user_genre_links', 'genre'),
+    ('authors', 'AuthorId', 'user_author_links', 'author'),
+)
+_FULLTEXT_INDEXES = ('books_fts', 'authors_fts', 'genres_fts')
+# PRAGMA auto_vacuum = INCREMENTAL
+_INCREMENTAL_AUTO_VACUUM = 2
+
+
+class MaintenanceReport(NamedTuple):
+    """Результат обслуживания: количество удаленных жанров и авторов, размер базы данных в байтах
+    до и после обслуживания и время в секундах"""
+    genres: int
+    authors: int
+    bytes_before: int
+    bytes_after: int
+    seconds: float
+
+    @property
+    def rows(self) -> int:
+        """Общее количество удаленных записей"""
+        return self.genres + self.authors
+
+    @property
+    def bytes_reclaimed(self) -> int:
+        """Сколько байт возвращено файловой системе"""
+        return max(self.bytes_before - self.bytes_after, 0)
+
+
+def _database_size(connection: Connection) -> int:
+    """Размер основного файла базы данных в байтах по количеству страниц"""
+    page_count = connection.exec_driver_sql('PRAGMA page_count').scalar()
+    return page_count * connection.exec_driver_sql('PRAGMA page_size').scalar()
+
+
+def delete_orphans(engine: Engine, table: str, id_column: str, link_table: str, dimension: str,
+                   batch_size: int = ORPHAN_BATCH_SIZE) -> int:
+    """Пакетное удаление записей table, которых нет ни у одного пользователя и ни в одной книге;
+    Ссылки книг проверяются по счетчикам book_counters, а не по таблице книг;
+    Каждый пакет удаляется одним оператором, поэтому запись, которую в это время добавляет пользователь,
+    не может быть удалена. Возвращает количество удаленных записей"""
+    orphans = (f"SELECT {id_column} FROM {table} "
+               f"WHERE {id_column} NOT IN (SELECT {id_column} FROM {link_table}) "
+               f"AND {id_column} NOT IN (SELECT CAST(value AS INTEGER) FROM book_counters "
+               f"WHERE dimension = '{dimension}') LIMIT {int(batch_size)}")
+    deleted = 0
+    while True:
+        with engine.begin() as connection:
+            rowcount = connection.exec_driver_sql(f'DELETE FROM {table} WHERE {id_column} IN ({orphans})').rowcount
+        deleted += rowcount
+        if rowcount < batch_size:
+            return deleted
+
+
+def _vacuum(connection: Connection):
+    """Возврат свободных страниц файлу; при первом обслуживании база данных переводится в режим
+    инкрементальной очистки полной перестройкой (VACUUM), затем освобождаются только свободные страницы"""
+    if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != _INCREMENTAL_AUTO_VACUUM:
+        connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+        return
+    free_pages = connection.exec_driver_sql('PRAGMA freelist_count').scalar()
+    if not free_pages:
+        return
+    # Драйвер sqlite3 выполняет один шаг PRAGMA incremental_vacuum, а каждый шаг освобождает одну страницу,
+    # поэтому шаги выполняются в одной транзакции
+    connection.exec_driver_sql('BEGIN IMMEDIATE')
+    try:
+        for _ in range(free_pages):
+            connection.exec_driver_sql('PRAGMA incremental_vacuum')
+        connection.exec_driver_sql('COMMIT')
+    except Exception:
+        connection.exec_driver_sql('ROLLBACK')
+        raise
+
+
+def run_maintenance(engine: Engine, batch_size: int = ORPHAN_BATCH_SIZE) -> MaintenanceReport:
+    """Полное обслуживание базы данных: удаление неиспользуемых жанров и авторов, очистка свободных страниц,
+    слияние сегментов полнотекстовых индексов, ANALYZE и PRAGMA optimize"""
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        bytes_before = _database_size(connection)
+
+    genres, authors = (delete_orphans(engine, *tables, batch_size=batch_size) for tables in _SHARED_TITLE_TABLES)
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for index in _FULLTEXT_INDEXES:
+            connection.exec_driver_sql(f"INSERT INTO {index} ({index}) VALUES ('optimize')")
+        _vacuum(connection)
+        connection.exec_driver_sql('ANALYZE')
+        connection.exec_driver_sql('PRAGMA optimize')
+        bytes_after = _database_size(connection)
+        # Перенос журнала WAL в основной файл и усечение журнала
+        connection.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    report = MaintenanceReport(genres, authors, bytes_before, bytes_after, time.perf_counter() - started)
+    with engine.begin() as connection:
+        connection.execute(insert(MaintenanceRun).values(finished=time.time(), genres=report.genres,
+                                                         authors=report.authors,
+                                                         bytes_reclaimed=report.bytes_reclaimed,
+                                                         seconds=report.seconds))
+    return report
@@ -0,0 +1,109 @@
+"""Версионные миграции схемы базы данных
+Номер версии схемы хранится в PRAGMA user_version. При запуске приложения выполняются только те миграции,
+номер которых больше сохраненной версии. Первая миграция создает схему по текущим моделям, поэтому
+все последующие миграции должны быть идемпотентными (checkfirst / IF NOT EXISTS)"""
+from typing import Callable
+
+from database.counters import create_book_counters
+from database.fulltext import create_fulltext_indexes
+from database.passwords import hash_password, is_hashed
+from database.startup import SCHEMA_VERSION
+from database.models import _Base, ENGINE, Author, Book, BookCounter, Genre, MaintenanceRun, User, UserAuthorLink, \
+    UserGenreLink
+from sqlalchemy import Connection, Engine
+
+
+def _create_schema(connection: Connection):
+    """Миграция 1: создание таблиц при их отсутствии"""
+    _Base.metadata.create_all(connection)
+
+
+def _merge_duplicate_titles(connection: Connection, table: str, id_column: str, link_table: str, book_fk: str):
+    """Объединение записей table с одинаковым названием в одну (с наименьшим ИД);
+    Ссылки из связующей таблицы и из книг переносятся на оставшуюся запись"""
+    canonical_id = (f'(SELECT MIN(duplicate.{id_column}) FROM {table} AS original '
+                    f'JOIN {table} AS duplicate ON duplicate.title = original.title '
+                    f'WHERE original.{id_column} = {{}}.{{}})')
+    keep_ids = f'(SELECT MIN({id_column}) FROM {table} GROUP BY title)'
+
+    connection.exec_driver_sql(f'UPDATE OR IGNORE {link_table} SET {id_column} = '
+                               f'{canonical_id.format(link_table, id_column)} '
+                               f'WHERE {id_column} NOT IN {keep_ids}')
+    # Оставшиеся ссылки на дубликаты уже есть у пользователя в виде ссылки на основную запись
+    connection.exec_driver_sql(f'DELETE FROM {link_table} WHERE {id_column} NOT IN {keep_ids}')
+    connection.exec_driver_sql(f'UPDATE books SET {book_fk} = {canonical_id.format("books", book_fk)} '
+                               f'WHERE {book_fk} NOT IN {keep_ids}')
+    connection.exec_driver_sql(f'DELETE FROM {table} WHERE {id_column} NOT IN {keep_ids}')
+
+
+def _create_search_indexes(connection: Connection):
+    """Миграция 2: индексы для поиска книг пользователя и уникальные названия жанров, авторов и имен пользователей;
+    Перед созданием уникальных индексов объединяются дубликаты жанров и авторов"""
+    _merge_duplicate_titles(connection, 'genres', 'GenreId', 'user_genre_links', 'genre_id_book_fk')
+    _merge_duplicate_titles(connection, 'authors', 'AuthorId', 'user_author_links', 'author_id_book_fk')
+
+    for model in (User, Genre, Author, UserGenreLink, UserAuthorLink, Book):
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+    connection.exec_driver_sql('ANALYZE')
+
+
+def _create_fulltext_indexes(connection: Connection):
+    """Миграция 3: полнотекстовые индексы FTS5 по названиям книг, авторов и жанров"""
+    create_fulltext_indexes(connection)
+
+
+def _create_book_counters(connection: Connection):
+    """Миграция 4: таблица счетчиков книг пользователя по статусам, жанрам и авторам и поддерживающие ее триггеры"""
+    BookCounter.__table__.create(connection, checkfirst=True)
+    create_book_counters(connection)
+
+
+def _create_maintenance_runs(connection: Connection):
+    """Миграция 5: журнал запусков обслуживания базы данных"""
+    MaintenanceRun.__table__.create(connection, checkfirst=True)
+
+
+def _hash_plaintext_passwords(connection: Connection):
+    """Миграция 6: хэширование паролей, сохраненных открытым текстом до появления хэширования;
+    Хэши scrypt с устаревшими параметрами не трогаются: их можно пересчитать только при входе, зная пароль"""
+    users = connection.exec_driver_sql('SELECT UserId, password FROM users').all()
+    rehashed = [(hash_password(password), user_id) for user_id, password in users if not is_hashed(password)]
+    if rehashed:
+        connection.exec_driver_sql('UPDATE users SET password = ? WHERE UserId = ?', rehashed)
+
+
+def _fold_fulltext_indexes(connection: Connection):
+    """Миграция 7: пересоздание триггеров полнотекстовых индексов и их заполнение с заменой ё на е в названиях"""
+    create_fulltext_indexes(connection)
+
+
+_MIGRATIONS: tuple[Callable[[Connection], None], ...] = (
+    _create_schema,
+    _create_search_indexes,
+    _create_fulltext_indexes,
+    _create_book_counters,
+    _create_maintenance_runs,
+    _hash_plaintext_passwords,
+    _fold_fulltext_indexes,
+)
+# Окно входа проверяет версию схемы без SQLAlchemy по database.startup.SCHEMA_VERSION
+assert SCHEMA_VERSION == len(_MIGRATIONS), 'database.startup.SCHEMA_VERSION должен совпадать с количеством миграций'
+
+
+def get_schema_version(connection: Connection) -> int:
+    """Возвращает текущую версию схемы базы данных"""
+    return connection.exec_driver_sql('PRAGMA user_version').scalar()
+
+
+def migrate(engine: Engine = ENGINE):
+    """Приведение схемы базы данных к последней версии;
+    Если схема актуальна, выполняется только чтение версии, без транзакции записи"""
+    with engine.connect() as connection:
+        if get_schema_version(connection) >= SCHEMA_VERSION:
+            return
+    with engine.begin() as connection:
+        version = get_schema_version(connection)
+        for number, migration in enumerate(_MIGRATIONS[version:], start=version + 1):
+            migration(connection)
+            connection.exec_driver_sql(f'PRAGMA user_version = {number}')
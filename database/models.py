@@ -1,18 +1,19 @@
 """Классы-модели таблиц в базе данных, реализованные на SQLAlchemy"""
-import os
-
-from sqlalchemy import Column, Integer, Text, ForeignKey, create_engine
+from database.session import create_database_engine
+from database.startup import DATABASE_PATH
+from sqlalchemy import Column, Float, Integer, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship, declarative_base
 
-_current_dir = os.path.dirname(os.path.abspath(__file__))
-_db_path = os.path.join(_current_dir, 'books_db.sqlite')
-ENGINE = create_engine(f'sqlite:///{_db_path}')
+ENGINE = create_database_engine(f'sqlite:///{DATABASE_PATH}')
 _Base = declarative_base()
 
 
 class User(_Base):
     """Модель таблицы для пользователей"""
     __tablename__ = 'users'
+    __table_args__ = (
+        Index('ix_users_username', 'username', unique=True),
+    )
 
     UserId = Column(Integer, primary_key=True)
     username = Column(Text)
@@ -26,6 +27,9 @@ class User(_Base):
 class Genre(_Base):
     """Модель таблицы для жанров"""
     __tablename__ = 'genres'
+    __table_args__ = (
+        Index('ix_genres_title', 'title', unique=True),
+    )
 
     GenreId = Column(Integer, primary_key=True)
     title = Column(Text)
@@ -34,6 +38,9 @@ class Genre(_Base):
 class Author(_Base):
     """Модель таблицы для авторов"""
     __tablename__ = 'authors'
+    __table_args__ = (
+        Index('ix_authors_title', 'title', unique=True),
+    )
 
     AuthorId = Column(Integer, primary_key=True)
     title = Column(Text)
@@ -43,6 +50,10 @@ class UserGenreLink(_Base):
     """Модель связующей таблицы жанров и пользователей, организующей связь многие ко многим
     Данная таблица нужна для того, чтобы у каждого пользователя был собственный набор жанров"""
     __tablename__ = 'user_genre_links'
+    __table_args__ = (
+        # Обратная сторона связи: поиск пользователей по жанру
+        Index('ix_user_genre_links_genre', 'GenreId', 'UserId'),
+    )
 
     UserId = Column(Integer, ForeignKey('users.UserId'), primary_key=True)
     GenreId = Column(Integer, ForeignKey('genres.GenreId'), primary_key=True)
@@ -52,6 +63,10 @@ class UserAuthorLink(_Base):
     """Модель связующей таблицы авторов и пользователей, организующей связь многие ко многим
     Данная таблица нужна для того, чтобы у каждого пользователя был собственный набор авторов"""
     __tablename__ = 'user_author_links'
+    __table_args__ = (
+        # Обратная сторона связи: поиск пользователей по автору
+        Index('ix_user_author_links_author', 'AuthorId', 'UserId'),
+    )
 
     UserId = Column(Integer, ForeignKey('users.UserId'), primary_key=True)
     AuthorId = Column(Integer, ForeignKey('authors.AuthorId'), primary_key=True)
@@ -60,6 +75,13 @@ class UserAuthorLink(_Base):
 class Book(_Base):
     """Модель таблицы для книг"""
     __tablename__ = 'books'
+    __table_args__ = (
+        # Индексы под поиск книг пользователя с фильтрами и проверки использования жанров / авторов
+        Index('ix_books_user_title', 'user_id_book_fk', 'title'),
+        Index('ix_books_user_author', 'user_id_book_fk', 'author_id_book_fk'),
+        Index('ix_books_user_genre', 'user_id_book_fk', 'genre_id_book_fk'),
+        Index('ix_books_user_status', 'user_id_book_fk', 'status'),
+    )
 
     BookId = Column(Integer, primary_key=True)
     title = Column(Text)
@@ -69,5 +91,26 @@ class Book(_Base):
     user_id_book_fk = Column(Integer, ForeignKey('users.UserId'))
 
 
-# Создаем базу данных при ее отсутствии
-_Base.metadata.create_all(ENGINE)
+
+class BookCounter(_Base):
+    """Модель таблицы счетчиков книг пользователя по статусам, жанрам и авторам;
+    dimension - 'status', 'genre' или 'author', value - статус или ИД жанра / автора в виде текста;
+    Таблица поддерживается триггерами на таблице книг (database/counters.py), записей с нулем книг нет"""
+    __tablename__ = 'book_counters'
+
+    UserId = Column(Integer, ForeignKey('users.UserId'), primary_key=True)
+    dimension = Column(Text, primary_key=True)
+    value = Column(Text, primary_key=True)
+    books = Column(Integer, nullable=False)
+
+
+class MaintenanceRun(_Base):
+    """Модель таблицы запусков обслуживания базы данных (database/maintenance.py)"""
+    __tablename__ = 'maintenance_runs'
+
+    RunId = Column(Integer, primary_key=True)
+    finished = Column(Float, nullable=False)
+    genres = Column(Integer, nullable=False)
+    authors = Column(Integer, nullable=False)
+    bytes_reclaimed = Column(Integer, nullable=False)
+    seconds = Column(Float, nullable=False)
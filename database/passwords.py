@@ -0,0 +1,100 @@
+"""Хэширование паролей пользователей функцией scrypt из hashlib с отдельной солью для каждого пользователя;
+В users.password хранится строка 'scrypt$<n>$<r>$<p>$<соль>$<хэш>' (соль и хэш в base64);
+Стоимость вычисления задается переменными окружения BOOKTRACKER_SCRYPT_N (степень двойки), BOOKTRACKER_SCRYPT_R
+и BOOKTRACKER_SCRYPT_P (см. benchmarks/passwords.py); хэши с другими параметрами пересчитываются при входе
+пользователя, а пароли, сохраненные открытым текстом до появления хэширования, хэшируются миграцией схемы 6
+(database/migrations.py)"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from typing import NamedTuple
+
+SCHEME = 'scrypt'
+SCRYPT_N_ENV = 'BOOKTRACKER_SCRYPT_N'
+SCRYPT_R_ENV = 'BOOKTRACKER_SCRYPT_R'
+SCRYPT_P_ENV = 'BOOKTRACKER_SCRYPT_P'
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+class ScryptParameters(NamedTuple):
+    """Параметры scrypt: n - стоимость по процессору и памяти (степень двойки), r - размер блока,
+    p - параллелизм; память на одно вычисление - около 128 * n * r байт"""
+    n: int = 2 ** 14
+    r: int = 8
+    p: int = 1
+
+    @property
+    def max_memory(self) -> int:
+        """Ограничение памяти для hashlib.scrypt с запасом на служебные данные OpenSSL"""
+        return 128 * self.n * self.r * (self.p + 1) + 1024 * 1024
+
+
+def _parameters_from_environment() -> ScryptParameters:
+    default = ScryptParameters()
+    parameters = ScryptParameters(int(os.environ.get(SCRYPT_N_ENV, default.n)),
+                                  int(os.environ.get(SCRYPT_R_ENV, default.r)),
+                                  int(os.environ.get(SCRYPT_P_ENV, default.p)))
+    if parameters.n < 2 or parameters.n & (parameters.n - 1) or parameters.r < 1 or parameters.p < 1:
+        raise ValueError(f'Недопустимые параметры scrypt: {parameters}')
+    return parameters
+
+
+# Параметры, с которыми хэшируются новые пароли
+PARAMETERS = _parameters_from_environment()
+
+
+def _encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+
+def _derive(password: str, salt: bytes, parameters: ScryptParameters) -> bytes:
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=parameters.n, r=parameters.r, p=parameters.p,
+                          maxmem=parameters.max_memory, dklen=KEY_BYTES)
+
+
+def hash_password(password: str, parameters: ScryptParameters = PARAMETERS) -> str:
+    """Хэш пароля с новой случайной солью в формате для users.password"""
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _derive(password, salt, parameters)
+    return f'{SCHEME}${parameters.n}${parameters.r}${parameters.p}${_encode(salt)}${_encode(key)}'
+
+
+def _parse(stored: str) -> tuple[ScryptParameters, bytes, bytes] | None:
+    """Параметры, соль и хэш из users.password или None, если там пароль открытым текстом"""
+    parts = stored.split('$')
+    if len(parts) != 6 or parts[0] != SCHEME:
+        return None
+    try:
+        parameters = ScryptParameters(int(parts[1]), int(parts[2]), int(parts[3]))
+        return parameters, base64.b64decode(parts[4], validate=True), base64.b64decode(parts[5], validate=True)
+    except ValueError:
+        return None
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Проверка пароля по значению users.password; сравнение за постоянное время;
+    Результаты проверок не кэшируются: время каждой проверки определяется только вычислением scrypt"""
+    parsed = _parse(stored)
+    if parsed is None:
+        return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
+    parameters, salt, key = parsed
+    return hmac.compare_digest(_derive(password, salt, parameters), key)
+
+
+def is_hashed(stored: str) -> bool:
+    """Хранится ли в users.password хэш scrypt, а не пароль открытым текстом"""
+    return _parse(stored) is not None
+
+
+def needs_rehash(stored: str, parameters: ScryptParameters = PARAMETERS) -> bool:
+    """Нужно ли пересчитать хэш: пароль хранится открытым текстом или захэширован с другими параметрами"""
+    parsed = _parse(stored)
+    return parsed is None or parsed[0] != parameters or len(parsed[1]) != SALT_BYTES
+
+
+def dummy_verify(password: str):
+    """Проверка пароля для несуществующего пользователя: время ответа не выдает, есть ли такое имя"""
+    _derive(password, b'\0' * SALT_BYTES, PARAMETERS)
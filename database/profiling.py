@@ -0,0 +1,256 @@
+"""Профилирование запросов к базе данных, включаемое переменной окружения BOOKTRACKER_PROFILE
+Время, количество строк и планы медленных запросов собираются событиями before/after_cursor_execute
+и курсором, который учитывает выборку строк (SQLite выполняет основную часть SELECT при выборке);
+Запросы группируются по вызвавшему их методу UserDatabaseManager. Отчет выводится в stderr при выходе
+или, если задан BOOKTRACKER_PROFILE_LOG, записывается в файл журнала с ротацией
+Переменные окружения:
+    BOOKTRACKER_PROFILE=1 - включение профилирования
+    BOOKTRACKER_PROFILE_LOG=<файл> - журнал отчетов вместо stderr
+    BOOKTRACKER_SLOW_QUERY_MS=<мс> - порог медленного запроса, для которого сохраняется EXPLAIN QUERY PLAN
+Без BOOKTRACKER_PROFILE обработчики событий не регистрируются и используется обычный курсор sqlite3"""
+import atexit
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import Engine, event
+
+PROFILE_ENV = 'BOOKTRACKER_PROFILE'
+PROFILE_LOG_ENV = 'BOOKTRACKER_PROFILE_LOG'
+SLOW_QUERY_ENV = 'BOOKTRACKER_SLOW_QUERY_MS'
+DEFAULT_SLOW_QUERY_MS = 50.0
+# Сколько медленных запросов хранится для отчета, размер файла журнала и количество старых файлов
+MAX_SLOW_QUERIES = 50
+LOG_MAX_BYTES = 1_000_000
+LOG_BACKUP_COUNT = 3
+
+# Модуль, методам которого приписываются запросы
+_ATTRIBUTED_MODULE = 'UserDatabaseManager'
+# Модули, кадры которых пропускаются при поиске места вызова
+_SKIPPED_MODULES = ('sqlalchemy', 'contextlib', __name__)
+# Списки параметров IN (?, ?, ...) разной длины считаются одним запросом
+_PARAMETER_LIST_PATTERN = re.compile(r'\(\?(?:, \?)+\)')
+
+
+class _Execution:
+    """Одно выполнение запроса: время выполнения и выборки строк, количество строк"""
+    __slots__ = ('method', 'statement', 'parameters', 'database', 'seconds', 'rows', 'stats', 'slow', 'plan')
+
+    def __init__(self, method: str, statement: str, parameters: Any, database: str | None, stats: 'StatementStats'):
+        self.method = method
+        self.statement = statement
+        self.parameters = parameters
+        self.database = database
+        self.seconds = 0.0
+        self.rows = 0
+        self.stats = stats
+        self.slow = False
+        self.plan: list[str] = []
+
+
+class StatementStats:
+    """Суммарная статистика одного запроса одного метода"""
+    __slots__ = ('calls', 'seconds', 'rows', 'max_seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.max_seconds = 0.0
+
+
+class QueryProfiler:
+    """Сбор статистики запросов всех движков, к которым подключен через attach"""
+
+    def __init__(self, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS):
+        self.slow_seconds = slow_query_ms / 1000
+        # метод -> запрос -> статистика
+        self.methods: dict[str, dict[str, StatementStats]] = {}
+        self.slow_queries: list[_Execution] = []
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Engine):
+        """Регистрация обработчиков событий движка"""
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        # Время начала хранится в контексте выполнения: у запроса, завершившегося ошибкой,
+        # after_cursor_execute не вызывается, и ничего не остается для следующих запросов
+        context.profiler_started = time.perf_counter()
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context.profiler_started
+        method = _caller()
+        statement = _PARAMETER_LIST_PATTERN.sub('(?, ...)', statement)
+        if executemany and parameters:
+            parameters = parameters[0]
+        with self._lock:
+            stats = self.methods.setdefault(method, {}).setdefault(statement, StatementStats())
+            stats.calls += 1
+        execution = _Execution(method, statement, parameters, connection.engine.url.database, stats)
+        self.account(execution, seconds, max(cursor.rowcount, 0))
+        if isinstance(cursor, _ProfilingCursor):
+            cursor.execution = execution
+
+    def account(self, execution: _Execution, seconds: float, rows: int):
+        """Учет времени и строк выполнения (при выполнении запроса и при каждой выборке строк);
+        План запроса, ставшего медленным, строится сразу, пока файл базы данных доступен"""
+        became_slow = False
+        with self._lock:
+            execution.seconds += seconds
+            execution.rows += rows
+            stats = execution.stats
+            stats.seconds += seconds
+            stats.rows += rows
+            stats.max_seconds = max(stats.max_seconds, execution.seconds)
+            if not execution.slow and execution.seconds >= self.slow_seconds:
+                execution.slow = True
+                if len(self.slow_queries) < MAX_SLOW_QUERIES:
+                    self.slow_queries.append(execution)
+                    became_slow = True
+        if became_slow:
+            execution.plan = _explain(execution)
+
+    def report(self) -> str:
+        """Текстовый отчет: методы по убыванию суммарного времени, их запросы и планы медленных запросов"""
+        with self._lock:
+            methods = {method: dict(statements) for method, statements in self.methods.items()}
+            slow_queries = list(self.slow_queries)
+
+        def total(statements: dict[str, StatementStats]) -> float:
+            return sum(stats.seconds for stats in statements.values())
+
+        lines = [f'Профиль запросов ({time.strftime("%Y-%m-%d %H:%M:%S")})']
+        for method, statements in sorted(methods.items(), key=lambda item: total(item[1]), reverse=True):
+            calls = sum(stats.calls for stats in statements.values())
+            lines.append(f'{method}: {calls} запросов, {total(statements) * 1000:.1f} мс')
+            for statement, stats in sorted(statements.items(), key=lambda item: item[1].seconds, reverse=True):
+                lines.append(f'    {stats.seconds * 1000:10.1f} мс  x{stats.calls:<6} строк {stats.rows:<8} '
+                             f'макс. {stats.max_seconds * 1000:.1f} мс  {_shorten(statement)}')
+
+        if slow_queries:
+            lines.append(f'Медленные запросы (от {self.slow_seconds * 1000:.0f} мс):')
+        for execution in slow_queries:
+            lines.append(f'{execution.method}: {execution.seconds * 1000:.1f} мс, строк {execution.rows}')
+            lines.append(f'    {" ".join(execution.statement.split())}')
+            lines.extend(f'    {line}' for line in execution.plan)
+        return '\n'.join(lines)
+
+
+class _ProfilingCursor(sqlite3.Cursor):
+    """Курсор, учитывающий время и количество выбранных строк в выполнении, к которому он относится"""
+    execution: _Execution | None = None
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._account(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size: int | None = None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._account(started, len(rows))
+        return rows
+
+    def _account(self, started: float, rows: int):
+        if self.execution is not None and PROFILER is not None:
+            PROFILER.account(self.execution, time.perf_counter() - started, rows)
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Подключение sqlite3, создающее курсоры с учетом выборки строк"""
+
+    def cursor(self, factory=_ProfilingCursor):
+        return super().cursor(factory)
+
+
+def _caller() -> str:
+    """Метод UserDatabaseManager, который выполняет запрос (внешний, если методы вызывают друг друга),
+    иначе - ближайшая функция вне SQLAlchemy"""
+    frame = sys._getframe(2)
+    method = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module == _ATTRIBUTED_MODULE:
+            method = frame.f_code.co_qualname
+        elif method is None and not module.startswith(_SKIPPED_MODULES):
+            method = f'{module}.{frame.f_code.co_qualname}'
+            # Продолжаем поиск: запрос мог быть выполнен вспомогательной функцией метода UserDatabaseManager
+        frame = frame.f_back
+    return method or '<unknown>'
+
+
+def _shorten(statement: str, length: int = 100) -> str:
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= length else statement[:length - 3] + '...'
+
+
+def _explain(execution: _Execution) -> list[str]:
+    """EXPLAIN QUERY PLAN медленного запроса в отдельном подключении только для чтения"""
+    if not execution.database or execution.database == ':memory:' or \
+            not execution.statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return []
+    try:
+        connection = sqlite3.connect(f'file:{execution.database}?mode=ro', uri=True)
+        try:
+            plan = connection.execute(f'EXPLAIN QUERY PLAN {execution.statement}',
+                                      execution.parameters or ()).fetchall()
+        finally:
+            connection.close()
+    except sqlite3.Error as error:
+        return [f'план недоступен: {error}']
+    return [f'{"  " * _depth(plan, parent)}{detail}' for _, parent, _, detail in plan]
+
+
+def _depth(plan: list[tuple], parent: int) -> int:
+    parents = {node: node_parent for node, node_parent, _, _ in plan}
+    depth = 0
+    while parent:
+        depth += 1
+        parent = parents.get(parent, 0)
+    return depth
+
+
+def _write_report():
+    report = PROFILER.report()
+    log_file = os.environ.get(PROFILE_LOG_ENV)
+    if not log_file:
+        print(report, file=sys.stderr)
+        return
+    logger = logging.getLogger(__name__)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                                   encoding='utf-8')
+    logger.addHandler(handler)
+    try:
+        logger.info(report)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def _create_profiler() -> QueryProfiler | None:
+    if os.environ.get(PROFILE_ENV, '') in ('', '0'):
+        return None
+    profiler = QueryProfiler(float(os.environ.get(SLOW_QUERY_ENV, DEFAULT_SLOW_QUERY_MS)))
+    atexit.register(_write_report)
+    return profiler
+
+
+# Профилировщик процесса или None, если профилирование выключено
+PROFILER = _create_profiler()
@@ -0,0 +1,75 @@
+"""LRU-кэш результатов поиска, ограниченный суммарным количеством строк во всех результатах"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple
+
+
+class SearchCacheStats(NamedTuple):
+    """Счетчики кэша: попадания, промахи, количество результатов и строк в кэше"""
+    hits: int
+    misses: int
+    entries: int
+    rows: int
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля запросов, ответ на которые взят из кэша"""
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+class SearchResultCache:
+    """Результаты поиска по ключу запроса; при превышении max_rows вытесняются давно не использованные результаты,
+    результаты длиннее max_rows не кэшируются, max_rows=0 отключает кэш"""
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        # ключ -> (результат, количество строк в нем)
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._rows = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """Результат по ключу или None при промахе"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, result: Any, rows: int | None = None):
+        """Сохранение результата с вытеснением давно не использованных;
+        rows - количество строк результата, по умолчанию len(result)"""
+        if rows is None:
+            rows = len(result)
+        self._discard(key)
+        if rows > self.max_rows or self.max_rows <= 0:
+            return
+        self._entries[key] = (result, rows)
+        self._rows += rows
+        while self._rows > self.max_rows:
+            _, (_, evicted_rows) = self._entries.popitem(last=False)
+            self._rows -= evicted_rows
+
+    def invalidate(self, predicate: Callable[[Any, Any], bool]) -> int:
+        """Удаление результатов, для которых predicate(ключ, результат) истинен; возвращает их количество"""
+        stale_keys = [key for key, (result, _) in self._entries.items() if predicate(key, result)]
+        for key in stale_keys:
+            self._discard(key)
+        return len(stale_keys)
+
+    def clear(self):
+        """Удаление всех результатов; счетчики сохраняются"""
+        self._entries.clear()
+        self._rows = 0
+
+    def stats(self) -> SearchCacheStats:
+        """Текущие счетчики"""
+        return SearchCacheStats(self.hits, self.misses, len(self._entries), self._rows)
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._rows -= entry[1]
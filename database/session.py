@@ -0,0 +1,129 @@
+"""Подключение к базе данных: настройка SQLite и общий для приложения менеджер сессий;
+Асинхронный вариант (SQLAlchemy asyncio + aiosqlite) использует те же настройки SQLite;
+sqlalchemy.ext.asyncio импортируется только при создании асинхронного движка или менеджера сессий,
+чтобы не замедлять запуск синхронных точек входа (cli.py, главное окно)"""
+from contextlib import contextmanager
+from typing import Iterator, TYPE_CHECKING
+
+from database.profiling import PROFILER, ProfilingConnection
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+# Настройки каждого нового подключения SQLite:
+# WAL - читатели не блокируют писателя, synchronous=NORMAL - без fsync на каждую фиксацию в режиме WAL,
+# cache_size - 32 МБ кэша страниц (отрицательное значение задается в КБ), mmap_size - чтение через отображение файла
+_SQLITE_PRAGMAS = (
+    'journal_mode = WAL',
+    'synchronous = NORMAL',
+    'cache_size = -32000',
+    'mmap_size = 268435456',
+    'temp_store = MEMORY',
+)
+# Размер кэша подготовленных выражений драйвера sqlite3 на одно подключение
+_STATEMENT_CACHE_SIZE = 256
+# Размер кэша скомпилированных SQLAlchemy запросов
+_QUERY_CACHE_SIZE = 1000
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Применение настроек SQLite к новому подключению"""
+    cursor = dbapi_connection.cursor()
+    for pragma in _SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
+def _connect_args(busy_timeout: float | None) -> dict:
+    """Аргументы sqlite3.connect (aiosqlite передает их туда же)"""
+    connect_args = {'cached_statements': _STATEMENT_CACHE_SIZE}
+    if busy_timeout is not None:
+        connect_args['timeout'] = busy_timeout
+    if PROFILER is not None:
+        connect_args['factory'] = ProfilingConnection
+    return connect_args
+
+
+def _configure_engine(engine: Engine):
+    """Настройки SQLite для новых подключений и профилировщик"""
+    event.listen(engine, 'connect', _set_sqlite_pragmas)
+    if PROFILER is not None:
+        PROFILER.attach(engine)
+
+
+def create_database_engine(url: str, busy_timeout: float | None = None, pool_size: int | None = None) -> Engine:
+    """Создание движка SQLAlchemy для файла SQLite с настройками производительности;
+    busy_timeout - сколько секунд ждать, пока другой процесс держит блокировку записи (по умолчанию 5);
+    pool_size - сколько подключений пул держит открытыми (по умолчанию 5);
+    При включенном профилировании (database/profiling.py) движок подключается к профилировщику"""
+    engine_args = {'pool_size': pool_size} if pool_size is not None else {}
+    engine = create_engine(url, query_cache_size=_QUERY_CACHE_SIZE, connect_args=_connect_args(busy_timeout),
+                           **engine_args)
+    _configure_engine(engine)
+    return engine
+
+
+def create_async_database_engine(url: str, busy_timeout: float | None = None) -> 'AsyncEngine':
+    """Асинхронный движок для url вида sqlite+aiosqlite:///<файл> с теми же настройками;
+    События подключений регистрируются на синхронном движке, который AsyncEngine использует внутри"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(url, query_cache_size=_QUERY_CACHE_SIZE, connect_args=_connect_args(busy_timeout))
+    _configure_engine(engine.sync_engine)
+    return engine
+
+
+class DatabaseSessionManager:
+    """Общий для приложения менеджер сессий: создается один раз в AppManager и передается окнам;
+    Все сессии берут подключения из пула одного движка"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._session_maker = sessionmaker(bind=engine)
+
+    def create_session(self) -> Session:
+        """Новая сессия; подключение берется из пула при первом запросе и возвращается при close / commit"""
+        return self._session_maker()
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[Session]:
+        """Короткая единица работы: изменения фиксируются при успешном выходе из блока,
+        отменяются при исключении, подключение сразу возвращается в пул"""
+        with self._session_maker.begin() as session:
+            yield session
+
+    def dispose(self):
+        """Закрытие всех подключений пула"""
+        self.engine.dispose()
+
+
+class SharedSessionManager:
+    """Менеджер сессий, который всегда возвращает одну и ту же сессию: UserDatabaseManager выполняет запросы
+    в сессии, которой управляет вызывающий код (поток записи сервера, AsyncSession.run_sync)"""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def create_session(self) -> Session:
+        return self.session
+
+
+class AsyncDatabaseSessionManager:
+    """Менеджер асинхронных сессий: каждая сессия берет свое подключение из пула движка, поэтому запросы
+    разных сессий выполняются одновременно"""
+
+    def __init__(self, engine: 'AsyncEngine'):
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        self.engine = engine
+        self._session_maker = async_sessionmaker(engine)
+
+    def create_session(self) -> 'AsyncSession':
+        """Новая сессия; используется как async with manager.create_session() as session"""
+        return self._session_maker()
+
+    async def dispose(self):
+        """Закрытие всех подключений пула"""
+        await self.engine.dispose()
@@ -0,0 +1,79 @@
+"""Легкий путь запуска приложения без SQLAlchemy: путь к базе данных, проверка версии схемы,
+запросы окна входа и управление пользователями из командной строки (cli.py) через модуль sqlite3;
+Пароли хранятся в виде хэшей (database/passwords.py); функции входа и регистрации вычисляют хэш,
+поэтому окно входа вызывает их в фоновом потоке;
+SQLAlchemy, ORM-модели и главное окно загружаются в фоне, пока пользователь вводит данные для входа"""
+import os
+import sqlite3
+from contextlib import closing
+
+from database.passwords import dummy_verify, hash_password, needs_rehash, verify_password
+
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'books_db.sqlite')
+# Версия схемы после всех миграций database/migrations.py
+SCHEMA_VERSION = 7
+
+
+def read_schema_version(path: str = DATABASE_PATH) -> int:
+    """Версия схемы базы данных из PRAGMA user_version; 0, если файла базы данных еще нет"""
+    if not os.path.exists(path):
+        return 0
+    with closing(sqlite3.connect(path)) as connection:
+        return connection.execute('PRAGMA user_version').fetchone()[0]
+
+
+def find_user(username: str, path: str = DATABASE_PATH) -> tuple[int, str] | None:
+    """ИД и хэш пароля пользователя username (поиск по уникальному индексу имен) или None"""
+    with closing(sqlite3.connect(path)) as connection:
+        return connection.execute('SELECT UserId, password FROM users WHERE username = ?', (username,)).fetchone()
+
+
+def authenticate(username: str, password: str, path: str = DATABASE_PATH) -> int | None:
+    """Проверка имени и пароля; возвращает ИД пользователя или None, если имя или пароль неверны;
+    Если хэш пароля вычислен с устаревшими параметрами, он пересчитывается с текущими параметрами"""
+    record = find_user(username, path)
+    if record is None:
+        dummy_verify(password)
+        return None
+    user_id, stored = record
+    if not verify_password(password, stored):
+        return None
+    if needs_rehash(stored):
+        with closing(sqlite3.connect(path)) as connection:
+            with connection:
+                # Условие на старый хэш: пароль, измененный одновременно в другом процессе, не перезаписывается
+                connection.execute('UPDATE users SET password = ? WHERE UserId = ? AND password = ?',
+                                   (hash_password(password), user_id, stored))
+    return user_id
+
+
+def add_user(username: str, password: str, path: str = DATABASE_PATH) -> int | None:
+    """Регистрация пользователя одним INSERT с хэшем пароля; возвращает ИД нового пользователя
+    или None, если имя уже занято (уникальный индекс имен)"""
+    password_hash = hash_password(password)
+    with closing(sqlite3.connect(path)) as connection:
+        try:
+            with connection:
+                cursor = connection.execute('INSERT INTO users (username, password) VALUES (?, ?)',
+                                            (username, password_hash))
+        except sqlite3.IntegrityError:
+            return None
+        return cursor.lastrowid
+
+
+def set_password(username: str, password: str, path: str = DATABASE_PATH) -> bool:
+    """Замена пароля пользователя username; возвращает False, если такого пользователя нет"""
+    password_hash = hash_password(password)
+    with closing(sqlite3.connect(path)) as connection:
+        with connection:
+            cursor = connection.execute('UPDATE users SET password = ? WHERE username = ?', (password_hash, username))
+        return cursor.rowcount > 0
+
+
+def list_users(path: str = DATABASE_PATH) -> list[tuple[int, str, int]]:
+    """ИД, имя и количество книг (по счетчикам book_counters) всех пользователей по алфавиту"""
+    with closing(sqlite3.connect(path)) as connection:
+        return connection.execute(
+            "SELECT users.UserId, users.username, COALESCE(SUM(book_counters.books), 0) FROM users "
+            "LEFT JOIN book_counters ON book_counters.UserId = users.UserId AND book_counters.dimension = 'status' "
+            "GROUP BY users.UserId ORDER BY users.username").fetchall()
@@ -1,9 +1,17 @@
-"""Главный файл для запуска приложения"""
+"""Главный файл для запуска приложения
+Окно входа показывается сразу: ему нужны только PyQt6 и sqlite3. Главное окно, SQLAlchemy и ORM-модели
+загружаются в фоновом потоке, пока пользователь вводит данные для входа (см. benchmarks/startup.py)
+Если задана переменная окружения BOOKTRACKER_SERVER (адрес сервера, см. server.py), приложение работает
+в режиме клиента: вход и все запросы главного окна выполняет сервер библиотеки, а не файл базы данных"""
+import functools
+import os
 import sys
+import threading
+from typing import Callable
 
-import qdarktheme
+from database.startup import SCHEMA_VERSION, add_user, authenticate, read_schema_version
+from LibraryClient import SERVER_URL_ENV, LibraryConnection, login, register
 from LoginWindow import LoginWindow
-from MainMenu import MainMenu
 from PyQt6.QtWidgets import QApplication
 
 
@@ -12,20 +20,81 @@ class AppManager:
 
     def __init__(self):
         self.app = QApplication(sys.argv)
+        # Адрес сервера библиотеки в режиме клиента; схемой базы данных в этом режиме управляет сервер
+        self.server_url = os.environ.get(SERVER_URL_ENV)
+        # Схема создается или обновляется только если ее версия устарела; иначе SQLAlchemy при старте не нужен
+        if self.server_url is None and read_schema_version() < SCHEMA_VERSION:
+            from database.migrations import migrate
+            migrate()
+        # Единый для всех окон менеджер подключений к базе данных; создается при входе в аккаунт
+        self.session_manager = None
+        # Подключение к серверу пользователя, вошедшего в режиме клиента
+        self.connection: LibraryConnection | None = None
         self.current_user_id: int | None = None
         self.login_window: LoginWindow | None = None
-        self.main_menu: MainMenu | None = None
+        self.main_menu = None
 
     def run(self):
         """Запуск программы: первым делом показывается окно входа"""
+        self.show_login_window()
+        threading.Thread(target=self._preload, name='preload', daemon=True).start()
+        self.app.exec()
+        if self.session_manager is not None:
+            self.session_manager.dispose()
+
+    def show_login_window(self):
+        """Показ окна входа"""
         self.login_window = LoginWindow(self)
         self.login_window.show()
-        self.app.exec()
+
+    def authenticate(self, username: str, password: str) -> int | None:
+        """Проверка имени и пароля в файле базы данных или на сервере; ИД пользователя или None;
+        Окно входа вызывает метод в фоновом потоке"""
+        if self.server_url is None:
+            return authenticate(username, password)
+        return self._sign_in(login, username, password)
+
+    def register(self, username: str, password: str) -> int | None:
+        """Регистрация в файле базы данных или на сервере; ИД нового пользователя или None, если имя занято"""
+        if self.server_url is None:
+            return add_user(username, password)
+        return self._sign_in(register, username, password)
+
+    def _sign_in(self, function: Callable[[str, str, str], LibraryConnection | None],
+                 username: str, password: str) -> int | None:
+        connection = function(self.server_url, username, password)
+        if connection is None:
+            return None
+        self.connection = connection
+        return connection.user_id
+
+    def _preload(self):
+        """Фоновая загрузка главного окна и SQLAlchemy (или клиента сервера библиотеки в режиме клиента);
+        Обслуживание базы данных (VACUUM) при старте не запускается: его прерывание при выходе из приложения
+        оставило бы незавершенную запись, поэтому оно выполняется только по команде из меню или cli.py vacuum"""
+        import MainMenu  # noqa: F401
+        if self.server_url is not None:
+            import RemoteUserDatabaseManager  # noqa: F401
 
     def show_main_menu(self, user_id: int):
         """После входа в аккаунт показывается главное меню"""
+        # Если фоновая загрузка еще идет, импорт дождется ее (блокировка импорта модуля);
+        # MainMenu импортируется первым, чтобы потоки брали блокировки модулей в одном порядке
+        from MainMenu import MainMenu
+
+        if self.server_url is not None:
+            from RemoteUserDatabaseManager import RemoteUserDatabaseManager
+            manager_factory = functools.partial(RemoteUserDatabaseManager, self.connection)
+        else:
+            from database.models import ENGINE
+            from database.session import DatabaseSessionManager
+            from UserDatabaseManager import UserDatabaseManager
+
+            if self.session_manager is None:
+                self.session_manager = DatabaseSessionManager(ENGINE)
+            manager_factory = functools.partial(UserDatabaseManager, user_id, self.session_manager)
         self.login_window.close()
-        self.main_menu = MainMenu(self, user_id)
+        self.main_menu = MainMenu(self, user_id, manager_factory)
         self.main_menu.show()
 
 
@@ -36,6 +105,7 @@ def except_hook(cls, exception, traceback):
 
 if __name__ == '__main__':
     app_manager = AppManager()
+    import qdarktheme
     qdarktheme.setup_theme()
     sys.excepthook = except_hook
     app_manager.run()
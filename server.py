@@ -0,0 +1,494 @@
+"""Локальный сервер библиотеки: несколько клиентов (главные окна в режиме клиента, скрипты) работают с одной
+базой данных через HTTP/JSON, а не открывают файл SQLite каждый сам
+Запуск из корня проекта:
+    python server.py --port 8765 --readers 4
+    BOOKTRACKER_SERVER=127.0.0.1:8765 python main.py
+Запросы чтения выполняются параллельно пулом потоков, у каждого потока свои подключения из пула движка;
+Все изменения проходят через очередь единственного потока записи с групповой фиксацией (database/group_commit.py):
+ответ и изменения каталога отправляются клиенту только после фиксации транзакции;
+Ответ на запрос чтения содержит ETag - версию данных пользователя, которая увеличивается после каждого
+их изменения: повторный запрос с If-None-Match получает 304 без обращения к базе данных;
+Протокол описан в LibraryClient.py; сервер должен быть единственным, кто изменяет файл базы данных"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import secrets
+import sys
+import tempfile
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Callable, NamedTuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from database.group_commit import GroupCommitWriter, create_writer_engine, GROUP_COMMIT_MAX_REQUESTS
+from database.maintenance import run_maintenance
+from database.migrations import migrate
+from database.models import User
+from database.passwords import dummy_verify, hash_password, needs_rehash, verify_password
+from database.session import DatabaseSessionManager, SharedSessionManager, create_database_engine
+from database.startup import DATABASE_PATH
+from LibraryClient import ADMIN_TOKEN_ENV, ADMIN_TOKEN_HEADER, DEFAULT_HOST, DEFAULT_PORT, READ_METHODS, \
+    TRANSFER_CHUNK_BYTES, WRITE_METHODS
+from sqlalchemy import Row, insert, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from UserDatabaseManager import UserDatabaseManager, CatalogChange, AuthorInUseError, AuthorNotFoundError, \
+    BookNotFoundError, CsvImportError, GenreInUseError, GenreNotFoundError
+
+READER_THREADS = 4
+# Сколько UserDatabaseManager (с кэшем результатов поиска) хранит один поток чтения
+READER_MANAGERS_PER_THREAD = 16
+# Поток записи ждет блокировку, которую держит другой процесс (например, cli.py), не дольше этого времени
+WRITER_BUSY_TIMEOUT_SECONDS = 60
+MAX_JSON_BODY_BYTES = 1024 * 1024
+
+# Коды ответов для исключений методов UserDatabaseManager
+_ERROR_STATUSES = (
+    (GenreInUseError, HTTPStatus.CONFLICT),
+    (AuthorInUseError, HTTPStatus.CONFLICT),
+    (GenreNotFoundError, HTTPStatus.NOT_FOUND),
+    (AuthorNotFoundError, HTTPStatus.NOT_FOUND),
+    (BookNotFoundError, HTTPStatus.NOT_FOUND),
+    (IntegrityError, HTTPStatus.CONFLICT),
+    (CsvImportError, HTTPStatus.UNPROCESSABLE_ENTITY),
+    (OperationalError, HTTPStatus.SERVICE_UNAVAILABLE),
+)
+
+
+class GroupCommitManager(UserDatabaseManager):
+    """UserDatabaseManager потока записи: методы выполняются в сессии пакета групповой фиксации;
+    commit только передает изменения в транзакцию пакета, rollback откатывает изменения запроса к его точке
+    сохранения (например, при отмене импорта), не затрагивая другие запросы пакета;
+    изменения каталога передаются listener и отправляются клиенту после фиксации"""
+
+    def __init__(self, user_id: int, session: Session, listener: Callable[[CatalogChange], None]):
+        super().__init__(user_id, SharedSessionManager(session))
+        self.search_cache.max_rows = 0
+        self.add_change_listener(listener)
+
+    def commit(self):
+        self.session.flush()
+
+    def rollback(self):
+        # Точку сохранения открывает GroupCommitWriter на время запроса
+        self.session.get_nested_transaction().rollback()
+
+    def end_unit_of_work(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class HttpError(Exception):
+    """Ошибка запроса, о которой клиенту сообщается кодом status;
+    close=True - тело запроса не прочитано, и подключение нужно закрыть"""
+
+    def __init__(self, status: HTTPStatus, message: str, close: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.close = close
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get('connection', '').lower() != 'close'
+
+    @property
+    def content_length(self) -> int:
+        if 'transfer-encoding' in self.headers:
+            raise HttpError(HTTPStatus.LENGTH_REQUIRED, 'Тело запроса должно передаваться с Content-Length',
+                            close=True)
+        try:
+            return int(self.headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Неверный Content-Length', close=True) from None
+
+
+class Response(NamedTuple):
+    """Ответ: тело body или содержимое временного файла file, который удаляется после отправки"""
+    status: HTTPStatus
+    headers: dict[str, str]
+    body: bytes = b''
+    file: str | None = None
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Row):
+        return tuple(value)
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def json_response(value: Any, status: HTTPStatus = HTTPStatus.OK, headers: dict[str, str] | None = None) -> Response:
+    body = json.dumps(value, ensure_ascii=False, default=_json_default).encode('utf-8')
+    return Response(status, {'Content-Type': 'application/json', **(headers or {})}, body)
+
+
+def error_response(status: HTTPStatus, error: Exception) -> Response:
+    return json_response({'error': type(error).__name__, 'message': str(error)}, status)
+
+
+async def read_request(reader: asyncio.StreamReader) -> Request | None:
+    """Строка запроса и заголовки; None, если клиент закрыл подключение"""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, 'Неверная строка запроса', close=True) from None
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    parts = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+    return Request(method, unquote(parts.path), query, headers)
+
+
+async def send_response(writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+    size = os.path.getsize(response.file) if response.file is not None else len(response.body)
+    headers = {**response.headers, 'Content-Length': str(size),
+               'Connection': 'keep-alive' if keep_alive else 'close'}
+    writer.write(f'HTTP/1.1 {response.status.value} {response.status.phrase}\r\n'.encode('latin-1'))
+    writer.write(''.join(f'{name}: {value}\r\n' for name, value in headers.items()).encode('latin-1') + b'\r\n')
+    if response.file is None:
+        writer.write(response.body)
+    else:
+        with open(response.file, 'rb') as file:
+            while chunk := file.read(TRANSFER_CHUNK_BYTES):
+                writer.write(chunk)
+                await writer.drain()
+    await writer.drain()
+
+
+class LibraryServer:
+    """Состояние сервера: пул потоков чтения, поток записи, ключи сессий и версии данных пользователей"""
+
+    def __init__(self, url: str, readers: int = READER_THREADS, max_batch: int = GROUP_COMMIT_MAX_REQUESTS,
+                 admin_token: str | None = None):
+        # Подключений в пуле движка столько же, сколько потоков чтения: поток не ждет свободного подключения
+        self.engine = create_database_engine(url, pool_size=readers)
+        migrate(self.engine)
+        self.session_manager = DatabaseSessionManager(self.engine)
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix='reader')
+        self.writer = GroupCommitWriter(create_writer_engine(url, WRITER_BUSY_TIMEOUT_SECONDS), self._on_committed,
+                                        max_batch)
+        # ETag включает ИД запуска: версии после перезапуска сервера начинаются заново
+        self.boot_id = secrets.token_hex(4)
+        self.versions: dict[int, int] = {}
+        self.tokens: dict[str, int] = {}
+        # Обслуживание затрагивает файл базы данных целиком, поэтому доступно только с ключом администратора
+        self.admin_token = admin_token
+        self.reads = 0
+        self.not_modified = 0
+        self._reader_state = threading.local()
+
+    def close(self):
+        self.readers.shutdown()
+        self.writer.close()
+        self.engine.dispose()
+
+    def _on_committed(self, user_ids: set[int]):
+        """Вызывается потоком записи после фиксации, до отправки ответов"""
+        for user_id in user_ids:
+            self.versions[user_id] = self.versions.get(user_id, 0) + 1
+
+    def etag(self, user_id: int) -> str:
+        return f'W/"{self.boot_id}-{user_id}-{self.versions.get(user_id, 0)}"'
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Обработка запросов одного подключения по очереди (HTTP/1.1 keep-alive)"""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    response = await self.dispatch(request, reader)
+                    keep_alive = request.keep_alive
+                except HttpError as error:
+                    response, keep_alive = error_response(error.status, error), not error.close
+                except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    raise
+                except Exception as error:
+                    # Ошибка сервера: клиент получает 500, подключение закрывается
+                    traceback.print_exc()
+                    response, keep_alive = error_response(HTTPStatus.INTERNAL_SERVER_ERROR, error), False
+                try:
+                    await send_response(writer, response, keep_alive)
+                finally:
+                    if response.file is not None:
+                        os.remove(response.file)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Request, reader: asyncio.StreamReader) -> Response:
+        """Выбор обработчика по пути; исключения методов UserDatabaseManager превращаются в ответы с ошибкой"""
+        route, _, name = request.path.strip('/').partition('/')
+        try:
+            if (request.method, route) == ('POST', 'import'):
+                return await self.import_csv(self.authorize(request, close=True), request, reader)
+            body = await self._read_json(request, reader)
+            if (request.method, route) == ('GET', 'stats'):
+                return self.stats()
+            if (request.method, route) == ('POST', 'login'):
+                return await self.login(body)
+            if (request.method, route) == ('POST', 'register'):
+                return await self.register(body)
+
+            if (request.method, route) == ('POST', 'maintenance'):
+                self.authorize_admin(request)
+                return await self.maintenance()
+
+            user_id = self.authorize(request)
+            if (request.method, route) == ('GET', 'read') and name in READ_METHODS:
+                return await self.read(user_id, name, request)
+            if (request.method, route) == ('POST', 'write') and name in WRITE_METHODS:
+                return await self.write(user_id, name, body)
+            if (request.method, route) == ('GET', 'export'):
+                return await self.export_csv(user_id)
+            if (request.method, route) == ('POST', 'logout'):
+                self.tokens.pop(request.headers['authorization'].partition(' ')[2], None)
+                return json_response(None)
+            raise HttpError(HTTPStatus.NOT_FOUND, f'{request.method} {request.path}')
+        except HttpError:
+            raise
+        except Exception as error:
+            for error_class, status in _ERROR_STATUSES:
+                if isinstance(error, error_class):
+                    return error_response(status, error)
+            raise
+
+    def authorize(self, request: Request, close: bool = False) -> int:
+        """ИД пользователя по ключу сессии из заголовка Authorization"""
+        scheme, _, token = request.headers.get('authorization', '').partition(' ')
+        user_id = self.tokens.get(token) if scheme == 'Bearer' else None
+        if user_id is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, 'Требуется вход', close=close)
+        return user_id
+
+    def authorize_admin(self, request: Request):
+        """Проверка ключа администратора из заголовка ADMIN_TOKEN_HEADER; без --admin-token запрос отклоняется всегда"""
+        token = request.headers.get(ADMIN_TOKEN_HEADER.lower(), '')
+        if self.admin_token is None or not secrets.compare_digest(token.encode(), self.admin_token.encode()):
+            raise HttpError(HTTPStatus.FORBIDDEN, 'Обслуживание базы данных доступно только администратору сервера')
+
+    @staticmethod
+    async def _read_json(request: Request, reader: asyncio.StreamReader) -> Any:
+        length = request.content_length
+        if length > MAX_JSON_BODY_BYTES:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'Слишком большой запрос', close=True)
+        if not length:
+            return None
+        try:
+            return json.loads(await reader.readexactly(length))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Тело запроса - не JSON') from None
+
+    async def _in_reader(self, function: Callable[..., Any], *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.readers, functools.partial(function, *args))
+
+    def stats(self) -> Response:
+        """Счетчики для нагрузочного теста (benchmarks/server_load.py)"""
+        writer_stats = self.writer.stats()
+        return json_response({'reads': self.reads, 'not_modified': self.not_modified,
+                              'batches': writer_stats.batches, 'writes': writer_stats.requests,
+                              'failed_writes': writer_stats.failed,
+                              'requests_per_batch': writer_stats.requests_per_batch})
+
+    @staticmethod
+    def _credentials(body: Any) -> tuple[str, str]:
+        if not isinstance(body, dict) or not isinstance(body.get('username'), str) \
+                or not isinstance(body.get('password'), str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Ожидается {"username": ..., "password": ...}')
+        return body['username'], body['password']
+
+    def _new_token(self, user_id: int) -> Response:
+        token = secrets.token_urlsafe(32)
+        self.tokens[token] = user_id
+        return json_response({'user_id': user_id, 'token': token})
+
+    async def login(self, body: Any) -> Response:
+        """Вход: пароль проверяется в потоке чтения (вычисление хэша не блокирует цикл событий);
+        Хэш с устаревшими параметрами пересчитывается и сохраняется через поток записи"""
+        username, password = self._credentials(body)
+        user_id = await self._in_reader(self._authenticate, username, password)
+        if user_id is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, 'Неверное имя пользователя или пароль')
+        return self._new_token(user_id)
+
+    def _authenticate(self, username: str, password: str) -> int | None:
+        with self.session_manager.unit_of_work() as session:
+            record = session.execute(select(User.UserId, User.password).where(User.username == username)).first()
+        if record is None:
+            dummy_verify(password)
+            return None
+        user_id, stored = record
+        if not verify_password(password, stored):
+            return None
+        if needs_rehash(stored):
+            self.writer.submit(lambda session: session.execute(
+                update(User).where(User.UserId == user_id, User.password == stored).values(
+                    password=hash_password(password))))
+        return user_id
+
+    async def register(self, body: Any) -> Response:
+        """Регистрация: хэш пароля вычисляется в потоке чтения, пользователь добавляется потоком записи;
+        Занятое имя - ответ 409"""
+        username, password = self._credentials(body)
+        if not username or not password:
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Имя пользователя и пароль не могут быть пустыми')
+        password_hash = await self._in_reader(hash_password, password)
+        user_id = await asyncio.wrap_future(self.writer.submit(lambda session: session.execute(
+            insert(User).values(username=username, password=password_hash)).inserted_primary_key[0]))
+        return self._new_token(user_id)
+
+    @staticmethod
+    def _arguments(value: Any) -> tuple[list, dict]:
+        value = value or {}
+        args, kwargs = value.get('args', []), value.get('kwargs', {})
+        if not isinstance(args, list) or not isinstance(kwargs, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Ожидается {"args": [...], "kwargs": {...}}')
+        return args, kwargs
+
+    async def read(self, user_id: int, method: str, request: Request) -> Response:
+        """Метод чтения в пуле потоков чтения; если у клиента уже есть результат текущей версии - 304"""
+        etag = self.etag(user_id)
+        if request.headers.get('if-none-match') == etag:
+            self.not_modified += 1
+            return Response(HTTPStatus.NOT_MODIFIED, {'ETag': etag})
+        try:
+            args, kwargs = self._arguments(json.loads(request.query.get('args', '{}')))
+        except (ValueError, AttributeError):
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Параметр args - не JSON') from None
+        self.reads += 1
+        version = self.versions.get(user_id, 0)
+        result = await self._in_reader(self._read, user_id, version, method, args, kwargs)
+        return json_response({'result': result}, headers={'ETag': etag})
+
+    def _reader_manager(self, user_id: int, version: int) -> UserDatabaseManager:
+        """UserDatabaseManager пользователя в текущем потоке чтения; кэш результатов поиска сбрасывается,
+        если данные пользователя изменились с прошлого запроса (изменения выполняет поток записи)"""
+        managers = getattr(self._reader_state, 'managers', None)
+        if managers is None:
+            managers = self._reader_state.managers = OrderedDict()
+        entry = managers.pop(user_id, None)
+        if entry is None:
+            entry = (UserDatabaseManager(user_id, self.session_manager), version)
+        manager, cached_version = entry
+        if cached_version != version:
+            manager.search_cache.clear()
+        managers[user_id] = (manager, version)
+        if len(managers) > READER_MANAGERS_PER_THREAD:
+            managers.popitem(last=False)[1][0].close()
+        return manager
+
+    def _read(self, user_id: int, version: int, method: str, args: list, kwargs: dict) -> Any:
+        manager = self._reader_manager(user_id, version)
+        try:
+            return getattr(manager, method)(*args, **kwargs)
+        finally:
+            manager.end_unit_of_work()
+
+    async def _write(self, user_id: int, method: str, *args, **kwargs) -> tuple[Any, list[CatalogChange]]:
+        """Метод UserDatabaseManager в потоке записи; результат и изменения каталога - после фиксации"""
+        def call(session: Session) -> tuple[Any, list[CatalogChange]]:
+            changes = []
+            manager = GroupCommitManager(user_id, session, changes.append)
+            return getattr(manager, method)(*args, **kwargs), changes
+
+        return await asyncio.wrap_future(self.writer.submit(call, user_id))
+
+    async def write(self, user_id: int, method: str, body: Any) -> Response:
+        args, kwargs = self._arguments(body)
+        result, changes = await self._write(user_id, method, *args, **kwargs)
+        if method == 'delete_account':
+            self.tokens = {token: owner for token, owner in self.tokens.items() if owner != user_id}
+        return json_response({'result': result, 'changes': changes})
+
+    async def import_csv(self, user_id: int, request: Request, reader: asyncio.StreamReader) -> Response:
+        """Тело запроса (файл csv) сохраняется во временный файл, затем импортируется потоком записи;
+        С параметром merge=1 файл сливается с библиотекой (merge_csv), иначе заменяет ее (import_csv);
+        Если клиент разорвал подключение до конца передачи, импорт не выполняется"""
+        remaining = request.content_length
+        fd, filename = tempfile.mkstemp(suffix='.csv')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                while remaining:
+                    chunk = await reader.read(min(remaining, TRANSFER_CHUNK_BYTES))
+                    if not chunk:
+                        raise asyncio.IncompleteReadError(b'', remaining)
+                    file.write(chunk)
+                    remaining -= len(chunk)
+            method = 'merge_csv' if request.query.get('merge') == '1' else 'import_csv'
+            report, changes = await self._write(user_id, method, filename)
+        finally:
+            os.remove(filename)
+        return json_response({'result': report, 'changes': changes})
+
+    async def export_csv(self, user_id: int) -> Response:
+        """Экспорт во временный файл в потоке чтения; файл отправляется клиенту и удаляется"""
+        fd, filename = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            await self._in_reader(self._read, user_id, self.versions.get(user_id, 0), 'export_csv', [filename], {})
+        except BaseException:
+            os.remove(filename)
+            raise
+        return Response(HTTPStatus.OK, {'Content-Type': 'text/csv; charset=utf-8'}, file=filename)
+
+    async def maintenance(self) -> Response:
+        """Обслуживание базы данных выполняет поток записи вне транзакций групповой фиксации"""
+        report = await asyncio.wrap_future(self.writer.submit(lambda session: run_maintenance(self.engine),
+                                                              exclusive=True))
+        return json_response({'result': report})
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f'Сервер библиотеки: http://{host}:{port}', flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='0 - любой свободный порт')
+    parser.add_argument('--database', default=DATABASE_PATH, help='файл базы данных')
+    parser.add_argument('--readers', type=int, default=READER_THREADS, help='количество потоков чтения')
+    parser.add_argument('--max-batch', type=int, default=GROUP_COMMIT_MAX_REQUESTS,
+                        help='сколько изменений может войти в одну транзакцию (1 - без групповой фиксации)')
+    parser.add_argument('--admin-token', default=os.environ.get(ADMIN_TOKEN_ENV),
+                        help=f'ключ администратора для обслуживания базы данных (по умолчанию {ADMIN_TOKEN_ENV}); '
+                             'без ключа обслуживание через сервер отключено')
+    args = parser.parse_args()
+
+    library_server = LibraryServer(f'sqlite:///{args.database}', args.readers, args.max_batch, args.admin_token)
+    try:
+        asyncio.run(library_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        library_server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
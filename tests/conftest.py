@@ -0,0 +1,61 @@
+"""Общие фикстуры тестов: каждый тест получает свой файл базы данных SQLite во временном каталоге,
+созданный миграциями с нуля"""
+import pytest
+
+
+@pytest.fixture
+def database_path(tmp_path) -> str:
+    """Путь к новому файлу базы данных со схемой последней версии"""
+    from database.migrations import migrate
+    from database.session import create_database_engine
+
+    path = str(tmp_path / 'library.sqlite')
+    engine = create_database_engine(f'sqlite:///{path}')
+    migrate(engine)
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def engine(database_path):
+    from database.session import create_database_engine
+
+    engine = create_database_engine(f'sqlite:///{database_path}')
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_manager(engine):
+    from database.session import DatabaseSessionManager
+
+    return DatabaseSessionManager(engine)
+
+
+@pytest.fixture
+def make_user(database_path):
+    """Функция, регистрирующая пользователя и возвращающая его ИД"""
+    from database.startup import add_user
+
+    def make(username: str, password: str = 'password') -> int:
+        return add_user(username, password, database_path)
+    return make
+
+
+@pytest.fixture
+def make_manager(session_manager, make_user):
+    """Функция, возвращающая UserDatabaseManager нового пользователя; кэш результатов поиска отключен,
+    так как тесты проверяют и изменения, сделанные другими менеджерами"""
+    from UserDatabaseManager import UserDatabaseManager
+
+    managers = []
+
+    def make(username: str):
+        manager = UserDatabaseManager(make_user(username), session_manager)
+        manager.search_cache.max_rows = 0
+        managers.append(manager)
+        return manager
+    yield make
+    for manager in managers:
+        manager.close()
+
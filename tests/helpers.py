@@ -0,0 +1,19 @@
+"""Вспомогательные функции тестов"""
+import csv
+from typing import Iterable
+
+
+def write_csv(path, rows: Iterable[tuple[str, str, str, str]]) -> str:
+    """Файл csv в формате экспорта"""
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(('Book', 'Author', 'Genre', 'Status'))
+        writer.writerows(rows)
+    return str(path)
+
+
+def library(manager) -> list[tuple]:
+    """Книги пользователя без ИД в порядке названий: (название, автор, жанр, статус);
+    Открытая транзакция чтения завершается, чтобы увидеть изменения других подключений"""
+    manager.end_unit_of_work()
+    return sorted(tuple(book[1:]) for book in manager.search_books())
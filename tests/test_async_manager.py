@@ -0,0 +1,100 @@
+"""AsyncUserDatabaseManager: те же результаты, что у UserDatabaseManager, и импорт csv не блокирует цикл событий"""
+import asyncio
+import time
+
+from AsyncUserDatabaseManager import AsyncUserDatabaseManager
+from database.session import AsyncDatabaseSessionManager, create_async_database_engine
+from tests.helpers import library, write_csv
+from UserDatabaseManager import CatalogChange
+
+BOOKS = [(f'книга {number}', f'автор {number % 7}', f'жанр {number % 3}', 'В планах') for number in range(300)]
+
+
+def run_async(database_path: str, user_id: int, coroutine_function):
+    """Выполнение coroutine_function(manager) с асинхронным движком на файле database_path"""
+    async def main():
+        engine = create_async_database_engine(f'sqlite+aiosqlite:///{database_path}')
+        try:
+            return await coroutine_function(AsyncUserDatabaseManager(user_id, AsyncDatabaseSessionManager(engine)))
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+def test_import_and_export_match_sync_manager(database_path, make_manager, tmp_path):
+    source = write_csv(tmp_path / 'books.csv', BOOKS)
+    manager = make_manager('ivan')
+    target = str(tmp_path / 'export.csv')
+
+    async def scenario(async_manager: AsyncUserDatabaseManager):
+        report = await async_manager.import_csv(source, chunk_rows=50)
+        exported = await async_manager.export_csv(target, chunk_size=40)
+        return report, exported
+
+    report, exported = run_async(database_path, manager.user_id, scenario)
+
+    assert (report.rows, report.inserted, report.deleted) == (len(BOOKS), len(BOOKS), 0)
+    assert exported
+    assert library(manager) == sorted(BOOKS)
+    check = make_manager('petr')
+    check.import_csv(target)
+    assert library(check) == sorted(BOOKS)
+
+
+def test_merge_writes_only_difference_and_notifies(database_path, make_manager, tmp_path):
+    manager = make_manager('ivan')
+    manager.import_csv(write_csv(tmp_path / 'books.csv', BOOKS))
+    ids_before = {book[1]: book[0] for book in manager.search_books()}
+    changed = [('книга 0', 'автор 0', 'жанр 0', 'Прочитано'), *BOOKS[1:-1],
+               ('новая', 'новый автор', 'жанр 1', 'Читается')]
+    changes: list[CatalogChange] = []
+
+    async def scenario(async_manager: AsyncUserDatabaseManager):
+        async_manager.add_change_listener(changes.append)
+        return await async_manager.merge_csv(write_csv(tmp_path / 'changed.csv', changed))
+
+    report = run_async(database_path, manager.user_id, scenario)
+
+    assert (report.inserted, report.updated, report.deleted) == (1, 1, 1)
+    assert library(manager) == sorted(changed)
+    ids_after = {book[1]: book[0] for book in manager.search_books()}
+    assert all(ids_after[title] == ids_before[title] for title, *_ in changed[:-1])
+    assert [change.kind for change in changes] == ['author', 'books']
+
+
+def test_cancelled_import_keeps_library(database_path, make_manager, tmp_path):
+    manager = make_manager('ivan')
+    manager.import_csv(write_csv(tmp_path / 'books.csv', BOOKS[:10]))
+
+    async def scenario(async_manager: AsyncUserDatabaseManager):
+        return await async_manager.import_csv(write_csv(tmp_path / 'other.csv', BOOKS[100:]),
+                                              lambda *progress: False, chunk_rows=20)
+
+    assert run_async(database_path, manager.user_id, scenario) is None
+    assert library(manager) == sorted(BOOKS[:10])
+
+
+def test_import_does_not_block_event_loop(database_path, make_manager, tmp_path):
+    """Пока идет импорт большого файла, другие корутины продолжают выполняться: самая длинная пауза цикла
+    событий намного короче всего импорта"""
+    manager = make_manager('ivan')
+    books = [(f'книга {number}', f'автор {number % 500}', f'жанр {number % 20}', 'В планах')
+             for number in range(30000)]
+    source = write_csv(tmp_path / 'large.csv', books)
+
+    async def scenario(async_manager: AsyncUserDatabaseManager):
+        gaps = []
+        importing = asyncio.ensure_future(async_manager.import_csv(source, chunk_rows=1000))
+        started = last = time.perf_counter()
+        while not importing.done():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+        await importing
+        return max(gaps), time.perf_counter() - started
+
+    longest_gap, total = run_async(database_path, manager.user_id, scenario)
+
+    assert longest_gap < total / 4
+    assert len(manager.search_books()) == len(books)
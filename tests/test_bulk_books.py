@@ -0,0 +1,110 @@
+"""Пакетные изменение и удаление книг: изменяются только книги пользователя, а изменение каталога сообщает
+только действительно измененные или удаленные книги"""
+import pytest
+from UserDatabaseManager import CatalogChange, UserDatabaseManager, _MAX_QUERY_PARAMETERS
+
+from tests.helpers import library, write_csv
+
+BOOKS = [('дюна', 'фрэнк герберт', 'фантастика', 'В планах'),
+         ('солярис', 'станислав лем', 'фантастика', 'В планах'),
+         ('мастер и маргарита', 'михаил булгаков', 'роман', 'Читается')]
+
+
+@pytest.fixture
+def owner(make_manager, tmp_path) -> UserDatabaseManager:
+    owner = make_manager('ivan')
+    owner.import_csv(write_csv(tmp_path / 'ivan.csv', BOOKS))
+    return owner
+
+
+@pytest.fixture
+def stranger(make_manager, tmp_path) -> UserDatabaseManager:
+    stranger = make_manager('petr')
+    stranger.import_csv(write_csv(tmp_path / 'petr.csv', [('пикник на обочине', 'стругацкие', 'фантастика',
+                                                           'Прочитано')]))
+    return stranger
+
+
+def book_ids(manager: UserDatabaseManager) -> dict[str, int]:
+    manager.end_unit_of_work()
+    return {book[1]: book[0] for book in manager.search_books()}
+
+
+def changes(manager: UserDatabaseManager) -> list[CatalogChange]:
+    recorded = []
+    manager.add_change_listener(recorded.append)
+    return recorded
+
+
+def test_update_books_changes_status_of_all_books(owner):
+    ids = book_ids(owner)
+    recorded = changes(owner)
+    owner.update_books([ids['дюна'], ids['солярис']], status='Прочитано')
+
+    assert library(owner) == [('дюна', 'фрэнк герберт', 'фантастика', 'Прочитано'),
+                              ('мастер и маргарита', 'михаил булгаков', 'роман', 'Читается'),
+                              ('солярис', 'станислав лем', 'фантастика', 'Прочитано')]
+    [change] = recorded
+    assert change.kind == 'books'
+    assert sorted(change.removed_ids) == sorted((ids['дюна'], ids['солярис']))
+    assert {book[0]: book[4] for book in change.added} == {ids['дюна']: 'Прочитано', ids['солярис']: 'Прочитано'}
+
+
+def test_update_books_changes_author_and_genre(owner):
+    ids = book_ids(owner)
+    author_id = dict(owner.get_user_authors())['михаил булгаков']
+    genre_id = dict(owner.get_user_genres())['роман']
+    owner.update_books([ids['солярис']], author_id_book_fk=author_id, genre_id_book_fk=genre_id)
+
+    assert ('солярис', 'михаил булгаков', 'роман', 'В планах') in library(owner)
+
+
+def test_update_books_without_values_does_nothing(owner):
+    recorded = changes(owner)
+    owner.update_books(list(book_ids(owner).values()))
+    owner.update_books([], status='Прочитано')
+
+    assert recorded == []
+    assert library(owner) == sorted(BOOKS)
+
+
+def test_delete_books_removes_books(owner):
+    ids = book_ids(owner)
+    recorded = changes(owner)
+    owner.delete_books([ids['дюна'], ids['солярис']])
+
+    assert library(owner) == [('мастер и маргарита', 'михаил булгаков', 'роман', 'Читается')]
+    assert sorted(recorded[0].removed_ids) == sorted((ids['дюна'], ids['солярис']))
+
+
+def test_bulk_methods_split_ids_into_chunks(owner):
+    """ИД больше, чем параметров в одном запросе SQLite: несуществующие ИД пропускаются"""
+    ids = book_ids(owner)
+    missing = list(range(max(ids.values()) + 1, max(ids.values()) + 1 + _MAX_QUERY_PARAMETERS))
+    recorded = changes(owner)
+    owner.update_books(missing + [ids['дюна']], status='Прочитано')
+    owner.delete_books(missing + [ids['солярис']])
+
+    assert library(owner) == [('дюна', 'фрэнк герберт', 'фантастика', 'Прочитано'),
+                              ('мастер и маргарита', 'михаил булгаков', 'роман', 'Читается')]
+    assert [change.removed_ids for change in recorded] == [(ids['дюна'],), (ids['солярис'],)]
+
+
+def test_update_books_ignores_books_of_other_users(owner, stranger):
+    foreign_ids = list(book_ids(owner).values())
+    recorded = changes(stranger)
+    stranger.update_books(foreign_ids, status='Прочитано')
+
+    assert library(owner) == sorted(BOOKS)
+    assert recorded == [CatalogChange('books', added=(), removed_ids=())]
+
+
+def test_delete_books_ignores_books_of_other_users(owner, stranger):
+    foreign_ids = list(book_ids(owner).values())
+    own_id = book_ids(stranger)['пикник на обочине']
+    recorded = changes(stranger)
+    stranger.delete_books(foreign_ids + [own_id])
+
+    assert library(owner) == sorted(BOOKS)
+    assert library(stranger) == []
+    assert recorded == [CatalogChange('books', removed_ids=(own_id,))]
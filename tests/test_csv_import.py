@@ -0,0 +1,108 @@
+"""Импорт csv: кодировка, разделитель и столбцы определяются по файлу, строки с ошибками пропускаются
+и перечисляются в отчете с номерами строк"""
+import io
+
+import pytest
+from database.csv_import import CsvBookReader, CsvRowError, Prefetcher
+from UserDatabaseManager import CsvImportError
+
+from tests.helpers import library
+
+BOOKS = [('дюна', 'фрэнк герберт', 'фантастика', 'Прочитано'),
+         ('солярис', 'станислав лем', 'фантастика', 'В планах'),
+         ('мастер и маргарита', 'михаил булгаков', 'роман', 'Читается')]
+
+
+def write_text(path, lines: list[list[str]], delimiter: str = ',', encoding: str = 'utf-8') -> str:
+    with open(path, 'w', encoding=encoding, newline='') as file:
+        file.write(''.join(delimiter.join(line) + '\r\n' for line in lines))
+    return str(path)
+
+
+@pytest.mark.parametrize('encoding, detected', [('utf-8', 'utf-8'), ('utf-8-sig', 'utf-8-sig'),
+                                                ('cp1251', 'cp1251'), ('utf-16', 'utf-16')])
+@pytest.mark.parametrize('delimiter', [',', ';', '\t', '|'])
+def test_detects_encoding_and_delimiter(make_manager, tmp_path, encoding, detected, delimiter):
+    manager = make_manager('ivan')
+    path = write_text(tmp_path / 'books.csv', [['Book', 'Author', 'Genre', 'Status'], *map(list, BOOKS)],
+                      delimiter, encoding)
+
+    report = manager.import_csv(path)
+
+    assert (report.encoding, report.delimiter) == (detected, delimiter)
+    assert (report.rows, report.skipped) == (len(BOOKS), 0)
+    assert library(manager) == sorted(BOOKS)
+
+
+def test_russian_header_in_any_column_order(make_manager, tmp_path):
+    manager = make_manager('ivan')
+    path = write_text(tmp_path / 'books.csv', [['Статус', 'Жанр', 'Название', 'Автор'],
+                                               *([status, genre, title, author] for title, author, genre, status
+                                                 in BOOKS)], ';')
+
+    manager.import_csv(path)
+
+    assert library(manager) == sorted(BOOKS)
+
+
+def test_file_without_header_in_export_order(make_manager, tmp_path):
+    manager = make_manager('ivan')
+    path = write_text(tmp_path / 'books.csv', [list(book) for book in BOOKS])
+
+    report = manager.import_csv(path)
+
+    assert report.rows == len(BOOKS)
+    assert library(manager) == sorted(BOOKS)
+
+
+def test_bad_rows_are_skipped_with_line_numbers(make_manager, tmp_path):
+    manager = make_manager('ivan')
+    path = write_text(tmp_path / 'books.csv', [['Book', 'Author', 'Genre', 'Status'],
+                                               list(BOOKS[0]),
+                                               ['пикник на обочине', 'стругацкие', 'фантастика'],
+                                               ['', 'станислав лем', 'фантастика', 'Прочитано'],
+                                               ['непобедимый', 'станислав лем', 'фантастика', 'Отложено'],
+                                               [' Солярис ', 'Станислав Лем', 'фантастика', 'в планах']])
+
+    report = manager.import_csv(path, chunk_rows=2)
+
+    assert (report.rows, report.skipped) == (2, 3)
+    assert [error.line for error in report.errors] == [3, 4, 5]
+    assert 'Отложено' in report.errors[2].message
+    assert library(manager) == sorted(BOOKS[:2])
+
+
+def test_missing_column_keeps_library(make_manager, tmp_path):
+    manager = make_manager('ivan')
+    manager.import_csv(write_text(tmp_path / 'books.csv', [list(book) for book in BOOKS]))
+
+    with pytest.raises(CsvImportError, match='Status'):
+        manager.import_csv(write_text(tmp_path / 'broken.csv', [['Book', 'Author', 'Genre'],
+                                                                ['дюна', 'фрэнк герберт', 'фантастика']]))
+    assert library(manager) == sorted(BOOKS)
+
+
+def test_reads_binary_stream_in_chunks():
+    lines = [['Book', 'Author', 'Genre', 'Status']] + [[f'книга {number}', 'автор', 'жанр', 'Прочитано']
+                                                       for number in range(25)] + [['без статуса', 'автор', 'жанр']]
+    stream = io.BytesIO(''.join(','.join(line) + '\n' for line in lines).encode('utf-8'))
+    reader = CsvBookReader(stream, chunk_rows=10)
+
+    chunks = list(reader.chunks())
+
+    assert reader.total_bytes == 0
+    assert [len(chunk.records) for chunk in chunks] == [10, 10, 5]
+    assert chunks[-1].errors == [CsvRowError(27, 'ожидается 4 полей, получено 3')]
+    assert chunks[-1].rows_read == 26
+
+
+def test_prefetcher_passes_errors_to_consumer():
+    def items():
+        yield 1
+        raise ValueError('ошибка чтения')
+
+    with Prefetcher(items()) as prefetched:
+        iterator = iter(prefetched)
+        assert next(iterator) == 1
+        with pytest.raises(ValueError, match='ошибка чтения'):
+            next(iterator)
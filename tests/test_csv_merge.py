@@ -0,0 +1,98 @@
+"""Импорт слиянием: записывается только разница между файлом и библиотекой, неизменные книги сохраняют ИД"""
+import UserDatabaseManager as user_database_manager
+import pytest
+from database.csv_merge import CsvMergeDiff
+
+from tests.helpers import library, write_csv
+
+BOOKS = [('дюна', 'фрэнк герберт', 'фантастика', 'Прочитано'),
+         ('дюна', 'фрэнк герберт', 'фантастика', 'Прочитано'),
+         ('солярис', 'станислав лем', 'фантастика', 'Читается'),
+         ('мастер и маргарита', 'михаил булгаков', 'роман', 'В планах')]
+
+
+@pytest.fixture
+def manager(make_manager, tmp_path):
+    manager = make_manager('ivan')
+    manager.import_csv(write_csv(tmp_path / 'books.csv', BOOKS))
+    return manager
+
+
+def book_ids(manager) -> dict[tuple, list[int]]:
+    """ИД книг по (название, автор, жанр, статус)"""
+    manager.end_unit_of_work()
+    result = {}
+    for book_id, *book in manager.search_books():
+        result.setdefault(tuple(book), []).append(book_id)
+    return result
+
+
+def counts(report) -> tuple[int, int, int]:
+    return report.inserted, report.updated, report.deleted
+
+
+def test_merging_exported_file_changes_nothing(manager, tmp_path):
+    before = book_ids(manager)
+    manager.export_csv(str(tmp_path / 'export.csv'))
+
+    report = manager.merge_csv(str(tmp_path / 'export.csv'))
+
+    assert counts(report) == (0, 0, 0) and report.rows == len(BOOKS)
+    assert book_ids(manager) == before
+
+
+def test_titles_are_compared_normalized(manager, tmp_path):
+    before = book_ids(manager)
+    rows = [(f'  {title.upper()} ', author.title(), genre, status) for title, author, genre, status in BOOKS]
+
+    assert counts(manager.merge_csv(write_csv(tmp_path / 'upper.csv', rows))) == (0, 0, 0)
+    assert book_ids(manager) == before
+
+
+def test_merge_writes_difference_and_keeps_ids(manager, tmp_path):
+    before = book_ids(manager)
+    rows = [('дюна', 'фрэнк герберт', 'фантастика', 'Читается'), BOOKS[2], BOOKS[2],
+            ('пикник на обочине', 'стругацкие', 'фантастика', 'В планах')]
+
+    report = manager.merge_csv(write_csv(tmp_path / 'changed.csv', rows))
+
+    # Из двух одинаковых книг одна меняет статус, другая удаляется; солярис добавляется второй раз
+    assert counts(report) == (2, 1, 2)
+    assert library(manager) == sorted(rows)
+    after = book_ids(manager)
+    assert after[rows[0]][0] in before[BOOKS[0]]
+    assert before[BOOKS[2]][0] in after[BOOKS[2]]
+    assert dict(manager.get_user_authors()).keys() == {'фрэнк герберт', 'станислав лем', 'стругацкие'}
+    assert dict(manager.get_user_genres()).keys() == {'фантастика'}
+
+
+def test_merge_notifies_changed_books_or_reset(manager, tmp_path, monkeypatch):
+    changes = []
+    manager.add_change_listener(changes.append)
+    rows = [*BOOKS[:3], ('мастер и маргарита', 'михаил булгаков', 'роман', 'Прочитано')]
+
+    manager.merge_csv(write_csv(tmp_path / 'one.csv', rows))
+    (change,) = changes
+    assert change.kind == 'books' and change.removed_ids == tuple(book_ids(manager)[rows[3]])
+    assert [book[4] for book in change.added] == ['Прочитано']
+
+    changes.clear()
+    monkeypatch.setattr(user_database_manager, 'MERGE_NOTIFY_MAX_BOOKS', 0)
+    manager.merge_csv(write_csv(tmp_path / 'two.csv', BOOKS))
+    assert [change.kind for change in changes] == ['reset']
+
+
+def test_diff_matches_duplicates_by_count(manager):
+    manager.end_unit_of_work()
+    diff = CsvMergeDiff(manager._select_user_books(chunk_rows=2))
+    # Строки с другим статусом сопоставляются после всего файла: книга с тем же статусом найдется позже
+    diff.add([('дюна', 'фрэнк герберт', 'фантастика', 'В планах'), ('дюна', 'фрэнк герберт', 'фантастика', 'Читается')])
+    diff.add([BOOKS[0], BOOKS[3]])
+
+    delta = diff.delta()
+
+    dune_ids = book_ids(manager)[BOOKS[0]]
+    assert delta.inserts == [('дюна', 'фрэнк герберт', 'фантастика', 'Читается')]
+    assert list(delta.updates) == ['В планах'] and len(delta.updates['В планах']) == 1
+    assert delta.updates['В планах'][0] in dune_ids
+    assert delta.deletes == book_ids(manager)[BOOKS[2]]
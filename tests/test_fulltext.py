@@ -0,0 +1,75 @@
+"""Полнотекстовый поиск: совпадение проверки названий в памяти с индексом FTS5 и замена ё на е"""
+import sqlite3
+from contextlib import closing
+
+import pytest
+from database.fulltext import is_refinement, title_matcher
+from database.migrations import migrate
+from database.session import create_database_engine
+
+TITLES = ('ёлка и палка', 'елки-палки', 'café au lait', 'naïve art', 'йод', 'иод', 'łódź', 'зелёный дом',
+          'дом у дороги', 'domain')
+TERMS = ('елк', 'ёлк', 'ёлка', 'палк', 'cafe', 'café', 'naive', 'йод', 'иод', 'łod', 'lod', 'зеленый', 'дом',
+         'дом дор', 'dom')
+
+
+@pytest.fixture
+def manager(make_manager):
+    manager = make_manager('ivan')
+    manager.add_author('автор')
+    manager.add_genre('жанр')
+    (_, author_id), = manager.get_user_authors()
+    (_, genre_id), = manager.get_user_genres()
+    for title in TITLES:
+        manager.add_book(title, author_id, genre_id, 'Прочитано')
+    return manager
+
+
+@pytest.mark.parametrize('term', TERMS)
+def test_matcher_agrees_with_index(manager, term):
+    found = sorted(book[1] for book in manager.search_books(term))
+    matches = title_matcher(term)
+
+    assert found == sorted(title for title in TITLES if matches(title))
+
+
+def test_yo_is_searched_as_ye(manager):
+    assert {book[1] for book in manager.search_books('елка')} == {'ёлка и палка'}
+    assert {book[1] for book in manager.search_books('ЁЛКИ')} == {'елки-палки'}
+    assert {book[1] for book in manager.search_books('йод')} == {'йод'}
+
+
+def test_edited_and_deleted_titles_leave_index(manager):
+    (_, author_id), = manager.get_user_authors()
+    (_, genre_id), = manager.get_user_genres()
+    book_id = manager.search_books('ёлка')[0][0]
+    manager.edit_book(book_id, 'ёжик', author_id, genre_id, 'Прочитано')
+    assert [book[0] for book in manager.search_books('ежик')] == [book_id]
+    assert not manager.search_books('елка')
+
+    manager.delete_book(book_id)
+    assert not manager.search_books('ежик')
+
+
+def test_short_search_is_not_refined_into_fulltext():
+    assert not is_refinement('ел', 'елк')
+    assert is_refinement('елк', 'елка')
+    assert is_refinement('е', 'ел')
+
+
+def test_schema_upgrade_reindexes_titles(manager, database_path):
+    manager.end_unit_of_work()
+    with closing(sqlite3.connect(database_path)) as connection, connection:
+        # Индекс до замены ё: названия как в таблице books
+        connection.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+        connection.execute('PRAGMA user_version = 6')
+    assert not manager.search_books('елка')
+
+    engine = create_database_engine(f'sqlite:///{database_path}')
+    try:
+        migrate(engine)
+    finally:
+        engine.dispose()
+
+    manager.end_unit_of_work()
+    assert {book[1] for book in manager.search_books('елка')} == {'ёлка и палка'}
@@ -0,0 +1,115 @@
+"""Групповая фиксация: запросы пакета выполняются в своих точках сохранения одной транзакции"""
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import closing
+
+import pytest
+from database.group_commit import GroupCommitWriter, create_writer_engine
+from database.models import Genre
+from server import GroupCommitManager
+from sqlalchemy import insert
+
+from tests.helpers import library, write_csv
+
+BOOKS = [(f'книга {number}', f'автор {number % 5}', 'жанр', 'Прочитано') for number in range(100)]
+
+
+@pytest.fixture
+def writer(database_path):
+    writer = GroupCommitWriter(create_writer_engine(f'sqlite:///{database_path}'))
+    yield writer
+    writer.close()
+
+
+def submit(writer: GroupCommitWriter, user_id: int, method: str, *args, **kwargs):
+    """Метод GroupCommitManager в потоке записи"""
+    def call(session):
+        return getattr(GroupCommitManager(user_id, session, lambda change: None), method)(*args, **kwargs)
+    return writer.submit(call, user_id)
+
+
+def genres(database_path) -> list[str]:
+    with closing(sqlite3.connect(database_path)) as connection:
+        return [title for title, in connection.execute('SELECT title FROM genres ORDER BY title')]
+
+
+def hold(writer: GroupCommitWriter) -> threading.Event:
+    """Занимает поток записи до установки события: запросы, поставленные за это время, войдут в один пакет"""
+    started, release = threading.Event(), threading.Event()
+
+    def wait(session):
+        started.set()
+        release.wait()
+
+    writer.submit(wait)
+    started.wait()
+    return release
+
+
+def add_genre(title: str):
+    return lambda session: session.execute(insert(Genre).values(title=title))
+
+
+def fail_after_write(session):
+    session.execute(insert(Genre).values(title='сбой'))
+    raise ValueError('сбой запроса')
+
+
+def test_failed_request_is_rolled_back_alone(writer, database_path):
+    release = hold(writer)
+    futures = [writer.submit(add_genre('а')), writer.submit(fail_after_write), writer.submit(add_genre('б'))]
+    release.set()
+
+    with pytest.raises(ValueError):
+        futures[1].result()
+    futures[2].result()
+    assert genres(database_path) == ['а', 'б']
+    stats = writer.stats()
+    assert (stats.batches, stats.requests, stats.failed) == (2, 3, 1)
+
+
+def test_results_are_published_after_commit(database_path):
+    futures: list[Future] = []
+    seen = []
+
+    def on_committed(user_ids: set[int]):
+        # Вызывается до передачи результатов: изменения уже видны другим подключениям
+        seen.append((user_ids, genres(database_path), [future.done() for future in futures]))
+
+    writer = GroupCommitWriter(create_writer_engine(f'sqlite:///{database_path}'), on_committed)
+    try:
+        release = hold(writer)
+        futures.extend(writer.submit(add_genre(title), user_id) for user_id, title in ((1, 'а'), (2, 'б')))
+        release.set()
+        [future.result() for future in futures]
+    finally:
+        writer.close()
+
+    assert seen == [({1, 2}, ['а', 'б'], [False, False])]
+
+
+def test_exclusive_request_runs_after_pending_batch_outside_transaction(writer, database_path):
+    release = hold(writer)
+    writer.submit(add_genre('а'))
+    exclusive = writer.submit(lambda session: (session.in_transaction(), genres(database_path)), exclusive=True)
+    release.set()
+
+    assert exclusive.result() == (False, ['а'])
+
+
+@pytest.mark.parametrize('method', ['import_csv', 'merge_csv'])
+def test_cancelled_import_rolls_back_to_its_savepoint(writer, make_manager, database_path, tmp_path, method):
+    manager = make_manager('ivan')
+    manager.import_csv(write_csv(tmp_path / 'books.csv', BOOKS[:10]))
+    before = library(manager)
+    other = write_csv(tmp_path / 'other.csv', [(title, author, 'другой жанр', status)
+                                                 for title, author, _, status in BOOKS])
+
+    futures = [submit(writer, manager.user_id, 'add_genre', 'до'),
+               submit(writer, manager.user_id, method, other, lambda *progress: False, chunk_rows=10),
+               submit(writer, manager.user_id, 'add_genre', 'после')]
+
+    assert [future.result() for future in futures] == [None, None, None]
+    assert library(manager) == before
+    assert genres(database_path) == ['до', 'жанр', 'после']
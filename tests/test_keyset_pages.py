@@ -0,0 +1,71 @@
+"""Постраничный поиск по позиции (keyset): страницы, пройденные по continuation, совпадают с полным результатом
+и не сдвигаются при добавлении и удалении книг"""
+import pytest
+from UserDatabaseManager import RELEVANCE_SORT, SearchPage, UserDatabaseManager
+
+from tests.helpers import write_csv
+
+# Повторяющиеся названия и авторы: порядок внутри одинаковых ключей сортировки задает ИД
+BOOKS = [(f'книга {number % 7}', f'автор {number % 3}', f'жанр {number % 4}', 'Прочитано') for number in range(40)]
+
+
+@pytest.fixture
+def manager(make_manager, tmp_path):
+    manager = make_manager('ivan')
+    manager.import_csv(write_csv(tmp_path / 'books.csv', BOOKS))
+    return manager
+
+
+def all_pages(fetch, limit: int) -> list[SearchPage]:
+    pages = [fetch(after=None, limit=limit)]
+    while pages[-1].continuation is not None:
+        pages.append(fetch(after=pages[-1].continuation, limit=limit))
+    return pages
+
+
+@pytest.mark.parametrize('title, sort_by', [(None, 'Названию'), (None, 'Автору'), ('книга', RELEVANCE_SORT),
+                                            ('кн', None)])
+@pytest.mark.parametrize('limit', [1, 6, 40, 100])
+def test_pages_concatenate_to_full_result(manager, title, sort_by, limit):
+    pages = all_pages(lambda **page: manager.search_books_page(title, sort_by=sort_by, **page), limit)
+
+    assert [book for page in pages for book in page.rows] == list(manager.search_books(title, sort_by=sort_by))
+    assert all(len(page.rows) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1].rows) <= limit
+
+
+def test_changes_before_position_do_not_shift_next_page(manager):
+    first = manager.search_books_page(sort_by='Названию', limit=10)
+    (_, author_id), *_ = manager.get_user_authors()
+    (_, genre_id), *_ = manager.get_user_genres()
+    manager.delete_books([first.rows[0][0], first.rows[5][0]])
+    manager.add_book('а первая', author_id, genre_id, 'В планах')
+    manager.add_book('я последняя', author_id, genre_id, 'В планах')
+
+    second = manager.search_books_page(sort_by='Названию', after=first.continuation, limit=10)
+
+    books = list(manager.search_books(sort_by='Названию'))
+    position = books.index(next(book for book in books if book[0] == first.rows[-1][0]))
+    assert list(second.rows) == books[position + 1:position + 11]
+
+
+def test_titles_pages_follow_continuation(manager):
+    for search_page, search in ((manager.search_genres_page, manager.search_genres),
+                                (manager.search_authors_page, manager.search_authors)):
+        pages = all_pages(lambda **page: search_page('', **page), 2)
+        assert [row for page in pages for row in page.rows] == list(search(''))
+
+
+def test_continuation_is_only_a_position(manager, make_manager, tmp_path):
+    # Позиция из результата другого пользователя не открывает доступ к чужим книгам
+    other = make_manager('petr')
+    other.import_csv(write_csv(tmp_path / 'other.csv', BOOKS[:3]))
+    page = manager.search_books_page(limit=5)
+
+    other_page = other.search_books_page(after=page.continuation, limit=5)
+    assert set(other_page.rows) <= set(other.search_books())
+    assert not {book[0] for book in other.search_books()} & {book[0] for book in manager.search_books()}
+
+
+def test_last_page_of_exact_size_has_no_continuation(manager: UserDatabaseManager):
+    assert manager.search_books_page(limit=len(BOOKS)).continuation is None
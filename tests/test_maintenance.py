@@ -0,0 +1,64 @@
+"""Обслуживание базы данных: удаляются только жанры и авторы, которые не использует ни один пользователь,
+а каждый запуск записывается в maintenance_runs"""
+from sqlalchemy import func, select
+
+from database.maintenance import run_maintenance
+from database.models import Author, Genre, MaintenanceRun
+from tests.helpers import library, write_csv
+
+IVAN_BOOKS = [('дюна', 'фрэнк герберт', 'фантастика', 'Прочитано'),
+              ('солярис', 'станислав лем', 'фантастика', 'В планах'),
+              ('мастер и маргарита', 'михаил булгаков', 'роман', 'Читается'),
+              ('дом, в котором', 'мариам петросян', 'драма', 'Прочитано')]
+PETR_BOOKS = [('непобедимый', 'станислав лем', 'фантастика', 'Прочитано')]
+
+
+def titles(engine, model) -> set[str]:
+    with engine.connect() as connection:
+        return set(connection.execute(select(model.title)).scalars())
+
+
+def test_deletes_only_unused_genres_and_authors(engine, make_manager, tmp_path):
+    ivan, petr = make_manager('ivan'), make_manager('petr')
+    ivan.import_csv(write_csv(tmp_path / 'ivan.csv', IVAN_BOOKS))
+    petr.import_csv(write_csv(tmp_path / 'petr.csv', PETR_BOOKS))
+    ivan.clear_all_user_data()
+
+    report = run_maintenance(engine, batch_size=2)
+
+    assert (report.genres, report.authors) == (2, 3)
+    assert report.seconds >= 0 and report.bytes_after > 0
+    assert titles(engine, Genre) == {'фантастика'}
+    assert titles(engine, Author) == {'станислав лем'}
+    assert library(petr) == sorted(PETR_BOOKS)
+
+
+def test_keeps_genre_another_user_still_has(engine, make_manager, tmp_path):
+    """Жанр, удаленный из списка одного пользователя, остается, пока он есть у другого пользователя"""
+    ivan, petr = make_manager('ivan'), make_manager('petr')
+    ivan.import_csv(write_csv(tmp_path / 'ivan.csv', IVAN_BOOKS[:1]))
+    petr.add_genre('фантастика')
+    genre_id = dict(petr.get_user_genres())['фантастика']
+    petr.delete_genre(genre_id)
+
+    report = run_maintenance(engine)
+
+    assert report.rows == 0
+    assert titles(engine, Genre) == {'фантастика'}
+    assert library(ivan) == sorted(IVAN_BOOKS[:1])
+
+
+def test_each_run_is_recorded(engine, make_manager, tmp_path):
+    manager = make_manager('ivan')
+    manager.import_csv(write_csv(tmp_path / 'ivan.csv', IVAN_BOOKS))
+    manager.clear_all_user_data()
+
+    first = manager.run_maintenance()
+    second = manager.run_maintenance()
+
+    assert (first.rows, second.rows) == (7, 0)
+    with engine.connect() as connection:
+        runs = connection.execute(select(MaintenanceRun.genres, MaintenanceRun.authors).order_by(
+            MaintenanceRun.RunId)).all()
+        assert [tuple(run) for run in runs] == [(3, 4), (0, 0)]
+        assert connection.execute(select(func.count()).select_from(Genre)).scalar() == 0
@@ -0,0 +1,50 @@
+"""Хэширование паролей, пересчет устаревших хэшей при входе и миграция паролей открытым текстом"""
+import sqlite3
+from contextlib import closing
+
+from database.migrations import migrate
+from database.passwords import PARAMETERS, ScryptParameters, hash_password, is_hashed, needs_rehash, verify_password
+from database.session import create_database_engine
+from database.startup import SCHEMA_VERSION, add_user, authenticate, find_user, read_schema_version
+
+
+def test_hash_is_salted_and_verified():
+    first, second = hash_password('секрет'), hash_password('секрет')
+
+    assert first != second
+    assert is_hashed(first) and not needs_rehash(first)
+    assert verify_password('секрет', first) and verify_password('секрет', second)
+    assert not verify_password('секрет!', first)
+
+
+def test_login_rehashes_outdated_parameters(database_path):
+    user_id = add_user('ivan', 'password', database_path)
+    outdated = hash_password('password', ScryptParameters(n=2 ** 10))
+    with closing(sqlite3.connect(database_path)) as connection, connection:
+        connection.execute('UPDATE users SET password = ? WHERE UserId = ?', (outdated, user_id))
+
+    assert authenticate('ivan', 'wrong', database_path) is None
+    assert find_user('ivan', database_path)[1] == outdated
+    assert authenticate('ivan', 'password', database_path) == user_id
+    stored = find_user('ivan', database_path)[1]
+    assert stored != outdated and not needs_rehash(stored, PARAMETERS)
+
+
+def test_schema_upgrade_hashes_plaintext_passwords(database_path):
+    hashed_id = add_user('petr', 'password', database_path)
+    hashed = find_user('petr', database_path)[1]
+    with closing(sqlite3.connect(database_path)) as connection, connection:
+        connection.execute("INSERT INTO users (username, password) VALUES ('ivan', 'открытый')")
+        connection.execute('PRAGMA user_version = 5')
+
+    engine = create_database_engine(f'sqlite:///{database_path}')
+    try:
+        migrate(engine)
+    finally:
+        engine.dispose()
+
+    assert read_schema_version(database_path) == SCHEMA_VERSION
+    user_id, stored = find_user('ivan', database_path)
+    assert is_hashed(stored) and verify_password('открытый', stored)
+    assert find_user('petr', database_path) == (hashed_id, hashed)
+    assert authenticate('ivan', 'открытый', database_path) == user_id
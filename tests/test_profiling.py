@@ -0,0 +1,26 @@
+"""Профилирование запросов: запросы, завершившиеся ошибкой, не влияют на учет следующих запросов"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database.profiling import QueryProfiler
+
+
+def statements(profiler: QueryProfiler) -> dict[str, int]:
+    """Запрос -> количество выполнений по всем методам"""
+    return {statement: stats.calls
+            for method in profiler.methods.values() for statement, stats in method.items()}
+
+
+def test_failed_statement_does_not_affect_next_ones(engine):
+    profiler = QueryProfiler()
+    profiler.attach(engine)
+
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text('SELECT title FROM missing_table'))
+        connection.execute(text('SELECT 1 UNION ALL SELECT 2')).all()
+
+    assert statements(profiler) == {'SELECT 1 UNION ALL SELECT 2': 1}
+    assert all(stats.seconds < 1 for method in profiler.methods.values() for stats in method.values())
@@ -0,0 +1,133 @@
+"""Кэш результатов поиска книг: сбрасываются только результаты, которые изменение могло затронуть,
+а сужение строки поиска дает тот же результат, что и новый запрос"""
+import pytest
+from UserDatabaseManager import RELEVANCE_SORT, SEARCH_CACHE_MAX_ROWS, BookSearchFilter, UserDatabaseManager
+
+from tests.helpers import write_csv
+
+BOOKS = [('дюна', 'фрэнк герберт', 'фантастика', 'Прочитано'),
+         ('дети дюны', 'фрэнк герберт', 'фантастика', 'В планах'),
+         ('солярис', 'станислав лем', 'фантастика', 'Читается'),
+         ('дом, в котором', 'мариам петросян', 'драма', 'Прочитано'),
+         ('дом на набережной', 'юрий трифонов', 'драма', 'В планах'),
+         ('мастер и маргарита', 'михаил булгаков', 'роман', 'Прочитано')]
+FILTERS = [BookSearchFilter(None, None, 'фантастика', None, None),
+           BookSearchFilter(None, None, 'драма', None, None),
+           BookSearchFilter('дюн', None, None, None, None),
+           BookSearchFilter(None, None, None, 'В планах', None)]
+
+
+@pytest.fixture
+def manager(make_manager, tmp_path):
+    manager = make_manager('ivan')
+    manager.import_csv(write_csv(tmp_path / 'books.csv', BOOKS))
+    manager.search_cache.max_rows = SEARCH_CACHE_MAX_ROWS
+    return manager
+
+
+@pytest.fixture
+def uncached(manager, session_manager):
+    """Менеджер того же пользователя без кэша: результаты поиска прямо из базы данных"""
+    uncached = UserDatabaseManager(manager.user_id, session_manager)
+    uncached.search_cache.max_rows = 0
+    yield uncached
+    uncached.close()
+
+
+def ids(manager: UserDatabaseManager, book_filter: BookSearchFilter) -> list[int]:
+    return [book[0] for book in manager.search_books(*book_filter)]
+
+
+def fill_cache(manager: UserDatabaseManager) -> dict[BookSearchFilter, list[int]]:
+    return {book_filter: ids(manager, book_filter) for book_filter in FILTERS}
+
+
+def cached_filters(manager: UserDatabaseManager) -> set[BookSearchFilter]:
+    return {book_filter for book_filter in FILTERS if manager.search_cache.get(book_filter) is not None}
+
+
+def assert_fresh(manager: UserDatabaseManager, uncached: UserDatabaseManager):
+    uncached.end_unit_of_work()
+    for book_filter in FILTERS:
+        assert ids(manager, book_filter) == ids(uncached, book_filter), book_filter
+
+
+def catalog_ids(manager: UserDatabaseManager, author: str, genre: str) -> tuple[int, int]:
+    """ИД автора и жанра пользователя по названиям"""
+    return dict(manager.get_user_authors())[author], dict(manager.get_user_genres())[genre]
+
+
+def test_repeated_search_is_served_from_cache(manager):
+    first = manager.search_books(genre='фантастика')
+
+    assert manager.search_books(genre='фантастика') is first
+    assert manager.search_cache_stats().hits == 1
+
+
+def test_added_book_invalidates_only_matching_results(manager, uncached):
+    fill_cache(manager)
+    author_id, genre_id = catalog_ids(manager, 'фрэнк герберт', 'фантастика')
+
+    manager.add_book('бог-император дюны', author_id, genre_id, 'Читается')
+
+    assert cached_filters(manager) == {FILTERS[1], FILTERS[3]}
+    assert_fresh(manager, uncached)
+
+
+def test_edited_book_invalidates_old_and_new_results(manager, uncached):
+    fill_cache(manager)
+    book_id = ids(manager, FILTERS[1])[0]
+    author_id, genre_id = catalog_ids(manager, 'мариам петросян', 'драма')
+
+    manager.edit_book(book_id, 'дом, в котором', author_id, genre_id, 'В планах')
+
+    assert cached_filters(manager) == {FILTERS[0], FILTERS[2]}
+    assert_fresh(manager, uncached)
+
+
+def test_deleted_books_invalidate_results_containing_them(manager, uncached):
+    fill_cache(manager)
+
+    manager.delete_books(ids(manager, FILTERS[2]))
+
+    assert cached_filters(manager) == {FILTERS[1]}
+    assert_fresh(manager, uncached)
+
+
+def test_bulk_update_and_import_invalidate_results(manager, uncached, tmp_path):
+    fill_cache(manager)
+    manager.update_books(ids(manager, FILTERS[1]), status='Прочитано')
+    assert cached_filters(manager) == {FILTERS[0], FILTERS[2]}
+    assert_fresh(manager, uncached)
+
+    manager.import_csv(write_csv(tmp_path / 'other.csv', BOOKS[:2]))
+    assert manager.search_cache_stats().entries == 0
+    assert_fresh(manager, uncached)
+
+
+def test_cached_pages_are_invalidated(manager, uncached):
+    first = manager.search_books_page(genre='фантастика', limit=2)
+    author_id, genre_id = catalog_ids(manager, 'станислав лем', 'фантастика')
+
+    manager.add_book('астронавты', author_id, genre_id, 'В планах')
+
+    assert manager.search_books_page(genre='фантастика', limit=2) != first
+    assert manager.search_books_page(genre='фантастика', limit=2) == uncached.search_books_page(
+        genre='фантастика', limit=2)
+
+
+@pytest.mark.parametrize('previous, term', [('дом', 'дом н'), ('дюн', 'дюны'), ('м', 'ма'), (None, 'сол')])
+def test_narrowed_search_matches_new_query(manager, previous, term):
+    previous_filter = BookSearchFilter(previous, None, None, None, 'Названию')
+    book_filter = BookSearchFilter(term, None, None, None, 'Названию')
+    previous_books = manager.search_books(*previous_filter)
+
+    assert book_filter.narrows(previous_filter)
+    assert [book for book in previous_books if book_filter.matches(book)] == list(manager.search_books(*book_filter))
+
+
+@pytest.mark.parametrize('previous, term, sort_by', [('до', 'дом', None), ('дом', 'дом', RELEVANCE_SORT),
+                                                     ('дом', 'до', None)])
+def test_search_is_not_narrowed_when_result_may_grow_or_reorder(previous, term, sort_by):
+    assert not BookSearchFilter(term, None, None, None, sort_by).narrows(
+        BookSearchFilter(previous, None, None, None, sort_by))
@@ -0,0 +1,136 @@
+"""Сервер библиотеки: пользователь видит и изменяет только свои книги, обслуживание - только с ключом
+администратора"""
+import asyncio
+import threading
+
+import pytest
+from LibraryClient import ADMIN_TOKEN_ENV, LibraryConnection, ServerError, login, register
+from RemoteUserDatabaseManager import RemoteUserDatabaseManager
+from server import LibraryServer
+from UserDatabaseManager import AuthorNotFoundError, BookNotFoundError, CatalogChange, GenreNotFoundError
+
+ADMIN_TOKEN = 'admin-secret'
+
+
+async def _shutdown(server: asyncio.Server):
+    """Остановка сервера и обработчиков еще открытых подключений"""
+    server.close()
+    handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for handler in handlers:
+        handler.cancel()
+    await asyncio.gather(*handlers, return_exceptions=True)
+    await server.wait_closed()
+
+
+@pytest.fixture
+def server_url(database_path):
+    """Сервер на свободном порту с циклом событий в отдельном потоке"""
+    library_server = LibraryServer(f'sqlite:///{database_path}', readers=2, admin_token=ADMIN_TOKEN)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(library_server.handle_connection, '127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, name='server', daemon=True)
+    thread.start()
+    host, port = server.sockets[0].getsockname()[:2]
+    yield f'{host}:{port}'
+    asyncio.run_coroutine_threadsafe(_shutdown(server), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    library_server.close()
+
+
+@pytest.fixture
+def make_remote(server_url):
+    """Функция, регистрирующая пользователя на сервере и возвращающая его RemoteUserDatabaseManager"""
+    connections = []
+
+    def make(username: str) -> RemoteUserDatabaseManager:
+        connection = register(server_url, username, 'password')
+        connections.append(connection)
+        return RemoteUserDatabaseManager(connection)
+    yield make
+    for connection in connections:
+        connection.close()
+
+
+def add_book(manager: RemoteUserDatabaseManager, title: str, author: str = 'автор', genre: str = 'жанр') -> tuple:
+    if author not in dict(manager.get_user_authors()):
+        manager.add_author(author)
+    if genre not in dict(manager.get_user_genres()):
+        manager.add_genre(genre)
+    author_id, genre_id = dict(manager.get_user_authors())[author], dict(manager.get_user_genres())[genre]
+    manager.add_book(title, author_id, genre_id, 'Прочитано')
+    (book,) = manager.search_books(title)
+    return book
+
+
+def test_second_user_cannot_fetch_or_change_anothers_book(make_remote):
+    owner, intruder = make_remote('ivan'), make_remote('petr')
+    book_id, *book = add_book(owner, 'дюна')
+    add_book(intruder, 'солярис')
+    author_id, genre_id = dict(intruder.get_user_authors())['автор'], dict(intruder.get_user_genres())['жанр']
+
+    assert owner.get_book(book_id) is not None
+    assert intruder.get_book(book_id) is None
+    with pytest.raises(BookNotFoundError):
+        intruder.edit_book(book_id, 'чужая', author_id, genre_id, 'В планах')
+    with pytest.raises(BookNotFoundError):
+        intruder.delete_book(book_id)
+    intruder.update_books([book_id], status='В планах')
+    intruder.delete_books([book_id])
+
+    assert [book_id, *book] == list(owner.search_books()[0])
+    assert book_id not in {row[0] for row in intruder.search_books()}
+
+
+def test_bulk_changes_skip_anothers_books(make_remote):
+    owner, intruder = make_remote('ivan'), make_remote('petr')
+    books = [add_book(owner, title, 'фрэнк герберт', 'фантастика') for title in ('дюна', 'дети дюны')]
+    own_book = add_book(intruder, 'солярис')
+    author_id, genre_id = dict(intruder.get_user_authors())['автор'], dict(intruder.get_user_genres())['жанр']
+    changes = []
+    intruder.add_change_listener(changes.append)
+
+    foreign_ids = [book[0] for book in books]
+    intruder.update_books(foreign_ids, status='В планах', author_id_book_fk=author_id, genre_id_book_fk=genre_id)
+    intruder.delete_books(foreign_ids + [own_book[0]])
+
+    assert changes == [CatalogChange('books', added=(), removed_ids=()),
+                       CatalogChange('books', removed_ids=(own_book[0],))]
+    assert sorted(owner.search_books()) == sorted(books)
+    assert intruder.search_books() == ()
+
+
+def test_second_user_cannot_read_anothers_genre_or_author(make_remote):
+    owner, intruder = make_remote('ivan'), make_remote('petr')
+    add_book(owner, 'дюна', 'фрэнк герберт', 'фантастика')
+    add_book(intruder, 'солярис')
+    author_id, genre_id = dict(owner.get_user_authors())['фрэнк герберт'], dict(owner.get_user_genres())['фантастика']
+
+    assert owner.get_author(author_id) == 'фрэнк герберт'
+    assert owner.get_genre(genre_id) == 'фантастика'
+    with pytest.raises(AuthorNotFoundError):
+        intruder.get_author(author_id)
+    with pytest.raises(GenreNotFoundError):
+        intruder.get_genre(genre_id)
+
+
+def test_requests_need_a_session_token(server_url, make_remote):
+    make_remote('ivan')
+
+    assert login(server_url, 'ivan', 'wrong') is None
+    with pytest.raises(ServerError) as error:
+        RemoteUserDatabaseManager(LibraryConnection(server_url, 'forged')).search_books()
+    assert error.value.status == 401
+
+
+def test_maintenance_needs_admin_token(make_remote, monkeypatch):
+    manager = make_remote('ivan')
+
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, 'wrong-secret')
+    with pytest.raises(ServerError) as error:
+        manager.run_maintenance()
+    assert error.value.status == 403
+
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, ADMIN_TOKEN)
+    assert manager.run_maintenance().seconds >= 0
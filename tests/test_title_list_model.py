@@ -0,0 +1,78 @@
+"""Общая модель жанров / авторов для выпадающих списков: названия по алфавиту, изменения каталога
+не сбрасывают выбранный элемент ни одного подключенного списка"""
+import os
+
+import pytest
+from CatalogCache import TitleCatalog
+from PyQt6.QtWidgets import QApplication, QComboBox
+from TitleListModel import TitleListModel, attach_title_combo_box
+
+GENRES = [('фантастика', 3), ('драма', 1), ('роман', 7)]
+
+
+@pytest.fixture(scope='module')
+def application() -> QApplication:
+    """Приложение без окон на экране"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def model(application) -> TitleListModel:
+    model = TitleListModel(TitleCatalog())
+    model.load(GENRES)
+    return model
+
+
+@pytest.fixture
+def combo_boxes(model):
+    combo_boxes = [QComboBox(), QComboBox()]
+    for combo_box in combo_boxes:
+        attach_title_combo_box(combo_box, model)
+    yield combo_boxes
+    for combo_box in combo_boxes:
+        combo_box.deleteLater()
+
+
+def titles(model: TitleListModel) -> list[str]:
+    return [model.index(row).data() for row in range(model.rowCount())]
+
+
+def test_titles_are_sorted(model):
+    assert titles(model) == ['драма', 'роман', 'фантастика']
+    assert (model.row('роман'), model.row('поэзия')) == (1, -1)
+    assert (model.item_id('фантастика'), model.item_id('поэзия')) == (3, None)
+
+
+def test_changes_keep_selection_of_every_combo_box(model, combo_boxes):
+    first, second = combo_boxes
+    first.setCurrentIndex(model.row('роман'))
+    second.setCurrentIndex(model.row('фантастика'))
+
+    model.add(10, 'детектив')
+    model.add(11, 'поэзия')
+    model.remove(1)
+    model.remove(100)
+
+    assert titles(model) == ['детектив', 'поэзия', 'роман', 'фантастика']
+    assert (first.currentText(), second.currentText()) == ('роман', 'фантастика')
+    assert [combo_box.count() for combo_box in combo_boxes] == [4, 4]
+
+
+def test_removing_selected_title_clears_only_that_combo_box(model, combo_boxes):
+    first, second = combo_boxes
+    first.setCurrentIndex(model.row('драма'))
+    second.setCurrentIndex(model.row('роман'))
+
+    model.remove(1)
+
+    assert first.currentText() != 'драма'
+    assert second.currentText() == 'роман'
+
+
+def test_completer_finds_titles_by_prefix_ignoring_case(model, combo_boxes):
+    completer = combo_boxes[0].completer()
+    completer.setCompletionPrefix('РО')
+
+    assert completer.currentCompletion() == 'роман'
+    assert completer.completionCount() == 1
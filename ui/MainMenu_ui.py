@@ -73,17 +73,15 @@ class Ui_MainWindow(object):
         self.list_table_stack.setObjectName("list_table_stack")
         self.listPage = QtWidgets.QWidget()
         self.listPage.setObjectName("listPage")
-        self.bookListWidget = QtWidgets.QListWidget(parent=self.listPage)
-        self.bookListWidget.setGeometry(QtCore.QRect(0, 10, 571, 311))
-        self.bookListWidget.setObjectName("bookListWidget")
+        self.bookListView = QtWidgets.QListView(parent=self.listPage)
+        self.bookListView.setGeometry(QtCore.QRect(0, 10, 571, 311))
+        self.bookListView.setObjectName("bookListView")
         self.list_table_stack.addWidget(self.listPage)
         self.tablePage = QtWidgets.QWidget()
         self.tablePage.setObjectName("tablePage")
-        self.bookTableWidget = QtWidgets.QTableWidget(parent=self.tablePage)
-        self.bookTableWidget.setGeometry(QtCore.QRect(0, 10, 571, 311))
-        self.bookTableWidget.setObjectName("bookTableWidget")
-        self.bookTableWidget.setColumnCount(0)
-        self.bookTableWidget.setRowCount(0)
+        self.bookTableView = QtWidgets.QTableView(parent=self.tablePage)
+        self.bookTableView.setGeometry(QtCore.QRect(0, 10, 571, 311))
+        self.bookTableView.setObjectName("bookTableView")
         self.list_table_stack.addWidget(self.tablePage)
         self.gridLayoutWidget_2 = QtWidgets.QWidget(parent=self.bookSearchingPage)
         self.gridLayoutWidget_2.setGeometry(QtCore.QRect(350, 0, 231, 101))
@@ -138,6 +136,39 @@ class Ui_MainWindow(object):
         self.label_4.setGeometry(QtCore.QRect(10, 10, 71, 21))
         self.label_4.setObjectName("label_4")
         self.stackedWidget.addWidget(self.authorSearchingPage)
+        self.statisticsPage = QtWidgets.QWidget()
+        self.statisticsPage.setObjectName("statisticsPage")
+        self.totalBooksLabel = QtWidgets.QLabel(parent=self.statisticsPage)
+        self.totalBooksLabel.setGeometry(QtCore.QRect(10, 10, 571, 22))
+        self.totalBooksLabel.setObjectName("totalBooksLabel")
+        self.statusStatisticsTable = QtWidgets.QTableWidget(parent=self.statisticsPage)
+        self.statusStatisticsTable.setGeometry(QtCore.QRect(10, 40, 571, 121))
+        self.statusStatisticsTable.setObjectName("statusStatisticsTable")
+        self.statusStatisticsTable.setColumnCount(2)
+        self.statusStatisticsTable.setRowCount(0)
+        item = QtWidgets.QTableWidgetItem()
+        self.statusStatisticsTable.setHorizontalHeaderItem(0, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.statusStatisticsTable.setHorizontalHeaderItem(1, item)
+        self.genreStatisticsTable = QtWidgets.QTableWidget(parent=self.statisticsPage)
+        self.genreStatisticsTable.setGeometry(QtCore.QRect(10, 170, 281, 341))
+        self.genreStatisticsTable.setObjectName("genreStatisticsTable")
+        self.genreStatisticsTable.setColumnCount(2)
+        self.genreStatisticsTable.setRowCount(0)
+        item = QtWidgets.QTableWidgetItem()
+        self.genreStatisticsTable.setHorizontalHeaderItem(0, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.genreStatisticsTable.setHorizontalHeaderItem(1, item)
+        self.authorStatisticsTable = QtWidgets.QTableWidget(parent=self.statisticsPage)
+        self.authorStatisticsTable.setGeometry(QtCore.QRect(300, 170, 281, 341))
+        self.authorStatisticsTable.setObjectName("authorStatisticsTable")
+        self.authorStatisticsTable.setColumnCount(2)
+        self.authorStatisticsTable.setRowCount(0)
+        item = QtWidgets.QTableWidgetItem()
+        self.authorStatisticsTable.setHorizontalHeaderItem(0, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.authorStatisticsTable.setHorizontalHeaderItem(1, item)
+        self.stackedWidget.addWidget(self.statisticsPage)
         MainWindow.setCentralWidget(self.centralwidget)
         self.menubar = QtWidgets.QMenuBar(parent=MainWindow)
         self.menubar.setGeometry(QtCore.QRect(0, 0, 591, 26))
@@ -174,14 +205,21 @@ class Ui_MainWindow(object):
         self.export_csv_action.setObjectName("export_csv_action")
         self.import_csv_action = QtGui.QAction(parent=MainWindow)
         self.import_csv_action.setObjectName("import_csv_action")
+        self.showStatisticsAction = QtGui.QAction(parent=MainWindow)
+        self.showStatisticsAction.setObjectName("showStatisticsAction")
+        self.maintenanceAction = QtGui.QAction(parent=MainWindow)
+        self.maintenanceAction.setObjectName("maintenanceAction")
         self.bookMenu.addAction(self.showBookSearchingAction)
         self.bookMenu.addAction(self.addBookAction)
+        self.bookMenu.addAction(self.showStatisticsAction)
         self.genreMenu.addAction(self.showGenreSearchingAction)
         self.genreMenu.addAction(self.addGenreAction)
         self.authorMenu.addAction(self.showAuthorSearchingAction)
         self.authorMenu.addAction(self.addAuthorAction)
         self.menu.addAction(self.export_csv_action)
         self.menu.addAction(self.import_csv_action)
+        self.menu.addSeparator()
+        self.menu.addAction(self.maintenanceAction)
         self.menubar.addAction(self.bookMenu.menuAction())
         self.menubar.addAction(self.genreMenu.menuAction())
         self.menubar.addAction(self.authorMenu.menuAction())
@@ -214,6 +252,18 @@ class Ui_MainWindow(object):
         self.label_5.setText(_translate("MainWindow", "Название жанра"))
         self.searchAuthorsButton.setText(_translate("MainWindow", "Искать"))
         self.label_4.setText(_translate("MainWindow", "Имя автора"))
+        item = self.statusStatisticsTable.horizontalHeaderItem(0)
+        item.setText(_translate("MainWindow", "Статус"))
+        item = self.statusStatisticsTable.horizontalHeaderItem(1)
+        item.setText(_translate("MainWindow", "Книг"))
+        item = self.genreStatisticsTable.horizontalHeaderItem(0)
+        item.setText(_translate("MainWindow", "Жанр"))
+        item = self.genreStatisticsTable.horizontalHeaderItem(1)
+        item.setText(_translate("MainWindow", "Книг"))
+        item = self.authorStatisticsTable.horizontalHeaderItem(0)
+        item.setText(_translate("MainWindow", "Автор"))
+        item = self.authorStatisticsTable.horizontalHeaderItem(1)
+        item.setText(_translate("MainWindow", "Книг"))
         self.bookMenu.setTitle(_translate("MainWindow", "Книги"))
         self.genreMenu.setTitle(_translate("MainWindow", "Жанры"))
         self.authorMenu.setTitle(_translate("MainWindow", "Авторы"))
@@ -228,3 +278,5 @@ class Ui_MainWindow(object):
         self.addAuthorAction.setText(_translate("MainWindow", "Добавить автора"))
         self.export_csv_action.setText(_translate("MainWindow", "Экспортировать csv"))
         self.import_csv_action.setText(_translate("MainWindow", "Импортировать csv"))
+        self.showStatisticsAction.setText(_translate("MainWindow", "Статистика"))
+        self.maintenanceAction.setText(_translate("MainWindow", "Обслуживание базы данных"))